@@ -0,0 +1,77 @@
+"""Time the shared date parsing in concertscrape.common.dates against parsing
+one value at a time, on a sheet and a sitemap of --rows concerts.
+
+    python benchmarks/bench_dates.py [--rows 50000] [--distinct 500]
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+import time
+
+import pandas as pd
+
+from concertscrape.common.dates import (LAST_MODIFIED_FORMAT, normalise_date_columns, parse_concert_date,
+                                        parse_lastmod, parse_timestamp_column)
+
+
+def make_sheet(rows):
+    base = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    return pd.DataFrame({
+        'url': [f'https://oxfordphil.com/event/concert-{i}/' for i in range(rows)],
+        'last_modified': [(base + timedelta(minutes=i)).strftime(LAST_MODIFIED_FORMAT) for i in range(rows)],
+        'date': [(base + timedelta(days=i % 1000)).strftime('%d %b %Y') for i in range(rows)],
+        'date_parsed': [(base + timedelta(days=i % 1000)).strftime('%Y-%m-%d') for i in range(rows)],
+    })
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def strptime_each(values, date_format):
+    return [datetime.strptime(value, date_format) if value else None for value in values]
+
+
+def parse_each(parse, values):
+    return [parse(value) for value in values]
+
+
+def report(name, before, after):
+    print(f"{name:<28}{before * 1e3:>12.1f} ms{after * 1e3:>12.1f} ms{before / after:>9.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--distinct', type=int, default=500,
+                        help="distinct <lastmod>s in the sitemap, as site-wide edits touch many pages at once")
+    args = parser.parse_args()
+
+    sheet = make_sheet(args.rows)
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    lastmods = [(base + timedelta(hours=i % args.distinct)).strftime(LAST_MODIFIED_FORMAT)
+                for i in range(args.rows)]
+    dates = list(sheet['date'])
+
+    print(f"Rows: {args.rows}")
+    print(f"{'':<28}{'per value':>15}{'shared':>15}")
+    report('sheet last_modified',
+           timed(strptime_each, sheet['last_modified'], LAST_MODIFIED_FORMAT),
+           timed(parse_timestamp_column, sheet['last_modified']))
+    report('sheet load, both columns',
+           timed(strptime_each, sheet['last_modified'], LAST_MODIFIED_FORMAT)
+           + timed(strptime_each, sheet['date_parsed'], '%Y-%m-%d'),
+           timed(normalise_date_columns, sheet))
+    parse_lastmod.cache_clear()
+    report('sitemap <lastmod>s',
+           timed(parse_each, parse_lastmod.__wrapped__, lastmods),
+           timed(parse_each, parse_lastmod, lastmods))
+    parse_concert_date.cache_clear()
+    report('concert dates',
+           timed(parse_each, parse_concert_date.__wrapped__, dates),
+           timed(parse_each, parse_concert_date, dates))
+
+
+if __name__ == '__main__':
+    main()
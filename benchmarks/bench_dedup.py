@@ -0,0 +1,104 @@
+"""Time duplicate detection (concertscrape.common.dedup.find_clusters) on
+synthetic concert sets of growing size, up to --rows, against comparing every
+pair of concerts on a small sample.
+
+    python benchmarks/bench_dedup.py [--rows 100000] [--duplicates 0.3] [--naive-rows 2000]
+
+The time per concert of the blocked version should stay about the same as
+the set grows; the pairwise version's grows with it.
+"""
+import argparse
+from datetime import date, timedelta
+import json
+import random
+import time
+
+from concertscrape.common.dedup import ConcertKey, block, block_key, find_clusters, is_duplicate
+
+VENUES = [
+    'Sheldonian Theatre', 'Holywell Music Room', 'Jacqueline du Pré Music Building', 'Christ Church Cathedral',
+    'University Church of St Mary the Virgin', 'Merton College Chapel', 'New College Chapel', 'Town Hall',
+    'St John the Evangelist', 'Exeter College Chapel', 'Keble College Chapel', 'Wesley Memorial Church',
+]
+COMPOSERS = ['Bach', 'Mozart', 'Beethoven', 'Brahms', 'Schubert', 'Handel', 'Haydn', 'Dvořák', 'Elgar', 'Purcell']
+WORKS = ['Symphony No. {}', 'Piano Concerto No. {}', 'String Quartet No. {}', 'Mass in {}', 'Sonatas {}']
+KEYS = ['C', 'D', 'E flat', 'G minor', 'B minor']
+PERFORMERS = [f'{first} {last}' for first in ('Anna', 'Ben', 'Clara', 'David', 'Eva', 'Felix', 'Grace')
+              for last in ('Smith', 'Jones', 'Brown', 'Taylor', 'Wilson', 'Davies', 'Evans')]
+
+
+def make_concerts(rows, duplicates, seed=0):
+    """Rows of `rows` concerts from two sites, `duplicates` of them the second
+    site's listing of one of the first's, written differently. As in real
+    listings, a venue has about one concert a day, so the more concerts, the
+    more days they span."""
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    days = max(365, rows // len(VENUES))
+    concerts = []
+    while len(concerts) < rows:
+        i = len(concerts)
+        work = rng.choice(WORKS)
+        work = work.format(rng.choice(KEYS) if 'Mass' in work else rng.randint(1, 9))
+        row = {
+            'url': f'https://oxfordphil.com/event/concert-{i}/',
+            'title': f'{rng.choice(COMPOSERS)} {work}',
+            'venue': rng.choice(VENUES),
+            'date_parsed': (start + timedelta(days=rng.randrange(days))).isoformat(),
+            'start_time': rng.choice(['1pm', '7.30pm', '8pm']),
+            'performers': json.dumps([{'role': '', 'name': name} for name in rng.sample(PERFORMERS, 3)]),
+        }
+        concerts.append(row)
+        if len(concerts) < rows and rng.random() < duplicates:
+            concerts.append({
+                **row,
+                'url': f'https://www.musicatoxford.com/whats-on/concert-{i}/',
+                'title': f'Oxford Concert Series: {row["title"].upper()}',
+                'venue': f'The {row["venue"]}, Oxford',
+                'start_time': row['start_time'].upper(),
+            })
+    return concerts
+
+
+def pairwise_duplicates(rows):
+    """The duplicate pairs, found by fuzzy-matching every pair of concerts
+    before checking their dates and venues"""
+    keys = [(ConcertKey(row), block_key(row)) for row in rows]
+    return sum(is_duplicate(a, b) and a_block == b_block
+               for i, (a, a_block) in enumerate(keys) for b, b_block in keys[i + 1:])
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--duplicates', type=float, default=0.3,
+                        help="share of concerts listed by both sites")
+    parser.add_argument('--naive-rows', type=int, default=2000,
+                        help="concerts to compare pairwise, which takes time quadratic in them")
+    args = parser.parse_args()
+
+    print(f"{'concerts':>10}{'blocks':>10}{'pairs':>12}{'clustered':>11}{'seconds':>10}{'us/concert':>12}")
+    for rows in sorted({args.rows // 4, args.rows // 2, args.rows}):
+        sample = make_concerts(rows, args.duplicates)
+        blocks = block(sample)
+        pairs = sum(len(block_rows) * (len(block_rows) - 1) // 2 for block_rows in blocks.values())
+        seconds, clusters = timed(find_clusters, sample)
+        clustered = sum(cluster_id is not None for cluster_id in clusters.values())
+        print(f"{rows:>10}{len(blocks):>10}{pairs:>12}{clustered:>11}{seconds:>10.2f}{seconds / rows * 1e6:>12.1f}")
+
+    sample = make_concerts(args.naive_rows, args.duplicates)
+    blocked, _ = timed(find_clusters, sample)
+    pairwise, _ = timed(pairwise_duplicates, sample)
+    pairs = len(sample) * (len(sample) - 1) // 2
+    print(f"\nPairwise on {len(sample)} concerts: {pairwise:.2f}s for {pairs} pairs, against {blocked:.3f}s "
+          f"blocked; {pairwise * (args.rows / len(sample)) ** 2 / 60:.0f} minutes at {args.rows}, extrapolated")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Time importing the entry points, with `python -X importtime`.
+
+Shows each entry point's import time and the modules that took longest to
+import along the way. The test suite enforces a budget for each
+(concertscrape/common/test_imports.py).
+
+    python benchmarks/bench_import.py [--top 10]
+"""
+import argparse
+
+from concertscrape.common.profiling import measure_import
+
+MODULES = [
+    'concertscrape.main',
+    'concertscrape.musicatoxford.mao',
+    'concertscrape.oxfordphil.oxfordphil',
+    'concertscrape.musicatoxford.maoconcert',
+    'concertscrape.oxfordphil.oxfordphilconcert',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    for module in MODULES:
+        seconds, imported = measure_import(module)
+        print(f"\n{module}: {seconds * 1e3:.0f} ms")
+        slowest = sorted(imported.items(), key=lambda item: item[1], reverse=True)[1:args.top + 1]
+        for name, cumulative in slowest:
+            print(f"  {cumulative * 1e3:8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Time both extract_concert implementations under each parser backend.
+
+Reports parse time per page and peak memory (tracemalloc) per backend, on
+the corpus pages, which are padded with the navigation, scripts and footer
+of a real site.
+
+    python benchmarks/bench_parsers.py [--pages 50]
+"""
+import argparse
+import time
+import tracemalloc
+
+from corpus import mao_page, oxfordphil_page
+from concertscrape.common.soup import PARSER_BACKENDS, set_parser_backend
+from concertscrape.musicatoxford import maoconcert
+from concertscrape.oxfordphil import oxfordphilconcert
+
+
+def measure(extract_concert, page, pages):
+    """Returns (seconds per page, peak bytes allocated during one parse)"""
+    start = time.perf_counter()
+    for _ in range(pages):
+        extract_concert(page)
+    per_page = (time.perf_counter() - start) / pages
+
+    tracemalloc.start()
+    extract_concert(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_page, peak
+
+
+def run(pages):
+    """Returns {site: {backend: {'ms_per_page', 'peak_kib'}}}"""
+    sites = {
+        'musicatoxford.com': (maoconcert.extract_concert, mao_page()),
+        'oxfordphil.com': (oxfordphilconcert.extract_concert, oxfordphil_page()),
+    }
+    results = {}
+    for site, (extract_concert, page) in sites.items():
+        results[site] = {}
+        for backend in PARSER_BACKENDS:
+            set_parser_backend(backend)
+            try:
+                per_page, peak = measure(extract_concert, page, pages)
+            except Exception as e:
+                # e.g. lxml isn't installed
+                print(f"{site} {backend}: skipped ({e})")
+                continue
+            results[site][backend] = {'ms_per_page': per_page * 1e3, 'peak_kib': peak / 1024}
+    set_parser_backend('html.parser')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=50)
+    args = parser.parse_args()
+
+    for site, backends in run(args.pages).items():
+        print(f"\n{site}")
+        print(f"  {'backend':<15}{'ms/page':>10}{'peak KiB':>12}")
+        for backend, result in backends.items():
+            print(f"  {backend:<15}{result['ms_per_page']:>10.2f}{result['peak_kib']:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Compare needs_update via DataFrame.iterrows against the SheetIndex lookup.
+
+    python benchmarks/bench_sheet_index.py [--rows 50000] [--lookups 5]
+
+The iterrows scan takes seconds per lookup at 50,000 rows, so only a handful
+of lookups are timed, and the full sitemap's time is extrapolated from them.
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+import time
+
+import pandas as pd
+
+from concertscrape.common.dates import LAST_MODIFIED_FORMAT
+from concertscrape.common.sheet_index import SheetIndex
+
+
+def make_sheet(rows):
+    base = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    return pd.DataFrame({
+        'url': [f'https://oxfordphil.com/event/concert-{i}/' for i in range(rows)],
+        'last_modified': [(base + timedelta(minutes=i)).strftime(LAST_MODIFIED_FORMAT) for i in range(rows)],
+    })
+
+
+def needs_update_iterrows(concert_url, lastmod, sheet_data):
+    # the per-row scan that SheetIndex replaced
+    for _, row in sheet_data.iterrows():
+        if row.url == concert_url:
+            sheet_lastmod = datetime.strptime(row['last_modified'], LAST_MODIFIED_FORMAT)
+            return lastmod > sheet_lastmod
+    return 'new'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--lookups', type=int, default=5,
+                        help='lookups timed for the iterrows scan (it is too slow to do all of them)')
+    args = parser.parse_args()
+
+    sheet = make_sheet(args.rows)
+    lastmod = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    # spread the lookups over the sheet, plus one missing url, so scans are of average length
+    step = max(args.rows // args.lookups, 1)
+    urls = list(sheet['url'][::step][:args.lookups - 1]) + ['https://oxfordphil.com/event/missing/']
+
+    start = time.perf_counter()
+    for url in urls:
+        needs_update_iterrows(url, lastmod, sheet)
+    iterrows_per_lookup = (time.perf_counter() - start) / len(urls)
+
+    start = time.perf_counter()
+    index = SheetIndex(sheet)
+    build_time = time.perf_counter() - start
+
+    all_urls = list(sheet['url'])
+    start = time.perf_counter()
+    for url in all_urls:
+        index.status(url, lastmod)
+    index_per_lookup = (time.perf_counter() - start) / len(all_urls)
+
+    print(f"Sheet rows: {args.rows}")
+    print(f"iterrows scan:    {iterrows_per_lookup * 1e3:10.3f} ms/lookup, over {len(urls)} lookups "
+          f"(full sitemap ~{iterrows_per_lookup * args.rows:.0f}s, extrapolated)")
+    print(f"SheetIndex build: {build_time * 1e3:10.3f} ms (once per run)")
+    print(f"SheetIndex:       {index_per_lookup * 1e3:10.6f} ms/lookup "
+          f"(full sitemap {build_time + index_per_lookup * args.rows:.3f}s)")
+    print(f"Speed-up per lookup: {iterrows_per_lookup / index_per_lookup:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
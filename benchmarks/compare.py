@@ -0,0 +1,37 @@
+"""Compare two benchmark result files written by run.py.
+
+    python benchmarks/compare.py before.json after.json
+"""
+import argparse
+import json
+
+
+def key(result):
+    return result['name'], result['site'], result['size']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    after_results = {key(result): result for result in after['results']}
+
+    print(f"before: {before.get('commit')}  after: {after.get('commit')}")
+    print(f"{'benchmark':<16} {'site':<18} {'size':>7} {'before ms':>11} {'after ms':>11} {'change':>8}")
+    for result in before['results']:
+        other = after_results.get(key(result))
+        if not other:
+            continue
+        change = other['median'] / result['median'] - 1
+        print(f"{result['name']:<16} {result['site']:<18} {result['size']:>7} "
+              f"{result['median'] * 1e3:>11.3f} {other['median'] * 1e3:>11.3f} {change:>+8.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Synthetic corpus of venue pages, sitemaps and sheets for the benchmarks.
+
+Deterministic, so runs on different machines or commits time the same work.
+The pages have the structure of the real musicatoxford.com and oxfordphil.com
+event pages, padded with the navigation, scripts and footer of a real site.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from concertscrape.common.concert_schema import Concert, ConcertScrape, Performer, ProgrammeItem
+from concertscrape.common.concert_sheet import concert_scrape_to_row
+from concertscrape.common.dates import LAST_MODIFIED_FORMAT
+
+SITES = {
+    'musicatoxford.com': 'https://www.musicatoxford.com/whats-on/',
+    'oxfordphil.com': 'https://oxfordphil.com/event/',
+}
+
+BASE_DATE = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+CHROME = """
+<html><head><title>Concert</title>
+<script>{script}</script>
+<style>{style}</style>
+</head><body>
+<nav class="site-nav"><ul>{nav}</ul></nav>
+{content}
+<footer class="site-footer">{footer}</footer>
+</body></html>
+"""
+
+MAO_CONTENT = """
+<div class="event-description">
+    <span class="event-description__date blue">{date:%A %d %B %Y}</span>
+    <a href="/venues/sheldonian/" class="event-description__venue blue">Sheldonian Theatre</a>
+    <h1 class="blue">International Organ Series: Recital {i}</h1>
+    <p>An evening of French organ music.</p>
+    <p>{blurb}</p>
+</div>
+<div class="event-information__single"><h3>Start Time</h3><p>7PM</p></div>
+<div class="event-information__single"><h3>Tickets</h3><p>£15 Full price | £7.50 Standard concession</p></div>
+<div class="programme-listing__wrapper"><h2>Programme</h2>
+    {programme}
+</div>
+<div class="programme-listing__wrapper"><h2>Performers</h2>
+    <div class="programme-listing__single"><h3>Organist</h3><p>Performer {i}</p></div>
+</div>
+<div class="programme-listing__wrapper"><h2>Venue Information</h2>
+    <div class="programme-listing__venue"><p>Broad Street, Oxford OX1 3AZ</p></div>
+</div>
+"""
+
+OXFORDPHIL_CONTENT = """
+<h2 class="event-title">Baroque Fest {i}</h2>
+<div class="event-subtitle">{date:%d %b %Y} | 19:30 | Sheldonian Theatre</div>
+<div class="event-info-box">Tickets: £20-£60
+Students £10</div>
+<div class="event-description">
+<p>{programme}<br>
+<br>
+<strong>Soloist {i} </strong>soprano<br>
+<strong>Marios Papadopoulos</strong> conductor</p>
+<p>{blurb}</p>
+</div>
+"""
+
+BLURB = "Join us for a celebration of music old and new, in one of Oxford's finest venues. " * 10
+
+
+def padded_page(content):
+    return CHROME.format(
+        script='var x = 1;\n' * 500,
+        style='.a { color: red }\n' * 500,
+        nav=''.join(f'<li><a href="/page-{i}/">Page {i}</a><ul><li>Sub</li></ul></li>' for i in range(300)),
+        content=content,
+        footer=''.join(f'<div class="footer-col"><p>Footer text {i}</p></div>' for i in range(200)),
+    )
+
+
+def concert_date(i):
+    return BASE_DATE + timedelta(days=i % 1000)
+
+
+def mao_page(i=0, programme_items=10):
+    programme = ''.join(f'<div class="programme-listing__single"><h3>Composer {n}</h3><p>Piece {n}</p></div>'
+                        for n in range(programme_items))
+    return padded_page(MAO_CONTENT.format(i=i, date=concert_date(i), programme=programme, blurb=BLURB))
+
+
+def oxfordphil_page(i=0, programme_items=10):
+    programme = '<br>\n'.join(f'<strong>Composer {n}</strong> Piece {n}' for n in range(programme_items))
+    return padded_page(OXFORDPHIL_CONTENT.format(i=i, date=concert_date(i), programme=programme, blurb=BLURB))
+
+
+PAGES = {
+    'musicatoxford.com': mao_page,
+    'oxfordphil.com': oxfordphil_page,
+}
+
+
+def concert_url(site, i):
+    return f'{SITES[site]}concert-{i}/'
+
+
+def lastmod(i):
+    return BASE_DATE + timedelta(minutes=i)
+
+
+def sitemap(site, size):
+    """A sitemap of `size` concerts, plus a few non-concert pages"""
+    entries = [f'<url><loc>{concert_url(site, i)}</loc><lastmod>{lastmod(i).strftime(LAST_MODIFIED_FORMAT)}</lastmod>'
+               f'<image:image><image:loc>https://example.com/{i}.jpg</image:loc></image:image></url>'
+               for i in range(size)]
+    entries += [f'<url><loc>https://{site}/page-{i}/</loc><lastmod>2020-01-01T00:00:00+00:00</lastmod></url>'
+                for i in range(10)]
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<?xml-stylesheet type="text/xsl" href="//example.com/main-sitemap.xsl"?>'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+            'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">'
+            + ''.join(entries) + '</urlset>')
+
+
+def concert_scrape(site, i):
+    return ConcertScrape(
+        url=concert_url(site, i),
+        scrape_date=BASE_DATE,
+        last_modified=lastmod(i),
+        concert=Concert(
+            title=f'Concert {i}',
+            date=concert_date(i).strftime('%d %b %Y'),
+            date_parsed=concert_date(i).date(),
+            start_time='19:30',
+            venue='Sheldonian Theatre',
+            performers=[Performer(role='conductor', name=f'Conductor {i % 50}')],
+            programme=[ProgrammeItem(composer=f'Composer {n}', piece=f'Piece {n}') for n in range(5)],
+            description=BLURB,
+        ),
+    )
+
+
+def sheet(site, size):
+    """A sheet snapshot (all strings, as read from Sheets) of `size` concerts"""
+    return pd.DataFrame([concert_scrape_to_row(concert_scrape(site, i)) for i in range(size)]).fillna('').astype(str)
@@ -0,0 +1,139 @@
+"""Benchmark suite: times the scraper's hot paths on a synthetic corpus.
+
+    python benchmarks/run.py [--sizes 100,1000,10000] [--output results.json]
+    python benchmarks/compare.py before.json after.json
+
+Writes machine-readable JSON, so two runs (e.g. before and after a change)
+can be compared.
+"""
+import argparse
+from datetime import datetime, timezone
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+import corpus
+from concertscrape.common.concert_sheet import SheetHandler
+from concertscrape.common.concert_store import SQLiteConcertStore
+from concertscrape.common.fake_spread import FakeSpread
+from concertscrape.common.registry import get_scrapers
+from concertscrape.common.sheet_index import SheetIndex
+from concertscrape.common.soup import get_parser_backend
+
+SCRAPERS = {scraper_class.site_id: scraper_class for scraper_class in get_scrapers(corpus.SITES)}
+
+
+def timed(function, repeat=5, number=1):
+    """Runs function number times, repeat times, and returns the timings in
+    seconds per call"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'max': max(timings),
+        'repeat': repeat,
+        'number': number,
+    }
+
+
+def bench_parse_sitemap(site, size):
+    scraper = SCRAPERS[site](store=None)
+    content = corpus.sitemap(site, size)
+    return timed(lambda: scraper.parse_sitemap(content))
+
+
+def bench_extract_concert(site, pages):
+    extract_concert = SCRAPERS[site].extract_concert
+    page = corpus.PAGES[site]()
+    return timed(lambda: extract_concert(page), number=pages)
+
+
+def bench_needs_update(site, size):
+    """Builds the SheetIndex and checks every sitemap entry against it"""
+    scraper = SCRAPERS[site](store=None)
+    sheet = corpus.sheet(site, size)
+    concerts = scraper.parse_sitemap(corpus.sitemap(site, size))
+
+    def run():
+        sheet_index = SheetIndex(sheet)
+        for concert in concerts:
+            scraper.needs_update(concert['url'], concert['lastmod'], sheet_index)
+    return timed(run, repeat=3)
+
+
+def bench_store_needs_update(site, size):
+    """As needs_update, with the index read from a SQLiteConcertStore"""
+    scraper = SCRAPERS[site](store=None)
+    store = SQLiteConcertStore()
+    store.import_rows(corpus.sheet(site, size))
+    concerts = scraper.parse_sitemap(corpus.sitemap(site, size))
+
+    def run():
+        index = store.index()
+        for concert in concerts:
+            scraper.needs_update(concert['url'], concert['lastmod'], index)
+    return timed(run, repeat=3)
+
+
+def bench_update_concert(site, size):
+    """One update_concert (full read, changed cells written) against a sheet of
+    `size` rows"""
+    sheet_handler = SheetHandler(spread=FakeSpread(corpus.sheet(site, size)))
+    concert_scrape = corpus.concert_scrape(site, size // 2)
+    return timed(lambda: sheet_handler.update_concert(concert_scrape), repeat=3)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, pages):
+    results = []
+    for site in corpus.SITES:
+        benches = [('extract_concert', bench_extract_concert, pages)]
+        for size in sizes:
+            benches += [('parse_sitemap', bench_parse_sitemap, size),
+                        ('needs_update', bench_needs_update, size),
+                        ('store_needs_update', bench_store_needs_update, size),
+                        ('update_concert', bench_update_concert, size)]
+        for name, bench, size in benches:
+            results.append({'name': name, 'site': site, 'size': size, **bench(site, size)})
+            print(f"{name:<20} {site:<18} {size:>7}  {results[-1]['median'] * 1e3:10.3f} ms")
+    return {
+        'date': datetime.now(timezone.utc).isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'parser_backend': get_parser_backend(),
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100,1000,10000',
+                        help='Comma-separated sitemap / sheet sizes')
+    parser.add_argument('--pages', type=int, default=20,
+                        help='Pages per timing of extract_concert')
+    parser.add_argument('--output', default='benchmark-results.json')
+    args = parser.parse_args()
+
+    report = run([int(size) for size in args.sizes.split(',')], args.pages)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Written {args.output}")
+
+
+if __name__ == '__main__':
+    main()
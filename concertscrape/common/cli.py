@@ -0,0 +1,44 @@
+import argparse
+
+from concertscrape.common.profiling import DEFAULT_PROFILE_OUTPUT
+from concertscrape.common.scraper import DEFAULT_ARCHIVE_AFTER_DAYS, DEFAULT_MAX_WORKERS
+
+
+def parse_arguments(description='Concert scraping script with command line options', select_sites=False,
+                    args=None):
+    """The command line options. With select_sites, for a script scraping
+    every site, there is also --site to choose some of them."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--dry-run', action='store_true',
+                       help="Don't change the spreadsheet")
+    parser.add_argument('--reextract', action='store_true',
+                       help="Re-run the extractors over the archived pages (see SNAPSHOT_DIR) "
+                            "instead of fetching from the sites")
+    parser.add_argument('--full', action='store_true',
+                        help="Compare every sitemap entry with the concert store, rather than only those "
+                             "newer than the last run")
+    parser.add_argument('--archive-after', type=int, default=DEFAULT_ARCHIVE_AFTER_DAYS, metavar='DAYS',
+                        help="Move concerts to the archive sheet, and stop fetching them, DAYS days after "
+                             "they happen")
+    parser.add_argument('--resume', action='store_true',
+                        help="Carry on a run that was interrupted, without redoing the pages it had done "
+                             "(see RUN_JOURNAL)")
+    parser.add_argument('--fetch-workers', type=int, default=DEFAULT_MAX_WORKERS, metavar='N',
+                        help="Fetch each site's pages on N threads, still within the site's rate limit")
+    parser.add_argument('--extract-workers', type=int, metavar='N',
+                        help="Extract pages in N worker processes, rather than in the fetching threads")
+    if select_sites:
+        parser.add_argument('--site', action='append', dest='sites', metavar='SITE_ID',
+                            help="Only scrape this site, e.g. oxfordphil.com. Can be repeated")
+    parser.add_argument('--metrics-json', metavar='PATH',
+                        help="Write the run's counts, phase timings and counters to PATH as JSON")
+    parser.add_argument('--metrics-prom', metavar='PATH',
+                        help="Write them to PATH in the Prometheus text format, e.g. for node_exporter's "
+                             "textfile collector")
+    parser.add_argument('--profile', nargs='?', const=DEFAULT_PROFILE_OUTPUT, metavar='PATH',
+                        help="Profile the run, writing collapsed stacks for a flame graph to PATH "
+                             f"(default {DEFAULT_PROFILE_OUTPUT}), and print the hottest functions "
+                             "and the slowest URLs")
+    parser.add_argument('--profile-top', type=int, default=10, metavar='N',
+                        help="How many functions and URLs --profile prints")
+    return parser.parse_args(args)
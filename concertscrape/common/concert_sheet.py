@@ -1,12 +1,62 @@
+from __future__ import annotations
+
+import bisect
 import json
+import math
 import os
+import threading
+from typing import TYPE_CHECKING
+
+# pandas and the Google client libraries take most of a second to import, so
+# they're only imported when first used
+if TYPE_CHECKING:
+    import pandas as pd
+
+DEFAULT_SPREAD = '1D1BiS6txPVsfIiGpK1TRyeoUht_5dEEL_C6P9j5SMjA'
+# The worksheet of the spreadsheet that concerts are moved to once over
+ARCHIVE_SHEET = 'Archive'
+
+SHEET_COLUMNS = [
+    'url', 'scrape_date', 'last_modified', 'title', 'date', 'date_parsed', 'start_time', 'end_time',
+    'venue', 'venue_address', 'ticket_prices', 'performers', 'programme', 'description',
+    # when the concert was found gone from the venue's sitemap, e.g. cancelled
+    'withdrawn_at',
+    # shared by the rows of the same concert listed on more than one site
+    'cluster_id',
+]
+
+
+def concert_scrape_to_row(concert_scrape) -> dict:
+    """Flatten a ConcertScrape into a dict of sheet column values"""
+    # Convert Concert model to dict
+    concert_dict = concert_scrape.model_dump(mode='json') | concert_scrape.concert.model_dump(mode='json')
+    del concert_dict['concert']
+    # Convert nested objects to JSON strings, as CSV rows cope with nested dicts
+    concert_dict['performers'] = json.dumps(concert_dict['performers'])
+    concert_dict['programme'] = json.dumps(concert_dict['programme'])
+    return concert_dict
+
+
+class SheetReadError(Exception):
+    """The sheet couldn't be read, so nothing should be written to it"""
 
-from gspread_pandas import Spread
-from google.oauth2.service_account import Credentials as ServiceAccountCredentials
-import pandas as pd
 
 class SheetHandler:
-    def __init__(self, spread='1D1BiS6txPVsfIiGpK1TRyeoUht_5dEEL_C6P9j5SMjA'):
+    """Reads and writes one worksheet of the spreadsheet: the first, or
+    `sheet`, by name, which is created if need be"""
+    def __init__(self, spread=DEFAULT_SPREAD, sheet=None):
+        # Number of Sheets API calls made by this handler, and cells it wrote
+        self.api_calls = 0
+        self.cells_written = 0
+
+        if not isinstance(spread, str):
+            # an already-constructed Spread (or a fake of one, for tests)
+            self.spread = spread
+            return
+
+        from gspread_pandas import Spread
+        from google.oauth2.service_account import Credentials as ServiceAccountCredentials
+
         SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 
         # Load credentials from service account file
@@ -28,48 +78,309 @@ class SheetHandler:
                 scopes=SCOPES
             )
 
-        self.spread = Spread(creds=creds, spread=spread)
-        self._ensure_sheet_exists()
-
-    def _ensure_sheet_exists(self):
-        try:
-            self.spread.sheet.get()
-        except Exception as e:
-            self.spread.sheet.insert()
+        # opens the worksheet from the spreadsheet's metadata, creating a named
+        # one if need be, without reading its cells - the archive only grows
+        self.spread = Spread(creds=creds, spread=spread, sheet=sheet or 0, create_sheet=sheet is not None)
 
     def get_all_data(self) -> pd.DataFrame:
+        """A snapshot of the whole sheet. Raises SheetReadError if it can't be
+        read, as writes based on an empty snapshot would overwrite its rows."""
         try:
+            self.api_calls += 1
             return self.spread.sheet_to_df(index=False)
         except Exception as e:
-            print(f"ERROR reading sheet: {e}")
-            return pd.DataFrame()
+            raise SheetReadError(f"Couldn't read the sheet: {e}") from e
+
+    def write_ranges(self, ranges, rows, cols, dry_run=False):
+        """Writes `ranges`, a list of {'range': A1 range, 'values': rows of
+        cells}, in one values batchUpdate. The sheet is first grown to `rows` x
+        `cols` if it is smaller, as writes beyond its grid are refused.
+        """
+        if dry_run or not ranges:
+            return
+        sheet = self.spread.sheet
+        if rows > sheet.row_count or cols > sheet.col_count:
+            self.api_calls += 1
+            sheet.resize(rows=max(rows, sheet.row_count), cols=max(cols, sheet.col_count))
+        self.api_calls += 1
+        self.cells_written += sum(len(row) for r in ranges for row in r['values'])
+        sheet.batch_update(ranges, raw=False)
+
+    def append_rows(self, rows, dry_run=False):
+        """Appends rows, dicts of the sheet columns, after the sheet's last
+        row without reading the sheet. A header is written first if the sheet
+        has none."""
+        if dry_run or not rows:
+            return
+        sheet = self.spread.sheet
+        self.api_calls += 1
+        header = sheet.row_values(1)
+        values = []
+        if not header:
+            header = SHEET_COLUMNS
+            values.append(header)
+        values += [[_cell(row.get(column)) for column in header] for row in rows]
+        self.api_calls += 1
+        self.cells_written += sum(len(row) for row in values)
+        sheet.append_rows(values, value_input_option='USER_ENTERED')
+
+    def delete_rows(self, rows, dry_run=False):
+        """Deletes sheet rows, by 1-based number, in one batchUpdate, a
+        request to each run of consecutive rows. The runs go bottom-up, so the
+        rows still to delete don't move."""
+        if dry_run or not rows:
+            return
+        sheet = self.spread.sheet
+        requests = [{'deleteDimension': {'range': {
+            'sheetId': sheet.id, 'dimension': 'ROWS', 'startIndex': run[0] - 1, 'endIndex': run[-1],
+        }}} for run in reversed(_runs(sorted(rows)))]
+        self.api_calls += 1
+        sheet.spreadsheet.batch_update({'requests': requests})
+
+    def remove_rows(self, urls, dry_run=False, df=None):
+        """Deletes the rows of `urls` from the sheet, leaving the others as
+        they are. `df` is a sheet snapshot already read this run. Returns the
+        snapshot without them, its index moved up as the sheet's rows are."""
+        df = self.get_all_data() if df is None else df
+        if df.empty or 'url' not in df.columns:
+            return df
+        removed = df['url'].isin(set(urls))
+        if not removed.any():
+            return df
+        # df index i is sheet row i + 2
+        removed_index = sorted(int(idx) for idx in df.index[removed])
+        self.delete_rows([idx + 2 for idx in removed_index], dry_run=dry_run)
+        kept = df[~removed].copy()
+        kept.index = [idx - bisect.bisect_left(removed_index, idx) for idx in kept.index]
+        return kept
+
+    def archive_from_store(self, store, archive, dry_run=False, df=None):
+        """Moves the store's newly archived concerts from this sheet to
+        `archive`, another SheetHandler: appended there, then removed here.
+        Makes no API calls if there are none. Returns this sheet's snapshot
+        after the move, or `df` if nothing moved."""
+        rows = store.unsynced_rows(archived=True)
+        if not rows:
+            return df
+        urls = [row['url'] for row in rows]
+        archive.append_rows(rows, dry_run=dry_run)
+        df = self.remove_rows(urls, dry_run=dry_run, df=df)
+        if not dry_run:
+            store.mark_synced(urls)
+        return df
 
     def update_concert(self, concert_scrape, dry_run=False):
+        """Read the whole sheet, upsert one concert and write back its changed
+        cells.
+
+        Costs a full read per concert - use batch() or update_concerts() when
+        there is more than one.
+        """
         try:
-            # Convert Concert model to dict
-            concert_dict = concert_scrape.model_dump(mode='json') | concert_scrape.concert.model_dump(mode='json')
-            del concert_dict['concert']
-            # Convert nested objects to JSON strings, as CSV rows cope with nested dicts
-            concert_dict['performers'] = json.dumps(concert_dict['performers'])
-            concert_dict['programme'] = json.dumps(concert_dict['programme'])
-            
-            # Get existing data
-            df = self.get_all_data()
-            
-            # Update or append
-            if concert_dict['url'] in df['url'].values:
-                idx = df[df['url'] == concert_dict['url']].index[0]
-                for col in concert_dict:
-                    if col in df.columns:
-                        df.at[idx, col] = concert_dict[col]
-            else:
-                new_df = pd.DataFrame([concert_dict])
-                df = pd.concat([df, new_df], ignore_index=True)
-            
-            # Write back to sheet
-            if not dry_run:
-                self.spread.df_to_sheet(df, index=False, replace=True)
-            
+            with self.batch(dry_run=dry_run) as batch:
+                batch.upsert(concert_scrape)
         except Exception as e:
             print(f"ERROR updating sheet: {e}")
             raise
+
+    def update_concerts(self, concert_scrapes, dry_run=False, flush_every=None):
+        """Upsert many concerts with one sheet read and one write (or one write
+        every `flush_every` upserted rows). Returns the number of rows upserted.
+        """
+        with self.batch(dry_run=dry_run, flush_every=flush_every) as batch:
+            for concert_scrape in concert_scrapes:
+                batch.upsert(concert_scrape)
+        return batch.upserted
+
+    def batch(self, dry_run=False, flush_every=None, df=None):
+        return SheetBatch(self, dry_run=dry_run, flush_every=flush_every, df=df)
+
+    def sync_from_store(self, store, dry_run=False, df=None):
+        """Writes the store's changed rows to the sheet, in one batch. Makes no
+        API calls if nothing changed. `df` is a sheet snapshot already read
+        this run, to save reading it again. Returns the number of rows synced.
+        """
+        rows = store.unsynced_rows()
+        if not rows:
+            return 0
+        with self.batch(dry_run=dry_run, df=df) as batch:
+            for row in rows:
+                batch.upsert_row(row)
+        if not dry_run:
+            store.mark_synced(row['url'] for row in rows)
+        return len(rows)
+
+
+def _cell(value):
+    """A value as the sheet holds it"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    return str(value)
+
+
+def rowcol_to_a1(row, col):
+    """A1 notation of a 1-based cell position, e.g. (2, 28) -> 'AB2'"""
+    letters = ''
+    while col:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return f'{letters}{row}'
+
+
+def _runs(positions):
+    """Splits sorted positions into runs of consecutive ones"""
+    runs = []
+    for position in positions:
+        if runs and position == runs[-1][-1] + 1:
+            runs[-1].append(position)
+        else:
+            runs.append([position])
+    return runs
+
+
+class SheetBatch:
+    """Loads the sheet once, merges upserts in memory keyed by URL, and writes
+    back on flush(). Use as a context manager, which flushes on exit.
+
+    flush() only sends the cells that differ from what the sheet holds: the
+    changed cells of updated rows, appended rows and any new header cells.
+
+    Safe to share between threads, e.g. several sites scraped at once.
+    """
+    def __init__(self, sheet_handler, dry_run=False, flush_every=None, df=None):
+        import pandas as pd
+
+        self.sheet_handler = sheet_handler
+        self.dry_run = dry_run
+        self.flush_every = flush_every
+        self.upserted = 0
+        self._pending = 0
+        self._lock = threading.RLock()
+
+        self.df = sheet_handler.get_all_data() if df is None else df.copy()
+        if 'url' not in self.df.columns:
+            self.df = pd.DataFrame(columns=['url'])
+            # what the sheet holds, to write only the difference
+            self._sheet_df = pd.DataFrame()
+            self._sheet_rows = []
+        else:
+            # the sheet's blank rows aren't read, but the others keep their
+            # positions in the index, so df row i was sheet row i + 2
+            self._sheet_rows = [int(idx) + 2 for idx in self.df.index]
+            self.df = self.df.reset_index(drop=True)
+            self._sheet_df = self.df.copy()
+        self._row_by_url = {url: idx for idx, url in zip(self.df.index, self.df['url'])}
+        self._new_rows = []
+        self._changed_rows = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # write whatever was merged, even on error, so completed work is kept
+        self.flush()
+        return False
+
+    def upsert(self, concert_scrape):
+        self.upsert_row(concert_scrape_to_row(concert_scrape))
+
+    def upsert_row(self, concert_dict):
+        with self._lock:
+            self._upsert_row(concert_dict)
+
+    def _upsert_row(self, concert_dict):
+        url = concert_dict['url']
+        if url in self._row_by_url:
+            idx = self._row_by_url[url]
+            if idx < 0:
+                # appended earlier in this batch, not yet merged into df
+                self._new_rows[-idx - 1] = concert_dict
+            else:
+                for col in concert_dict:
+                    if col not in self.df.columns:
+                        # e.g. withdrawn_at on a sheet made before it; added
+                        # after the sheet's columns, with its header cell
+                        self.df[col] = ''
+                    self.df.at[idx, col] = concert_dict[col]
+                self._changed_rows.add(idx)
+        else:
+            self._new_rows.append(concert_dict)
+            self._row_by_url[url] = -len(self._new_rows)
+
+        self.upserted += 1
+        self._pending += 1
+        if self.flush_every and self._pending >= self.flush_every:
+            self.flush()
+
+    def _merge_new_rows(self):
+        import pandas as pd
+
+        if not self._new_rows:
+            return
+        new_df = pd.DataFrame(self._new_rows)
+        if self.df.empty:
+            # keep the sheet's column order, with any new columns after it
+            columns = list(self.df.columns) + [col for col in new_df.columns if col not in self.df.columns]
+            self.df = new_df.reindex(columns=columns)
+        else:
+            self.df = pd.concat([self.df, new_df], ignore_index=True)
+        self._new_rows = []
+        self._row_by_url = {url: idx for idx, url in zip(self.df.index, self.df['url'])}
+
+    def _row_number(self, idx):
+        """The sheet row of df row idx: where it was read from or, for a row
+        added since, after the sheet's last row"""
+        if idx < len(self._sheet_rows):
+            return self._sheet_rows[idx]
+        return (self._sheet_rows[-1] if self._sheet_rows else 1) + idx - len(self._sheet_rows) + 1
+
+    def changed_ranges(self):
+        """The ranges of cells that differ from the sheet, as for
+        SheetHandler.write_ranges()"""
+        columns = list(self.df.columns)
+        sheet_columns = list(self._sheet_df.columns)
+        # new columns are only ever added after the sheet's
+        assert columns[:len(sheet_columns)] == sheet_columns
+        sheet_rows = len(self._sheet_df)
+        ranges = []
+
+        if len(columns) > len(sheet_columns):
+            ranges.append({
+                'range': f'{rowcol_to_a1(1, len(sheet_columns) + 1)}:{rowcol_to_a1(1, len(columns))}',
+                'values': [columns[len(sheet_columns):]],
+            })
+
+        for idx in sorted(self._changed_rows):
+            if idx >= sheet_rows:
+                continue
+            row = self._row_number(idx)
+            new = [_cell(value) for value in self.df.iloc[idx]]
+            old = [_cell(value) for value in self._sheet_df.iloc[idx]] + [''] * (len(columns) - len(sheet_columns))
+            changed = [col for col in range(len(columns)) if new[col] != old[col]]
+            for run in _runs(changed):
+                ranges.append({
+                    'range': f'{rowcol_to_a1(row, run[0] + 1)}:{rowcol_to_a1(row, run[-1] + 1)}',
+                    'values': [new[run[0]:run[-1] + 1]],
+                })
+
+        if len(self.df) > sheet_rows:
+            ranges.append({
+                'range': f'{rowcol_to_a1(self._row_number(sheet_rows), 1)}:'
+                         f'{rowcol_to_a1(self._row_number(len(self.df) - 1), len(columns))}',
+                'values': [[_cell(value) for value in row]
+                           for row in self.df.iloc[sheet_rows:].itertuples(index=False)],
+            })
+        return ranges
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            self._merge_new_rows()
+            self.sheet_handler.write_ranges(self.changed_ranges(), rows=self._row_number(len(self.df) - 1),
+                                            cols=len(self.df.columns), dry_run=self.dry_run)
+            if not self.dry_run:
+                self._sheet_df = self.df.copy()
+                self._sheet_rows = [self._row_number(idx) for idx in range(len(self.df))]
+            self._changed_rows = set()
+            self._pending = 0
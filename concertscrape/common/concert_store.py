@@ -0,0 +1,435 @@
+from __future__ import annotations
+
+from datetime import datetime
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+from typing import TYPE_CHECKING
+
+from concertscrape.common.concert_schema import Concert, ConcertScrape
+from concertscrape.common.concert_sheet import SHEET_COLUMNS, concert_scrape_to_row
+from concertscrape.common.dates import normalise_date_columns
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from concertscrape.common.sheet_index import SheetIndex
+
+DEFAULT_CONCERT_DB = '~/.cache/concertscrape/concerts.db'
+
+CONCERT_COLUMNS = [column for column in SHEET_COLUMNS if column not in ('performers', 'programme')]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS concerts (
+    url TEXT PRIMARY KEY,
+    scrape_date TEXT,
+    last_modified TEXT,
+    title TEXT NOT NULL,
+    date TEXT,
+    date_parsed TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    venue TEXT,
+    venue_address TEXT,
+    ticket_prices TEXT,
+    description TEXT,
+    withdrawn_at TEXT,
+    -- see dedup.find_clusters()
+    cluster_id TEXT,
+    -- content_hash() of the row, to tell whether a refetched page changed
+    content_hash TEXT,
+    -- 0 until the row has been written to the sheet, or for an archived
+    -- concert, moved to the archive sheet
+    synced INTEGER NOT NULL DEFAULT 0,
+    -- when the concert, being over, was archived. Archived concerts aren't
+    -- fetched again and are kept out of the sheet
+    archived_at TEXT
+);
+CREATE INDEX IF NOT EXISTS concerts_date_parsed ON concerts (date_parsed);
+CREATE INDEX IF NOT EXISTS concerts_venue ON concerts (venue);
+CREATE INDEX IF NOT EXISTS concerts_unsynced ON concerts (synced) WHERE synced = 0;
+
+CREATE TABLE IF NOT EXISTS performers (
+    concert_url TEXT NOT NULL REFERENCES concerts (url) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    role TEXT,
+    name TEXT,
+    PRIMARY KEY (concert_url, position)
+);
+
+CREATE TABLE IF NOT EXISTS programme_items (
+    concert_url TEXT NOT NULL REFERENCES concerts (url) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    composer TEXT,
+    piece TEXT,
+    PRIMARY KEY (concert_url, position)
+);
+
+-- The concert URLs in each site's sitemap at its last scrape, to tell which
+-- have been removed since
+CREATE TABLE IF NOT EXISTS sitemap_urls (
+    site_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    last_modified TEXT,
+    PRIMARY KEY (site_id, url)
+);
+
+-- Per site, as of its last successful scrape: the latest <lastmod> in its
+-- sitemap, and the sitemap's sha256 (NULL if it was a sitemap index)
+CREATE TABLE IF NOT EXISTS watermarks (
+    site_id TEXT PRIMARY KEY,
+    last_modified TEXT,
+    sitemap_hash TEXT,
+    updated_at TEXT NOT NULL
+);
+"""
+
+
+class ConcertStore:
+    """Where scraped concerts are kept. The sheet is a mirror of it, synced
+    with SheetHandler.sync_from_store().
+
+    Rows are dicts of the sheet columns (see concert_scrape_to_row).
+    """
+    def upsert(self, concert_scrape):
+        self.upsert_row(concert_scrape_to_row(concert_scrape))
+
+    def upsert_row(self, row, synced=False):
+        raise NotImplementedError
+
+    def get_row(self, url):
+        raise NotImplementedError
+
+    def get_content_hash(self, url):
+        raise NotImplementedError
+
+    def touch(self, url, last_modified, scrape_date):
+        """Records a refetch that found the concert unchanged, without marking
+        the row as needing a sync"""
+        raise NotImplementedError
+
+    def index(self) -> SheetIndex:
+        """URL -> last_modified of the stored concerts"""
+        raise NotImplementedError
+
+    def get_watermark(self, site_id):
+        """{'last_modified', 'sitemap_hash'} recorded by set_watermark(), or None"""
+        raise NotImplementedError
+
+    def set_watermark(self, site_id, last_modified, sitemap_hash):
+        raise NotImplementedError
+
+    def unsynced_rows(self, archived=False) -> list:
+        """Rows changed since they were last written to the sheet, or with
+        archived, archived rows not yet moved to the archive sheet"""
+        raise NotImplementedError
+
+    def archive(self, before, archived_at):
+        """Archives the concerts dated before `before`, an ISO date. They are
+        left unsynced until moved to the archive sheet. Returns the number
+        archived."""
+        raise NotImplementedError
+
+    def mark_archived(self, urls, archived_at):
+        raise NotImplementedError
+
+    def mark_synced(self, urls):
+        raise NotImplementedError
+
+    def urls(self) -> list:
+        raise NotImplementedError
+
+    def rows(self) -> list:
+        """The rows of the concerts that aren't archived"""
+        raise NotImplementedError
+
+    def set_cluster_ids(self, cluster_ids):
+        """Sets the cluster_id of each url in {url: cluster ID or None},
+        unless archived, and marks the changed rows for syncing. Returns the
+        number changed."""
+        raise NotImplementedError
+
+    def withdraw(self, urls, withdrawn_at, from_date=None):
+        """Flags the concerts as withdrawn, unless they already are or are
+        archived, or, given `from_date`, aren't dated then or later. Marks
+        them for syncing. Returns the number flagged."""
+        raise NotImplementedError
+
+    def reinstate(self, urls):
+        """Clears the withdrawn flag of those of the concerts that have it"""
+        raise NotImplementedError
+
+    def sitemap_urls(self, site_id):
+        """{url: last_modified} recorded by set_sitemap_urls(), or None"""
+        raise NotImplementedError
+
+    def set_sitemap_urls(self, site_id, urls):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def get(self, url):
+        row = self.get_row(url)
+        return row_to_concert_scrape(row) if row else None
+
+    def import_rows(self, df: pd.DataFrame, archived=False):
+        """Seeds the store from a sheet snapshot, or with archived, from the
+        archive sheet. The rows are marked synced."""
+        if df.empty or 'url' not in df.columns:
+            return
+        urls = []
+        for row in normalise_date_columns(df).to_dict('records'):
+            if row.get('url'):
+                self.upsert_row(row, synced=True)
+                urls.append(row['url'])
+        if archived:
+            self.mark_archived(urls, datetime.now().isoformat())
+
+
+def _blank_to_none(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)) or value == '':
+        return None
+    return value
+
+
+def _json_list(value):
+    if isinstance(value, list):
+        return value
+    try:
+        return json.loads(value) if value else []
+    except ValueError:
+        return []
+
+
+def content_hash(row):
+    """Hash of a row's Concert fields, which doesn't change when only the
+    scrape date or last_modified do. Blank, missing and empty values are
+    treated alike, as the sheet doesn't tell them apart.
+    """
+    canonical = {}
+    for field in Concert.model_fields:
+        value = row.get(field)
+        if field in ('performers', 'programme'):
+            value = _json_list(value)
+        else:
+            value = _blank_to_none(value)
+            value = None if value is None else str(value)
+        if value:
+            canonical[field] = value
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+def row_to_concert_scrape(row) -> ConcertScrape:
+    concert_fields = {field: _blank_to_none(row.get(field)) for field in Concert.model_fields}
+    concert_fields['title'] = concert_fields['title'] or ''
+    concert_fields['date'] = concert_fields['date'] or ''
+    concert_fields['performers'] = _json_list(row.get('performers'))
+    concert_fields['programme'] = _json_list(row.get('programme'))
+    return ConcertScrape(
+        url=row['url'],
+        scrape_date=row['scrape_date'],
+        last_modified=_blank_to_none(row.get('last_modified')),
+        concert=Concert(**concert_fields),
+    )
+
+
+class SQLiteConcertStore(ConcertStore):
+    """ConcertStore in a local SQLite database, indexed on url, date_parsed and
+    venue, with performers and programme items in child tables.
+
+    Safe to share between threads.
+    """
+    def __init__(self, path=':memory:'):
+        if path != ':memory:':
+            path = os.path.expanduser(path)
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA foreign_keys = ON')
+        self._conn.execute('PRAGMA journal_mode = WAL')
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Adds the columns that databases made by earlier versions lack"""
+        columns = {column['name'] for column in self._conn.execute('PRAGMA table_info(concerts)')}
+        for column in ('content_hash', 'withdrawn_at', 'archived_at', 'cluster_id'):
+            if column not in columns:
+                with self._conn:
+                    self._conn.execute(f'ALTER TABLE concerts ADD COLUMN {column} TEXT')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def in_memory_copy(self):
+        """A copy of the store in memory, for dry runs"""
+        copy = SQLiteConcertStore()
+        with self._lock:
+            self._conn.backup(copy._conn)
+        return copy
+
+    def upsert_row(self, row, synced=False):
+        values = {column: _blank_to_none(row.get(column)) for column in CONCERT_COLUMNS}
+        values['title'] = values['title'] or ''
+        values['content_hash'] = content_hash(row)
+        values['synced'] = int(synced)
+        columns = list(values)
+        updates = ', '.join(f'{column} = excluded.{column}' for column in columns if column != 'url')
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO concerts ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT (url) DO UPDATE SET {updates}",
+                [values[column] for column in columns])
+            self._conn.execute('DELETE FROM performers WHERE concert_url = ?', (values['url'],))
+            self._conn.executemany(
+                'INSERT INTO performers (concert_url, position, role, name) VALUES (?, ?, ?, ?)',
+                [(values['url'], position, performer.get('role'), performer.get('name'))
+                 for position, performer in enumerate(_json_list(row.get('performers')))])
+            self._conn.execute('DELETE FROM programme_items WHERE concert_url = ?', (values['url'],))
+            self._conn.executemany(
+                'INSERT INTO programme_items (concert_url, position, composer, piece) VALUES (?, ?, ?, ?)',
+                [(values['url'], position, item.get('composer'), item.get('piece'))
+                 for position, item in enumerate(_json_list(row.get('programme')))])
+
+    def _rows(self, where='', params=()):
+        """Sheet rows, with performers and programme as JSON strings as in the sheet"""
+        with self._lock:
+            concerts = self._conn.execute(
+                f"SELECT {', '.join(CONCERT_COLUMNS)} FROM concerts {where} ORDER BY rowid", params).fetchall()
+            urls = [concert['url'] for concert in concerts]
+            performers = self._children('SELECT concert_url, role, name FROM performers', urls)
+            programme = self._children('SELECT concert_url, composer, piece FROM programme_items', urls)
+        rows = []
+        for concert in concerts:
+            row = {column: concert[column] for column in CONCERT_COLUMNS}
+            row['performers'] = json.dumps(performers.get(row['url'], []))
+            row['programme'] = json.dumps(programme.get(row['url'], []))
+            rows.append({column: row[column] for column in SHEET_COLUMNS})
+        return rows
+
+    def _children(self, select, urls):
+        children = {}
+        # stay under SQLite's limit on the number of parameters
+        for start in range(0, len(urls), 500):
+            chunk = urls[start:start + 500]
+            for child in self._conn.execute(
+                    f"{select} WHERE concert_url IN ({', '.join('?' * len(chunk))}) ORDER BY concert_url, position",
+                    chunk):
+                children.setdefault(child[0], []).append({key: child[key] for key in child.keys()[1:]})
+        return children
+
+    def get_row(self, url):
+        rows = self._rows('WHERE url = ?', (url,))
+        return rows[0] if rows else None
+
+    def get_content_hash(self, url):
+        with self._lock:
+            row = self._conn.execute('SELECT content_hash FROM concerts WHERE url = ?', (url,)).fetchone()
+        return row[0] if row else None
+
+    def touch(self, url, last_modified, scrape_date):
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE concerts SET last_modified = ?, scrape_date = ? WHERE url = ?',
+                               (last_modified, scrape_date, url))
+
+    def index(self) -> SheetIndex:
+        import pandas as pd
+        from concertscrape.common.sheet_index import SheetIndex
+
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT url, last_modified, archived_at IS NOT NULL FROM concerts').fetchall()
+        return SheetIndex(pd.DataFrame([tuple(row) for row in rows], columns=['url', 'last_modified', 'archived']))
+
+    def get_watermark(self, site_id):
+        with self._lock:
+            row = self._conn.execute('SELECT last_modified, sitemap_hash FROM watermarks WHERE site_id = ?',
+                                     (site_id,)).fetchone()
+        return dict(row) if row else None
+
+    def set_watermark(self, site_id, last_modified, sitemap_hash):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO watermarks (site_id, last_modified, sitemap_hash, updated_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (site_id) DO UPDATE SET last_modified = excluded.last_modified, '
+                'sitemap_hash = excluded.sitemap_hash, updated_at = excluded.updated_at',
+                (site_id, last_modified, sitemap_hash, datetime.now().isoformat()))
+
+    def unsynced_rows(self, archived=False):
+        return self._rows(f"WHERE synced = 0 AND archived_at IS {'NOT ' if archived else ''}NULL")
+
+    def archive(self, before, archived_at):
+        with self._lock, self._conn:
+            return self._conn.execute(
+                'UPDATE concerts SET archived_at = ?, synced = 0 WHERE date_parsed < ? AND archived_at IS NULL',
+                (archived_at, before)).rowcount
+
+    def mark_archived(self, urls, archived_at):
+        with self._lock, self._conn:
+            self._conn.executemany('UPDATE concerts SET archived_at = ? WHERE url = ?',
+                                   [(archived_at, url) for url in urls])
+
+    def mark_synced(self, urls):
+        urls = list(urls)
+        with self._lock, self._conn:
+            self._conn.executemany('UPDATE concerts SET synced = 1 WHERE url = ?', [(url,) for url in urls])
+
+    def urls(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute('SELECT url FROM concerts')]
+
+    def rows(self):
+        return self._rows('WHERE archived_at IS NULL')
+
+    def set_cluster_ids(self, cluster_ids):
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                'UPDATE concerts SET cluster_id = ?, synced = 0 '
+                'WHERE url = ? AND cluster_id IS NOT ? AND archived_at IS NULL',
+                [(cluster_id, url, cluster_id) for url, cluster_id in cluster_ids.items()])
+            return self._conn.total_changes - before
+
+    def withdraw(self, urls, withdrawn_at, from_date=None):
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                'UPDATE concerts SET withdrawn_at = ?, synced = 0 '
+                'WHERE url = ? AND withdrawn_at IS NULL AND archived_at IS NULL'
+                + (' AND date_parsed >= ?' if from_date else ''),
+                [(withdrawn_at, url) + ((from_date,) if from_date else ()) for url in urls])
+            return self._conn.total_changes - before
+
+    def reinstate(self, urls):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'UPDATE concerts SET withdrawn_at = NULL, synced = 0 '
+                'WHERE url = ? AND withdrawn_at IS NOT NULL AND archived_at IS NULL',
+                [(url,) for url in urls])
+
+    def sitemap_urls(self, site_id):
+        with self._lock:
+            rows = self._conn.execute('SELECT url, last_modified FROM sitemap_urls WHERE site_id = ?',
+                                      (site_id,)).fetchall()
+        return {row[0]: row[1] for row in rows} or None
+
+    def set_sitemap_urls(self, site_id, urls):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM sitemap_urls WHERE site_id = ?', (site_id,))
+            self._conn.executemany('INSERT INTO sitemap_urls (site_id, url, last_modified) VALUES (?, ?, ?)',
+                                   [(site_id, url, last_modified) for url, last_modified in urls.items()])
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM concerts').fetchone()[0]
+
+
+def default_concert_store():
+    return SQLiteConcertStore(os.environ.get('CONCERT_DB', DEFAULT_CONCERT_DB))
@@ -0,0 +1,80 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+
+import pytest
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        start = time.monotonic()
+        host = self.headers.get('Host', '').split(':')[0]
+        record = {
+            'host': host,
+            'path': self.path,
+            'headers': dict(self.headers),
+            'start': start,
+        }
+        with server.lock:
+            server.requests.append(record)
+            server.active[host] = server.active.get(host, 0) + 1
+            server.max_active[host] = max(server.max_active.get(host, 0), server.active[host])
+
+        route = server.routes.get(self.path, (200, {}, b'ok'))
+        if callable(route):
+            route = route(self)
+        status, headers, body = route
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        time.sleep(server.response_delay)
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+        with server.lock:
+            server.active[host] -= 1
+            record['end'] = time.monotonic()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Local HTTP stand-in for the venue sites.
+
+    Serves `routes` ({path: (status, headers, body)}, or a callable taking
+    the handler and returning that) and records each request, so tests can
+    check when each host was hit. Requests to http://localhost:PORT and
+    http://127.0.0.1:PORT count as two different hosts.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.routes = {}
+        self.requests = []
+        self.active = {}
+        self.max_active = {}
+        self.response_delay = 0
+
+    def url(self, path='/', host='127.0.0.1'):
+        return f'http://{host}:{self.server_address[1]}{path}'
+
+    def requests_for(self, host):
+        return sorted((r for r in self.requests if r['host'] == host), key=lambda r: r['start'])
+
+
+@pytest.fixture
+def stand_in_server():
+    server = StandInServer()
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
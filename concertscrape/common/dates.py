@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+LAST_MODIFIED_FORMAT = '%Y-%m-%dT%H:%M:%S%z'
+
+# The venues' ways of writing a concert's date, e.g. '12 Jul 2025' on
+# oxfordphil.com and 'Friday 15 May 2020' on musicatoxford.com
+CONCERT_DATE_FORMATS = ['%d %b %Y', '%A %d %B %Y', '%d %B %Y', '%A %d %b %Y']
+
+# Sitemaps repeat their <lastmod>s (a site-wide edit touches every page at
+# once) and pages repeat their dates, so the parses are cached
+CACHE_SIZE = 8192
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_lastmod(lastmod: Optional[str]) -> Optional[datetime]:
+    """Parse a sitemap <lastmod>, which may be a full timestamp or just a date"""
+    if not lastmod:
+        return None
+    lastmod = lastmod.strip()
+    try:
+        return datetime.strptime(lastmod, LAST_MODIFIED_FORMAT)
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(lastmod, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_concert_date(text: Optional[str]) -> Optional[date]:
+    """The date of a concert page's date string, in any of
+    CONCERT_DATE_FORMATS, or None"""
+    if not text:
+        return None
+    text = ' '.join(text.split())
+    for date_format in CONCERT_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_timestamp_column(values: pd.Series) -> pd.Series:
+    """Parses a column of ISO 8601 timestamps, e.g. a sheet's last_modified,
+    in one vectorised pass, to UTC. Blank or unparseable values are NaT."""
+    import pandas as pd
+
+    return pd.to_datetime(values.replace('', None), format='ISO8601', errors='coerce', utc=True)
+
+
+def normalise_date_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """A copy of a sheet snapshot with last_modified written as the scrapers
+    write it ('2024-01-02T12:00:00Z') and date_parsed as '2024-01-02', one
+    vectorised pass per column. Values that don't parse are kept as they are.
+    """
+    df = df.copy()
+    if 'last_modified' in df.columns:
+        parsed = parse_timestamp_column(df['last_modified'])
+        df['last_modified'] = parsed.dt.strftime('%Y-%m-%dT%H:%M:%SZ').where(parsed.notna(), df['last_modified'])
+    if 'date_parsed' in df.columns:
+        import pandas as pd
+
+        parsed = pd.to_datetime(df['date_parsed'].replace('', None), format='ISO8601', errors='coerce')
+        df['date_parsed'] = parsed.dt.strftime('%Y-%m-%d').where(parsed.notna(), df['date_parsed'])
+    return df
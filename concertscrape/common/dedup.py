@@ -0,0 +1,185 @@
+from collections import defaultdict
+from difflib import SequenceMatcher
+from functools import lru_cache
+import hashlib
+import json
+import re
+import unicodedata
+
+# Words that say nothing about which concert or venue it is, e.g.
+# 'The Oxford Town Hall' and 'Town Hall' are one venue
+TITLE_STOPWORDS = {'a', 'an', 'and', 'the', 'of', 'in', 'at', 'with', 'concert'}
+VENUE_STOPWORDS = {'the', 'oxford', 'university', 'of'}
+
+# Titles at least this alike are the same concert
+TITLE_THRESHOLD = 0.85
+# or, if they share at least PERFORMER_THRESHOLD of their performers, this alike
+PERFORMER_TITLE_THRESHOLD = 0.5
+PERFORMER_THRESHOLD = 0.5
+
+# Venues and performers recur from concert to concert
+CACHE_SIZE = 8192
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+# '19:30' on oxfordphil.com, '7PM' or '7.30PM' on musicatoxford.com
+_TIME = re.compile(r'(\d{1,2})(?:[.:](\d{2}))?\s*([ap])?\.?m?\b', re.IGNORECASE)
+
+
+def normalise_words(text, stopwords=()):
+    """The words of text, lower case and without accents or punctuation"""
+    if not text:
+        return []
+    # curly apostrophes are dropped by the encode, so "Handel's" is 'handels' either way
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode().lower().replace("'", '')
+    return [word for word in _NON_WORD.split(text) if word and word not in stopwords]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def venue_key(venue):
+    """The venue's name, normalised and without the address that may follow
+    it, e.g. 'Sheldonian Theatre, Broad Street' -> 'sheldonian theatre'"""
+    if not venue:
+        return ''
+    return ' '.join(normalise_words(venue.split(',')[0], VENUE_STOPWORDS))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def start_time_key(start_time):
+    """A start time as 24-hour 'HH:MM', e.g. '7.30PM' -> '19:30', or None if
+    it can't be read"""
+    match = _TIME.search(start_time or '')
+    if not match:
+        return None
+    hour, minute = int(match[1]), int(match[2] or 0)
+    if match[3] and match[3].lower() == 'p' and hour < 12:
+        hour += 12
+    elif match[3] and match[3].lower() == 'a' and hour == 12:
+        hour = 0
+    if hour > 23 or minute > 59:
+        return None
+    return f'{hour:02d}:{minute:02d}'
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _name_key(name):
+    return ' '.join(normalise_words(name))
+
+
+def _performer_names(performers):
+    if isinstance(performers, str):
+        try:
+            performers = json.loads(performers) if performers else []
+        except ValueError:
+            performers = []
+    return frozenset(_name_key(performer['name']) for performer in performers if performer.get('name'))
+
+
+def block_key(row):
+    """(date_parsed, normalised venue), or None for a concert without both,
+    which can't be placed, so is never matched"""
+    date_parsed = row.get('date_parsed')
+    venue = venue_key(row.get('venue')) if date_parsed else None
+    return (str(date_parsed), venue) if venue else None
+
+
+class ConcertKey:
+    """The parts of a concert row that tell duplicates apart, normalised
+    once so that each comparison is cheap"""
+    __slots__ = ('url', 'start_time', 'title', 'title_words', 'performers')
+
+    def __init__(self, row):
+        self.url = row['url']
+        self.start_time = start_time_key(row.get('start_time'))
+        words = normalise_words(row.get('title'), TITLE_STOPWORDS)
+        self.title = ' '.join(words)
+        self.title_words = frozenset(words)
+        self.performers = _performer_names(row.get('performers'))
+
+
+def _overlap(a, b):
+    """How much of the smaller set is in the other"""
+    return len(a & b) / min(len(a), len(b)) if a and b else 0.0
+
+
+def title_similarity(a, b):
+    """0 to 1. Titles whose words are all in the other's count as alike, as a
+    venue's listing often adds the series or ensemble to the title."""
+    if a.title == b.title:
+        return 1.0
+    overlap = _overlap(a.title_words, b.title_words)
+    if overlap == 1.0:
+        return 1.0
+    matcher = SequenceMatcher(None, a.title, b.title, autojunk=False)
+    # the quick ratios are upper bounds of ratio(), and much cheaper
+    if min(matcher.real_quick_ratio(), matcher.quick_ratio()) < PERFORMER_TITLE_THRESHOLD:
+        return overlap
+    return max(overlap, matcher.ratio())
+
+
+def is_duplicate(a, b):
+    """Whether two ConcertKeys of the same block are the same concert"""
+    if a.start_time and b.start_time and a.start_time != b.start_time:
+        # e.g. a matinee and an evening performance
+        return False
+    similarity = title_similarity(a, b)
+    if similarity >= TITLE_THRESHOLD:
+        return True
+    return similarity >= PERFORMER_TITLE_THRESHOLD and _overlap(a.performers, b.performers) >= PERFORMER_THRESHOLD
+
+
+def block(rows):
+    """{block_key: [row]}, leaving out the rows that can't be placed"""
+    blocks = defaultdict(list)
+    for row in rows:
+        key = block_key(row)
+        if key is not None:
+            blocks[key].append(row)
+    return blocks
+
+
+def cluster_id(urls):
+    """An ID for a cluster, which stays the same while its first URL is in it"""
+    return hashlib.sha256(min(urls).encode()).hexdigest()[:12]
+
+
+def find_clusters(rows):
+    """{url: cluster ID} for every row, the ID being shared by the rows that
+    are the same concert (e.g. listed by both the venue and the orchestra),
+    and None for a concert listed once.
+
+    Only concerts on the same date at the same venue are compared, so the
+    time taken grows with the number of rows rather than its square, and
+    only those are normalised for comparing.
+    """
+    rows = list(rows)
+    parent = {row['url']: row['url'] for row in rows}
+
+    def find(url):
+        while parent[url] != url:
+            parent[url] = parent[parent[url]]
+            url = parent[url]
+        return url
+
+    for block_rows in block(rows).values():
+        if len(block_rows) < 2:
+            continue
+        concerts = [ConcertKey(row) for row in block_rows]
+        for i, a in enumerate(concerts):
+            for b in concerts[i + 1:]:
+                if find(a.url) != find(b.url) and is_duplicate(a, b):
+                    parent[find(a.url)] = find(b.url)
+
+    members = defaultdict(list)
+    for url in parent:
+        members[find(url)].append(url)
+    cluster_ids = dict.fromkeys(parent)
+    for urls in members.values():
+        if len(urls) > 1:
+            cluster_ids.update(dict.fromkeys(urls, cluster_id(urls)))
+    return cluster_ids
+
+
+def cluster_duplicates(store):
+    """Sets the cluster_id of the store's current concerts. Returns the
+    number of rows changed, which are left to be synced."""
+    return store.set_cluster_ids(find_clusters(store.rows()))
@@ -0,0 +1,112 @@
+import re
+
+import pandas as pd
+
+
+def a1_range_to_grid_range(a1_range):
+    """'B2:C4' -> 0-based, end-exclusive row and column indices, as the API's GridRange"""
+    (start_col, start_row), (end_col, end_row) = re.findall(r'([A-Z]+)(\d+)', a1_range)
+
+    def column_index(letters):
+        index = 0
+        for letter in letters:
+            index = index * 26 + ord(letter) - ord('A') + 1
+        return index
+
+    return {
+        'startRowIndex': int(start_row) - 1,
+        'endRowIndex': int(end_row),
+        'startColumnIndex': column_index(start_col) - 1,
+        'endColumnIndex': column_index(end_col),
+    }
+
+
+class FakeSpreadsheet:
+    """The spreadsheet of a FakeWorksheet, whose batch_update only deletes rows"""
+    def __init__(self, spread):
+        self.spread = spread
+
+    def batch_update(self, body):
+        self.spread.calls['spreadsheet_batch_update'] += 1
+        for request in body['requests']:
+            grid_range = request['deleteDimension']['range']
+            assert grid_range['dimension'] == 'ROWS'
+            # row 0 is the header
+            start, end = grid_range['startIndex'] - 1, grid_range['endIndex'] - 1
+            self.spread.df = pd.concat([self.spread.df.iloc[:start], self.spread.df.iloc[end:]], ignore_index=True)
+            self.spread.sheet.row_count -= end - start
+
+
+class FakeWorksheet:
+    id = 0
+
+    def __init__(self, spread, rows, cols):
+        self.spread = spread
+        self.spreadsheet = FakeSpreadsheet(spread)
+        self.row_count = rows
+        self.col_count = cols
+
+    def row_values(self, row):
+        self.spread.calls['row_values'] += 1
+        if row == 1:
+            return [str(column) for column in self.spread.df.columns]
+        values = self.spread.df.fillna('').astype(str).values.tolist()
+        return values[row - 2] if row - 2 < len(values) else []
+
+    def append_rows(self, values, value_input_option='RAW', **kwargs):
+        """Adds rows after the last one, growing the grid as the API does"""
+        self.spread.calls['append_rows'] += 1
+        self.spread.cells_written += sum(len(row) for row in values)
+        if self.spread.df.columns.empty:
+            header, values = values[0], values[1:]
+            self.spread.df = pd.DataFrame(columns=header)
+        width = len(self.spread.df.columns)
+        appended = pd.DataFrame([row + [''] * (width - len(row)) for row in values], columns=self.spread.df.columns)
+        self.spread.df = pd.concat([self.spread.df, appended], ignore_index=True)
+        self.row_count = max(self.row_count, len(self.spread.df) + 1)
+
+    def resize(self, rows=None, cols=None):
+        self.spread.calls['resize'] += 1
+        self.row_count = rows or self.row_count
+        self.col_count = cols or self.col_count
+
+    def batch_update(self, data, raw=True, **kwargs):
+        """Sets the values of A1 ranges, the header being row 1"""
+        self.spread.calls['batch_update'] += 1
+        grid = [list(self.spread.df.columns)] + self.spread.df.fillna('').astype(str).values.tolist()
+        for update in data:
+            grid_range = a1_range_to_grid_range(update['range'])
+            if grid_range['endRowIndex'] > self.row_count or grid_range['endColumnIndex'] > self.col_count:
+                raise ValueError(f"Range {update['range']} exceeds grid limits")
+            for row_offset, values in enumerate(update['values']):
+                row = grid_range['startRowIndex'] + row_offset
+                grid.extend([] for _ in range(row + 1 - len(grid)))
+                for col_offset, value in enumerate(values):
+                    col = grid_range['startColumnIndex'] + col_offset
+                    grid[row].extend('' for _ in range(col + 1 - len(grid[row])))
+                    grid[row][col] = value
+                    self.spread.cells_written += 1
+        width = len(grid[0])
+        self.spread.df = pd.DataFrame([row + [''] * (width - len(row)) for row in grid[1:]], columns=grid[0])
+
+
+class FakeSpread:
+    """In-memory stand-in for gspread_pandas.Spread, for tests and benchmarks.
+
+    Counts the calls made, in the same shape as the real API, and the cells
+    written. Its worksheet has a grid of `rows` x `cols`, like a real one, and
+    refuses writes outside it.
+    """
+    def __init__(self, df=None, rows=1000, cols=26):
+        self.df = df.copy() if df is not None else pd.DataFrame()
+        self.sheet = FakeWorksheet(self, max(rows, len(self.df) + 1), max(cols, len(self.df.columns)))
+        self.calls = {'sheet_to_df': 0, 'resize': 0, 'batch_update': 0, 'row_values': 0, 'append_rows': 0,
+                      'spreadsheet_batch_update': 0}
+        self.cells_written = 0
+
+    def sheet_to_df(self, index=1, **kwargs):
+        self.calls['sheet_to_df'] += 1
+        # the real API returns every cell as a string, and leaves out blank
+        # rows but not their positions
+        df = self.df.copy().fillna('').astype(str)
+        return df[(df != '').any(axis=1)]
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60  # seconds
+
+
+class HTTPCache:
+    """On-disk cache of GET responses, revalidated with conditional requests.
+
+    Bodies are stored with their ETag / Last-Modified validators. Later
+    requests for the same URL send If-None-Match / If-Modified-Since, and a
+    304 reply is served from disk. Entries older than `max_age` seconds are
+    dropped, and the least recently stored are evicted when the cache grows
+    past `max_bytes`.
+    """
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.bytes_downloaded = 0
+        self._total_bytes = sum(entry['size'] for entry in self._iter_entries())
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + '.json', base + '.body'
+
+    def _iter_entries(self):
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    yield json.load(f)
+            except (OSError, ValueError):
+                continue
+
+    def _remove(self, url):
+        meta_path, body_path = self._paths(url)
+        for path in (meta_path, body_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def lookup(self, url):
+        """Returns the stored entry for the url, or None if missing or too old"""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry['stored_at'] > self.max_age or not os.path.exists(body_path):
+            with self._lock:
+                self._remove(url)
+                self._total_bytes -= entry['size']
+            return None
+        return entry
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def record_miss(self, response):
+        with self._lock:
+            self.misses += 1
+            self.bytes_downloaded += len(response.content)
+
+    def store(self, url, response):
+        """Stores a 200 response, if it has validators to revalidate it with"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not (etag or last_modified):
+            return
+
+        entry = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            # the body is stored decoded, so drop headers describing the wire format
+            'headers': {name: value for name, value in response.headers.items()
+                        if name.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')},
+            'encoding': response.encoding,
+            'stored_at': time.time(),
+            'size': len(response.content),
+        }
+        meta_path, body_path = self._paths(url)
+        with self._lock:
+            previous = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+            # write to temporary files first, so readers never see half an entry
+            for path, data, mode in ((body_path, response.content, 'wb'), (meta_path, json.dumps(entry), 'w')):
+                with open(path + '.tmp', mode) as f:
+                    f.write(data)
+                os.replace(path + '.tmp', path)
+            self._total_bytes += entry['size'] - previous
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Removes expired entries, then the oldest until under max_bytes"""
+        now = time.time()
+        entries = sorted(self._iter_entries(), key=lambda entry: entry['stored_at'])
+        total = sum(entry['size'] for entry in entries)
+        for entry in entries:
+            if total <= self.max_bytes and now - entry['stored_at'] <= self.max_age:
+                continue
+            self._remove(entry['url'])
+            total -= entry['size']
+        self._total_bytes = total
+
+    def cached_response(self, entry, not_modified):
+        """Builds a 200 response from disk, for a 304 reply to a conditional request"""
+        meta_path, body_path = self._paths(entry['url'])
+        with open(body_path, 'rb') as f:
+            content = f.read()
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += len(content)
+            # revalidated, so it is fresh again
+            entry = {**entry, 'stored_at': time.time()}
+            with open(meta_path + '.tmp', 'w') as f:
+                f.write(json.dumps(entry))
+            os.replace(meta_path + '.tmp', meta_path)
+
+        response = requests.Response()
+        response.status_code = 200
+        response._content = content
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = entry['encoding']
+        response.url = not_modified.url
+        response.request = not_modified.request
+        response.elapsed = not_modified.elapsed
+        response.from_cache = True
+        return response
+
+    def summary(self):
+        return {
+            'HTTP cache hits': self.hits,
+            'HTTP cache misses': self.misses,
+            'HTTP cache bytes saved': self.bytes_saved,
+            'HTTP bytes downloaded': self.bytes_downloaded,
+        }
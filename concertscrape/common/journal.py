@@ -0,0 +1,98 @@
+from datetime import datetime
+import json
+import os
+import threading
+import uuid
+
+DEFAULT_JOURNAL = '~/.cache/concertscrape/journal.jsonl'
+
+
+class RunJournal:
+    """Append-only record of the URLs a run has finished with, so that a run
+    that dies partway can be resumed without redoing them.
+
+    The concerts themselves, and whether they've been written to the sheet,
+    are in the ConcertStore; the journal adds the URLs the store can't tell
+    are done, e.g. pages that had gone or archived pages already re-extracted.
+    Each line is flushed as it is written, so a crash loses at most the line
+    being written.
+    """
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.run = None
+        # URLs done by the run being resumed
+        self.completed = set()
+        self._file = None
+        self._lock = threading.Lock()
+
+    def iter_records(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # a partly written last line, from a crash
+                    continue
+
+    def unfinished_run(self, kind):
+        """(run id, URLs it completed) of the journal's run, if it is of `kind`
+        and didn't finish, otherwise None"""
+        run = None
+        completed = set()
+        for record in self.iter_records():
+            if record['event'] == 'start':
+                run = record['run'] if record['kind'] == kind else None
+                completed = set()
+            elif record['event'] == 'finish':
+                run = None
+            elif record['event'] == 'complete' and record['run'] == run:
+                completed.add(record['url'])
+        return (run, completed) if run else None
+
+    def start(self, kind, resume=False):
+        """Starts a run of `kind` ('scrape' or 'reextract'). With resume, carries
+        on the journal's unfinished run of that kind, if there is one, and
+        returns the URLs it had completed. Otherwise the journal is started
+        afresh, and returns an empty set.
+        """
+        unfinished = self.unfinished_run(kind) if resume else None
+        with self._lock:
+            if unfinished:
+                self.run, self.completed = unfinished
+                self._file = open(self.path, 'a')
+                if self._file.tell() and not self._ends_with_newline():
+                    # end the line the crash cut short, so it's skipped on its own
+                    self._file.write('\n')
+            else:
+                self.run, self.completed = uuid.uuid4().hex, set()
+                self._file = open(self.path, 'w')
+                self._write({'event': 'start', 'run': self.run, 'kind': kind,
+                             'at': datetime.now().isoformat()})
+        return self.completed
+
+    def complete(self, url, outcome):
+        """Records that the run is done with url, e.g. outcome 'new' or 'gone'"""
+        with self._lock:
+            self._write({'event': 'complete', 'run': self.run, 'url': url, 'outcome': outcome})
+
+    def finish(self):
+        with self._lock:
+            self._write({'event': 'finish', 'run': self.run, 'at': datetime.now().isoformat()})
+            self._file.close()
+            self._file = None
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def _write(self, record):
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+
+
+def default_run_journal():
+    return RunJournal(os.environ.get('RUN_JOURNAL', DEFAULT_JOURNAL))
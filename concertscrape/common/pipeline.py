@@ -0,0 +1,137 @@
+import queue
+import threading
+
+# Items waiting between two stages. Bounds the pages held in memory, and
+# makes a stage that gets ahead wait for the next one.
+DEFAULT_QUEUE_SIZE = 16
+
+# How often blocked workers check whether the pipeline was cancelled
+POLL_INTERVAL = 0.05
+
+_END = object()
+
+
+class Stage:
+    """A step of a Pipeline: `function` takes an item and returns the item for
+    the next stage, or None to drop it. Runs on `workers` threads.
+
+    If `function` raises, on_error(item, exception) is called and the item
+    dropped. Without an on_error, the exception cancels the pipeline and is
+    raised from Pipeline.run().
+    """
+    def __init__(self, name, function, workers=1, on_error=None):
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.on_error = on_error
+
+
+class Pipeline:
+    """Stages run at the same time, each on threads of its own, joined by
+    queues of `queue_size` items, so the run takes about as long as its
+    slowest stage rather than the sum of them. A stage whose output queue is
+    full waits, which in turn holds up the ones before it.
+
+        Pipeline([Stage('fetch', fetch, workers=4), Stage('write', write)]).run(urls)
+
+    cancel(), from any thread, stops the workers after the items they're on,
+    and run() then returns.
+    """
+    def __init__(self, stages, queue_size=DEFAULT_QUEUE_SIZE):
+        self.stages = stages
+        self.queue_size = queue_size
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self._running = [stage.workers for stage in stages]
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._error = None
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def run(self, items):
+        """Feeds `items` through the stages, from the calling thread, and waits
+        for them all to be done with"""
+        threads = [
+            threading.Thread(target=self._work, args=(position,), name=f'{stage.name}-{n}', daemon=True)
+            for position, stage in enumerate(self.stages)
+            for n in range(stage.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            try:
+                for item in items:
+                    if not self._put(self._queues[0], item):
+                        break
+            finally:
+                for _ in range(self.stages[0].workers):
+                    self._put(self._queues[0], _END)
+            for thread in threads:
+                thread.join()
+        except BaseException:
+            # e.g. a KeyboardInterrupt, or an error reading `items`
+            self.cancel()
+            for thread in threads:
+                thread.join()
+            raise
+        if self._error is not None:
+            raise self._error
+
+    def _work(self, position):
+        stage = self.stages[position]
+        outbox = self._queues[position + 1] if position + 1 < len(self.stages) else None
+        try:
+            while True:
+                item = self._get(self._queues[position])
+                if item is _END:
+                    return
+                try:
+                    result = stage.function(item)
+                except Exception as e:
+                    if stage.on_error is None:
+                        raise
+                    stage.on_error(item, e)
+                    continue
+                if result is not None and outbox is not None and not self._put(outbox, result):
+                    return
+        except BaseException as e:
+            with self._lock:
+                if self._error is None:
+                    self._error = e
+            self.cancel()
+        finally:
+            self._stage_worker_done(position)
+
+    def _stage_worker_done(self, position):
+        with self._lock:
+            self._running[position] -= 1
+            last = self._running[position] == 0
+        if last and position + 1 < len(self.stages):
+            # the next stage's workers each stop at one of these, once the
+            # items before them are done
+            for _ in range(self.stages[position + 1].workers):
+                self._put(self._queues[position + 1], _END)
+
+    def _get(self, inbox):
+        while not self.cancelled:
+            try:
+                return inbox.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _put(self, outbox, item):
+        """Returns False, without putting the item, if the pipeline was
+        cancelled while waiting for room"""
+        while not self.cancelled:
+            try:
+                outbox.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -0,0 +1,114 @@
+from collections import Counter
+import os
+import subprocess
+import sys
+import threading
+
+DEFAULT_PROFILE_OUTPUT = 'profile.collapsed'
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class SamplingProfiler:
+    """Samples the stacks of all the threads every `interval` seconds, from a
+    thread of its own.
+
+    Unlike cProfile, it sees every thread (fetching happens on pools of them)
+    and costs the profiled code almost nothing, at the price of only being
+    statistically accurate. Worker processes aren't sampled.
+
+        with SamplingProfiler() as profiler:
+            ...
+        profiler.write_collapsed('profile.collapsed')
+    """
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        # 'outermost;...;innermost' frame labels -> number of samples
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='SamplingProfiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(skip_thread=own_id)
+
+    def sample(self, skip_thread=None):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip_thread:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(labels))] += 1
+        self.samples += 1
+
+    def write_collapsed(self, path):
+        """Writes the stacks in the collapsed format read by flamegraph.pl,
+        speedscope and inferno"""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+    def hot_functions(self, n=10):
+        """[(function, samples at the top of the stack, samples anywhere in it)]
+        for the n functions seen running most often"""
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            labels = stack.split(';')
+            own[labels[-1]] += count
+            for label in set(labels):
+                total[label] += count
+        return [(label, count, total[label]) for label, count in own.most_common(n)]
+
+    def print_hot_functions(self, n=10):
+        print(f"\nHottest {n} functions ({self.samples} samples every {self.interval * 1e3:g}ms, all threads):")
+        print(f"  {'own':>7}{'total':>8}  function")
+        for label, own, total in self.hot_functions(n):
+            print(f"  {own:>7}{total:>8}  {label}")
+
+
+def measure_import(module, runs=3):
+    """Imports `module` in fresh interpreters with `python -X importtime`.
+
+    Returns (seconds, {imported module: cumulative seconds}) of the fastest
+    run, so a one-off hiccup doesn't count.
+    """
+    best = None
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                capture_output=True, text=True, check=True)
+        cumulative = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            # import time: self [us] | cumulative | imported package
+            _, cumulative_us, name = line.split('|')
+            cumulative[name.strip()] = int(cumulative_us) / 1e6
+        seconds = cumulative[module]
+        if best is None or seconds < best[0]:
+            best = (seconds, cumulative)
+    return best
@@ -0,0 +1,32 @@
+import importlib
+
+# The modules defining the sites' scrapers. Each registers its SitemapScraper
+# subclass with @register when imported. A new venue is added here.
+SITE_MODULES = [
+    'concertscrape.musicatoxford.mao',
+    'concertscrape.oxfordphil.oxfordphil',
+]
+
+_scrapers = {}
+
+
+def register(scraper_class):
+    """Class decorator adding a SitemapScraper subclass to the registry, by its
+    site_id"""
+    if scraper_class.site_id in _scrapers and _scrapers[scraper_class.site_id] is not scraper_class:
+        raise ValueError(f"Two scrapers registered for {scraper_class.site_id}")
+    _scrapers[scraper_class.site_id] = scraper_class
+    return scraper_class
+
+
+def get_scrapers(site_ids=None):
+    """The registered scraper classes, in SITE_MODULES order, or just those
+    for `site_ids`"""
+    for module in SITE_MODULES:
+        importlib.import_module(module)
+    if not site_ids:
+        return list(_scrapers.values())
+    unknown = [site_id for site_id in site_ids if site_id not in _scrapers]
+    if unknown:
+        raise ValueError(f"Unknown sites: {', '.join(unknown)}. Known: {', '.join(_scrapers)}")
+    return [_scrapers[site_id] for site_id in site_ids]
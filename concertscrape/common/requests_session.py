@@ -1,23 +1,278 @@
-import requests
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import os
+import random
+import threading
 import time
+from urllib.parse import urlsplit
+
+import requests
+
+from concertscrape.common.http_cache import HTTPCache
+
+
+REQUESTS_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:133.0) Gecko/20100101 Firefox/133.0"
+}
+
+# the host is throttling us or struggling, so worth another go later
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# safe to send twice
+RETRY_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait given a Retry-After header, either seconds or an HTTP
+    date, or None if there isn't a usable one"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - (now or datetime.now(timezone.utc))).total_seconds())
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the request rate to one host.
+
+    `rate` tokens are added per second, up to `burst`. Each request takes a
+    token and also one of `max_in_flight` concurrent slots.
+
+    The rate adapts to how the host is coping: slow_down() halves it (down to
+    `min_rate`) and speed_up() adds back a tenth of the starting rate, which
+    is also the most it goes back up to. pause() stops all requests to the
+    host for a while, e.g. for a Retry-After.
+    """
+    def __init__(self, rate, burst=1, max_in_flight=1, min_rate=None):
+        self.rate = rate
+        self.max_rate = rate
+        self.min_rate = min(rate, min_rate) if min_rate else rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self._lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+
+    def _take_token(self):
+        """Returns 0 if a token was taken, otherwise the seconds to wait for one"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """Blocks until a request may start. Returns the seconds spent waiting."""
+        start = time.monotonic()
+        self._in_flight.acquire()
+        while True:
+            wait = self._take_token()
+            if not wait:
+                return time.monotonic() - start
+            time.sleep(wait)
+
+    def release(self):
+        self._in_flight.release()
+
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def slow_down(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def speed_up(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
 
 class RateLimitedRequestsSession(requests.Session):
-    def __init__(self, rate_limit_enabled=True, delay=1.0):
+    """requests.Session that is polite to each host separately, and is safe to
+    share between threads.
+
+    Each host gets its own TokenBucket, so requests to one host are spaced out
+    by `delay` seconds (after any `burst`), while different hosts are fetched
+    at the same time. `host_limits` overrides the settings per host, e.g.
+    {'oxfordphil.com': {'delay': 2.0, 'burst': 1, 'max_in_flight': 1}}
+
+    A host that answers 429 or 5xx, fails to connect, or takes longer than
+    `slow_response` seconds is slowed down, up to `max_delay` between
+    requests, and sped back up to `delay` as it recovers. Idempotent requests
+    are retried up to `retries` times on those errors, after the host's
+    Retry-After or else an exponential backoff from `backoff` seconds, with
+    jitter. A Retry-After beyond `max_retry_after` isn't waited for: the
+    response is returned as it is.
+
+    With an HTTPCache, GET requests are revalidated against the cached copy
+    and 304 replies are served from disk.
+
+    Each response's `rate_limit_wait` is the seconds it spent waiting for its
+    host's rate limit, and between retries, rather than on the network.
+    """
+    def __init__(self, rate_limit_enabled=True, delay=1.0, burst=1, max_in_flight=1, host_limits=None,
+                 cache=None, retries=3, backoff=1.0, max_backoff=60.0, max_retry_after=300.0, max_delay=30.0,
+                 slow_response=10.0):
         super().__init__()
-        self.last_request_time = 0
+        self.headers.update(REQUESTS_HEADERS)
+        self.cache = cache
         self.rate_limit_enabled = rate_limit_enabled
         self.delay = delay
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.host_limits = host_limits or {}
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.max_delay = max_delay
+        self.slow_response = slow_response
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        # run-wide counters, see summary()
+        self.requests_made = 0
+        self.bytes_received = 0
+        self.sleep_seconds = 0.0
+        self.retries_made = 0
+        self._counters_lock = threading.Lock()
+
+    def limit(self, url, name):
+        """The setting `name` for url's host"""
+        return self.host_limits.get(urlsplit(url).netloc, {}).get(name, getattr(self, name))
 
-    def request(self, *args, **kwargs):
-        if self.rate_limit_enabled:
-            elapsed = time.time() - self.last_request_time
-            if elapsed < self.delay:
-                time.sleep(self.delay - elapsed)
-        
-        response = super().request(*args, **kwargs)
-        self.last_request_time = time.time()
+    def bucket_for(self, url):
+        host = urlsplit(url).netloc
+        with self._buckets_lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(
+                    rate=1.0 / self.limit(url, 'delay'),
+                    burst=self.limit(url, 'burst'),
+                    max_in_flight=self.limit(url, 'max_in_flight'),
+                    min_rate=1.0 / self.limit(url, 'max_delay'),
+                )
+            return self._buckets[host]
+
+    def request(self, method, url, *args, **kwargs):
+        if self.cache is None or method.upper() != 'GET':
+            return self._rate_limited_request(method, url, *args, **kwargs)
+
+        entry = self.cache.lookup(url)
+        if entry:
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), **self.cache.conditional_headers(entry)}
+        response = self._rate_limited_request(method, url, *args, **kwargs)
+
+        if response.status_code == 304 and entry:
+            cached = self.cache.cached_response(entry, not_modified=response)
+            cached.rate_limit_wait = response.rate_limit_wait
+            return cached
+        self.cache.record_miss(response)
+        if response.status_code == 200:
+            self.cache.store(url, response)
         return response
 
-REQUESTS_HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:133.0) Gecko/20100101 Firefox/133.0"
-}
+    def _rate_limited_request(self, method, url, *args, **kwargs):
+        bucket = self.bucket_for(url) if self.rate_limit_enabled else None
+        retries = self.limit(url, 'retries') if method.upper() in RETRY_METHODS else 0
+        attempt = 0
+        waited = 0.0
+        while True:
+            response, error, wait = None, None, None
+            if bucket is not None:
+                acquired = bucket.acquire()
+                waited += acquired
+                self._add_sleep(acquired)
+            try:
+                start = time.monotonic()
+                try:
+                    response = self._counted_request(method, url, *args, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+                stressed = error is not None or response.status_code in RETRY_STATUSES
+                if stressed and attempt < retries:
+                    wait = self.retry_wait(url, response, attempt)
+                if bucket is not None:
+                    if stressed or time.monotonic() - start > self.limit(url, 'slow_response'):
+                        bucket.slow_down()
+                    else:
+                        bucket.speed_up()
+                    if wait is not None:
+                        # the whole host waits, not just this request, from
+                        # before anything else can be sent to it
+                        bucket.pause(wait)
+            finally:
+                if bucket is not None:
+                    bucket.release()
+
+            if wait is None:
+                if error is not None:
+                    raise error
+                response.rate_limit_wait = waited
+                return response
+            attempt += 1
+            with self._counters_lock:
+                self.retries_made += 1
+            if response is not None:
+                response.close()
+            if bucket is None:
+                time.sleep(wait)
+                waited += wait
+                self._add_sleep(wait)
+
+    def retry_wait(self, url, response, attempt):
+        """Seconds to wait before retrying, or None not to"""
+        retry_after = parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+        if retry_after is not None:
+            return retry_after if retry_after <= self.limit(url, 'max_retry_after') else None
+        wait = min(self.limit(url, 'max_backoff'), self.limit(url, 'backoff') * 2 ** attempt)
+        # so requests that failed together don't all come back together
+        return random.uniform(wait / 2, wait)
+
+    def _add_sleep(self, seconds):
+        with self._counters_lock:
+            self.sleep_seconds += seconds
+
+    def _counted_request(self, method, url, *args, **kwargs):
+        response = super().request(method, url, *args, **kwargs)
+        with self._counters_lock:
+            self.requests_made += 1
+            if not kwargs.get('stream'):
+                self.bytes_received += len(response.content)
+        return response
+
+    def summary(self):
+        return {
+            'HTTP requests': self.requests_made,
+            'HTTP bytes received': self.bytes_received,
+            'Rate limit sleep seconds': round(self.sleep_seconds, 3),
+            'HTTP retries': self.retries_made,
+        }
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def default_requests_session():
+    """The session shared by all the site scrapers, so each host has one rate
+    limit however many sites are scraped at once. Created on first use. Set
+    HTTP_CACHE_DIR to cache responses.
+    """
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = RateLimitedRequestsSession(
+                rate_limit_enabled=not os.environ.get("DISABLE_RATELIMITING"),
+                cache=HTTPCache(os.environ["HTTP_CACHE_DIR"]) if os.environ.get("HTTP_CACHE_DIR") else None,
+            )
+        return _default_session
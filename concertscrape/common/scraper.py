@@ -0,0 +1,525 @@
+from concertscrape.common.concert_schema import Concert, ConcertScrape
+from concertscrape.common.concert_sheet import ARCHIVE_SHEET, SheetHandler, concert_scrape_to_row
+from concertscrape.common.concert_store import content_hash, default_concert_store
+from concertscrape.common.dates import parse_lastmod
+from concertscrape.common.dedup import cluster_duplicates
+from concertscrape.common.journal import default_run_journal
+from concertscrape.common.pipeline import DEFAULT_QUEUE_SIZE, Pipeline, Stage
+from concertscrape.common.profiling import SamplingProfiler
+from concertscrape.common.sitemap import diff_sitemaps, iter_sitemap
+from concertscrape.common.snapshots import SnapshotStore, default_snapshot_store
+from concertscrape.common.stats import ScrapingStats, ScrapeResult
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+import hashlib
+import logging
+import os
+import time
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+def default_requests_session():
+    # requests is only needed once something is fetched
+    from concertscrape.common.requests_session import default_requests_session
+    return default_requests_session()
+
+# Concert pages fetched at once. The session's per-host limits still apply, so
+# this mostly lets pages from different hosts be fetched side by side.
+DEFAULT_MAX_WORKERS = 4
+
+# Concerts are archived this many days after they happen
+DEFAULT_ARCHIVE_AFTER_DAYS = 7
+
+
+class SitemapScraper:
+    """Scrapes a venue's concerts, found from its sitemap.
+
+    Subclasses set `site_id` and `sitemap_url`, and provide is_concert_url()
+    and extract_concert(). extract_concert is a staticmethod wrapping a
+    module-level function, so it can be sent to worker processes.
+
+    Concerts are written to `store`, a ConcertStore; the sheet is synced from
+    it afterwards (see run_scrapers).
+
+    Pages are fetched, extracted and stored by a Pipeline, each stage at the
+    same time as the others: fetching on `max_workers` threads, extracting on
+    `extract_workers`, and writing on one. Given an `extract_pool` (a
+    ProcessPoolExecutor), the extract threads hand the pages to it, so that
+    parsing isn't limited to one core. `queue_size` pages at most wait
+    between two stages.
+
+    Given a started RunJournal, each URL is recorded there once done with, and
+    the URLs a resumed run had already done are skipped.
+
+    After a scrape with no errors, the site's watermark is kept in the store:
+    the latest <lastmod> in the sitemap, and the sitemap's hash. The next
+    scrape takes the entries no newer than it as unchanged without looking
+    them up, and skips the site altogether if the sitemap is byte for byte
+    the same. scrape(full=True) ignores the watermark.
+
+    The sitemap's concert URLs are kept in the store too, and the concerts
+    removed from it since the last scrape are flagged as withdrawn.
+    """
+    site_id = None
+    sitemap_url = None
+
+    def __init__(self, store, session=None, stats=None, max_workers=DEFAULT_MAX_WORKERS,
+                 snapshots=None, extract_pool=None, journal=None, extract_workers=1,
+                 queue_size=DEFAULT_QUEUE_SIZE):
+        self.store = store
+        self.session = session or default_requests_session()
+        self.stats = stats or ScrapingStats()
+        self.max_workers = max_workers
+        self.snapshots = snapshots
+        self.extract_pool = extract_pool
+        self.extract_workers = extract_workers
+        self.queue_size = queue_size
+        self.journal = journal
+        self._pipeline = None
+        self._cancelled = False
+        # child sitemaps read, when the sitemap is a sitemap index
+        self._child_sitemaps = 0
+
+    def is_concert_url(self, url):
+        raise NotImplementedError
+
+    @staticmethod
+    def extract_concert(html_content):
+        raise NotImplementedError
+
+    def owns_url(self, url):
+        """Whether url is a concert page of this site"""
+        return urlsplit(url).netloc == urlsplit(self.sitemap_url).netloc and self.is_concert_url(url)
+
+    def stats_add_concert(self, result):
+        self.stats.add_concert(self.site_id, result)
+
+    def already_done(self, url):
+        """Whether the run being resumed was done with url"""
+        return self.journal is not None and url in self.journal.completed
+
+    def journal_complete(self, url, outcome):
+        if self.journal is not None:
+            self.journal.complete(url, outcome)
+
+    def iter_sitemap(self, sitemap_content):
+        """Yields a dict of url and lastmod for each concert in the sitemap,
+        following any sitemap index, as it is parsed"""
+        for url, lastmod in iter_sitemap(sitemap_content, url_filter=self.is_concert_url,
+                                         fetch=self.fetch_child_sitemap):
+            yield {'url': url, 'lastmod': lastmod}
+
+    def parse_sitemap(self, sitemap_content):
+        return list(self.iter_sitemap(sitemap_content))
+
+    def needs_update(self, concert_url, lastmod, index):
+        return index.status(concert_url, lastmod)
+
+    def timed_get(self, url, phase, timed_url=None):
+        """session.get(url), timing the request as `phase` and the time it
+        waited for the host's rate limit apart, as 'rate_limit_wait', so that
+        the phase's times are the host's and not the queue's. Both are added
+        to `timed_url`'s times if given."""
+        start = time.perf_counter()
+        response = self.session.get(url)
+        seconds = time.perf_counter() - start
+        wait = getattr(response, 'rate_limit_wait', 0.0)
+        self.stats.record_time('rate_limit_wait', wait, url=timed_url)
+        self.stats.record_time(phase, seconds - wait, url=timed_url)
+        return response
+
+    def fetch_content(self, url):
+        response = self.timed_get(url, 'sitemap_fetch')
+        response.raise_for_status()
+        return response.content
+
+    def fetch_sitemap(self):
+        return self.fetch_content(self.sitemap_url)
+
+    def fetch_child_sitemap(self, url):
+        self._child_sitemaps += 1
+        return self.fetch_content(url)
+
+    def fetch_page(self, url, last_modified):
+        """Fetches and archives a concert page. Returns (html, scrape_date), or
+        None if the page has gone."""
+        response = self.timed_get(url, 'page_fetch', timed_url=url)
+        if response.status_code == 404:
+            # this sometimes happens
+            logger.warning(f"Concert page not found: {url}")
+            return None
+        response.raise_for_status()
+        scrape_date = datetime.now()
+        if self.snapshots is not None:
+            with self.stats.timer('snapshot_write'):
+                self.snapshots.add(url, response.text, fetched_at=scrape_date, last_modified=last_modified)
+        return response.text, scrape_date
+
+    def iter_to_scrape(self, concerts, since=None, previous_urls=()):
+        """Yields (concert, status) for the new and updated concerts, counting
+        the rest. Concerts in `previous_urls`, the sitemap's at the last scrape,
+        last modified no later than `since`, a watermark, are taken to be
+        unchanged. Others are checked against the store, as a page can be added
+        to a sitemap with an old lastmod."""
+        index = None
+        for concert in concerts:
+            if self.already_done(concert['url']):
+                logger.info(f"Done before the run was interrupted: {concert['url']}")
+                self.stats_add_concert(ScrapeResult.EXISTING)
+                continue
+            if (since is not None and concert['lastmod'] is not None and concert['lastmod'] <= since
+                    and concert['url'] in previous_urls):
+                self.stats_add_concert(ScrapeResult.EXISTING)
+                continue
+            if index is None:
+                # only read if something is newer than the watermark
+                index = self.store.index()
+            status = self.needs_update(concert['url'], concert['lastmod'], index)
+            if status in (ScrapeResult.NEW, ScrapeResult.UPDATED):
+                yield concert, status
+            else:
+                logger.info(f"Existing unchanged concert: {concert['url']}")
+                self.stats_add_concert(ScrapeResult.EXISTING)
+
+    def process_concerts(self, sitemap_content, since=None, previous_urls=()):
+        """Fetches, extracts and stores the concerts that need it, as the
+        sitemap is read, in a Pipeline of those three stages. Returns the
+        sitemap's concerts, {url: lastmod}."""
+        seen = {}
+
+        def concerts():
+            for concert in self.iter_sitemap(sitemap_content):
+                seen[concert['url']] = concert['lastmod']
+                yield concert
+
+        self.run_pipeline([
+            Stage('fetch', self.fetch_stage, workers=self.max_workers, on_error=self.scrape_failed),
+            Stage('extract', self.extract_stage, workers=self.extract_workers, on_error=self.scrape_failed),
+            Stage('write', self.write_stage),
+        ], self.iter_to_scrape(concerts(), since=since, previous_urls=previous_urls))
+        return seen
+
+    def diff_sitemap(self, seen):
+        """Flags the upcoming concerts gone from the sitemap since the last
+        scrape as withdrawn, and clears the flag of any that are back. Past
+        concerts are dropped from sitemaps once they've taken place, and
+        undated ones can't be told apart from those, so are left be."""
+        if not seen:
+            # more likely a broken sitemap than every concert withdrawn
+            logger.warning(f"No concerts in the sitemap of {self.site_id}")
+            return
+        current = {url: lastmod.isoformat() if lastmod is not None else None for url, lastmod in seen.items()}
+        previous = self.store.sitemap_urls(self.site_id)
+        if previous is None:
+            # first time: nothing to compare with, as a stored concert missing
+            # from the sitemap may have gone from it long ago
+            self.store.set_sitemap_urls(self.site_id, current)
+            return
+        added, removed, changed = diff_sitemaps(previous, current)
+        logger.info(f"Sitemap of {self.site_id}: {len(added)} added, {len(removed)} removed, "
+                    f"{len(changed)} changed since the last scrape")
+        withdrawn = self.store.withdraw(removed, datetime.now().isoformat(), from_date=date.today().isoformat())
+        for _ in range(withdrawn):
+            self.stats_add_concert(ScrapeResult.WITHDRAWN)
+        self.store.reinstate(added)
+        self.store.set_sitemap_urls(self.site_id, current)
+
+    def run_pipeline(self, stages, items):
+        self._pipeline = Pipeline(stages, queue_size=self.queue_size)
+        if self._cancelled:
+            self._pipeline.cancel()
+        try:
+            self._pipeline.run(items)
+        finally:
+            self._pipeline = None
+
+    def cancel(self):
+        """Stops the scrape or re-extraction running in another thread, after
+        the pages in hand"""
+        self._cancelled = True
+        pipeline = self._pipeline
+        if pipeline is not None:
+            pipeline.cancel()
+
+    def scrape_failed(self, item, e):
+        url = item[0]['url']
+        logger.error(f"Error scraping concert {url}: {e}")
+        self.stats_add_concert(ScrapeResult.ERROR)
+
+    def fetch_stage(self, item):
+        concert, status = item
+        page = self.fetch_page(concert['url'], concert['lastmod'])
+        if page is None:
+            self.journal_complete(concert['url'], 'gone')
+            return None
+        html, scrape_date = page
+        return concert, status, html, scrape_date
+
+    def extract_stage(self, item):
+        concert, status, html, scrape_date = item
+        if self.extract_pool is None:
+            with self.stats.timer('extract', url=concert['url']):
+                extracted = self.extract_concert(html)
+        else:
+            concert_dict, seconds = self.extract_pool.submit(extract_page, self.extract_concert, html).result()
+            self.stats.record_time('extract', seconds, url=concert['url'])
+            extracted = Concert.model_validate(concert_dict)
+        concert_scrape = ConcertScrape(
+            scrape_date=scrape_date,
+            url=concert['url'],
+            last_modified=concert['lastmod'],
+            concert=extracted,
+        )
+        return concert_scrape, status
+
+    def write_stage(self, item):
+        concert_scrape, status = item
+        self.store_concert(concert_scrape, status)
+
+    def store_concert(self, concert_scrape, status):
+        """Writes a scraped concert to the store, unless it's a refetch of a
+        concert whose details haven't changed"""
+        row = concert_scrape_to_row(concert_scrape)
+        if status == ScrapeResult.UPDATED and self.store.get_content_hash(row['url']) == content_hash(row):
+            logger.info(f"Refetched unchanged concert: {concert_scrape.url}")
+            self.store.touch(row['url'], row['last_modified'], row['scrape_date'])
+            self.stats_add_concert(ScrapeResult.UNCHANGED)
+            self.journal_complete(row['url'], 'unchanged')
+            return
+
+        with self.stats.timer('store_write'):
+            self.store.upsert_row(row)
+        if status == ScrapeResult.NEW:
+            logger.info(f"New concert: {concert_scrape.url}")
+        else:
+            logger.info(f"Updated concert: {concert_scrape.url}")
+        self.stats_add_concert(status)
+        self.journal_complete(row['url'], status.name.lower())
+
+    def scrape(self, full=False):
+        sitemap_content = self.fetch_sitemap()
+        sitemap_hash = hashlib.sha256(
+            sitemap_content.encode() if isinstance(sitemap_content, str) else sitemap_content).hexdigest()
+        watermark = None if full else self.store.get_watermark(self.site_id)
+        if watermark is not None and watermark['sitemap_hash'] == sitemap_hash:
+            logger.info(f"Sitemap of {self.site_id} unchanged since the last run")
+            return
+        since = parse_lastmod(watermark['last_modified']) if watermark is not None else None
+        previous_urls = (self.store.sitemap_urls(self.site_id) or {}) if since is not None else {}
+
+        errors = self.stats.count(self.site_id, ScrapeResult.ERROR)
+        self._child_sitemaps = 0
+        seen = self.process_concerts(sitemap_content, since=since, previous_urls=previous_urls)
+        if self._cancelled:
+            return
+        self.diff_sitemap(seen)
+        if self.stats.count(self.site_id, ScrapeResult.ERROR) > errors:
+            # the failed pages would be older than the watermark next time
+            return
+        latest = max((lastmod for lastmod in seen.values() if lastmod is not None), default=None)
+        if since is not None and (latest is None or since > latest):
+            latest = since
+        self.store.set_watermark(self.site_id, latest.isoformat() if latest is not None else None,
+                                 # a sitemap index can be the same while its sitemaps change
+                                 None if self._child_sitemaps else sitemap_hash)
+
+    def reextract(self, workers=None):
+        """Re-runs extract_concert over the latest archived page of each of this
+        site's concerts, in parallel processes (the extract pool, or a pool of
+        `workers`), and upserts the results.
+
+        Makes no requests to the site. Archived concerts are left as they are.
+        """
+        index = self.store.index()
+        records = [record for record in self.snapshots.latest(url_filter=self.owns_url)
+                   if not self.already_done(record['url']) and not index.is_archived(record['url'])]
+        if self.extract_pool is not None:
+            pool, workers = nullcontext(self.extract_pool), self.extract_workers
+        else:
+            workers = workers or os.cpu_count()
+            pool = ProcessPoolExecutor(workers)
+        with pool as executor:
+            def extract_record(record):
+                concert, seconds = executor.submit(
+                    extract_snapshot, self.extract_concert, self.snapshots.directory, record['sha256']).result()
+                self.stats.record_time('extract', seconds, url=record['url'])
+                concert_scrape = ConcertScrape(
+                    scrape_date=datetime.fromisoformat(record['fetched_at']),
+                    url=record['url'],
+                    last_modified=record['last_modified'],
+                    concert=Concert.model_validate(concert),
+                )
+                return concert_scrape, ScrapeResult.UPDATED if record['url'] in index else ScrapeResult.NEW
+
+            def reextract_failed(record, e):
+                logger.error(f"Error re-extracting concert {record['url']}: {e}")
+                self.stats_add_concert(ScrapeResult.ERROR)
+
+            self.run_pipeline([
+                Stage('extract', extract_record, workers=workers, on_error=reextract_failed),
+                Stage('write', self.write_stage),
+            ], records)
+
+
+class ExtractionError(Exception):
+    """An extract_concert failure, raised from a worker process"""
+
+
+def extract_page(extract_concert, html):
+    """Runs in a worker process: extracts a Concert from a page. Returns it as a
+    dict of JSON values, which are cheap to send back, and the seconds taken.
+
+    Any error is raised as a plain ExtractionError, so that it can always be
+    sent back too, and the worker carries on with the next page.
+    """
+    start = time.perf_counter()
+    try:
+        concert = extract_concert(html).model_dump(mode='json')
+    except Exception as e:
+        raise ExtractionError(f'{type(e).__name__}: {e}') from None
+    return concert, time.perf_counter() - start
+
+
+def extract_snapshot(extract_concert, snapshot_dir, sha256):
+    """Runs in a worker process: extracts a Concert from an archived page"""
+    return extract_page(extract_concert, SnapshotStore(snapshot_dir).read(sha256))
+
+
+def run_scrapers(scraper_classes, dry_run=False, reextract=False, stats=None, sheet_handler=None,
+                 session=None, snapshots=None, store=None, extract_workers=None, profile=None, profile_top=10,
+                 resume=False, journal=None, fetch_workers=DEFAULT_MAX_WORKERS, full=False, archive_handler=None,
+                 archive_after_days=DEFAULT_ARCHIVE_AFTER_DAYS, metrics_json=None, metrics_prom=None):
+    """Scrapes the sites at the same time into the concert store, syncs what
+    changed to the sheet, and prints the summary. With reextract, the sites'
+    archived pages are re-extracted instead, without fetching anything.
+
+    An empty store is first seeded from the sheet and the archive sheet. With
+    dry_run, the run works on an in-memory copy of the store and nothing is
+    written anywhere.
+
+    Concerts listed on more than one site are then given a shared cluster_id
+    (see dedup.find_clusters).
+
+    Concerts dated more than `archive_after_days` ago (None for never) are
+    archived: they aren't fetched again, and are moved from the sheet to the
+    archive sheet, `archive_handler`, when it is synced.
+
+    Each host keeps its own rate limit, through the shared requests session.
+    Each site fetches on `fetch_workers` threads. With extract_workers, pages
+    are extracted in that many processes, shared by the sites; re-extracting
+    always uses processes, one per core by default. If one site fails, or the
+    run is interrupted, the others are cancelled.
+
+    Only the sitemap entries newer than each site's watermark are compared
+    with the store, unless `full`.
+
+    Each URL done with is recorded in the run's journal. With resume, a run
+    of the same kind that didn't finish is carried on: the concerts it stored
+    but hadn't synced are written to the sheet first, and the URLs it had
+    done are skipped. Dry runs aren't journaled.
+
+    With profile, a path, the run is sampled by a SamplingProfiler, whose
+    stacks are written there for flame graphs, and the hottest functions and
+    the `profile_top` slowest URLs are printed after the summary.
+
+    The stats are also written to `metrics_json`, as JSON, and to
+    `metrics_prom`, in the Prometheus text format, if given.
+    """
+    stats = stats or ScrapingStats()
+    sheet_handler = sheet_handler or SheetHandler()
+    archive_handler = archive_handler or SheetHandler(sheet=ARCHIVE_SHEET)
+    session = session or default_requests_session()
+    snapshots = snapshots or default_snapshot_store()
+    if store is None:
+        store = default_concert_store()
+    if dry_run:
+        store = store.in_memory_copy()
+        journal = None
+    elif journal is None:
+        journal = default_run_journal()
+
+    with SamplingProfiler() if profile else nullcontext() as profiler:
+        sheet_df = None
+        if not len(store):
+            with stats.timer('sheet_read'):
+                sheet_df = sheet_handler.get_all_data()
+                archive_df = archive_handler.get_all_data()
+            store.import_rows(sheet_df)
+            store.import_rows(archive_df, archived=True)
+        if journal is not None:
+            done = journal.start('reextract' if reextract else 'scrape', resume=resume)
+            if done:
+                logger.info(f"Resuming an interrupted run, {len(done)} URLs already done")
+        if resume:
+            # so what the interrupted run stored reaches the sheet even if this one dies too
+            with stats.timer('sheet_sync'):
+                if sheet_handler.sync_from_store(store, dry_run=dry_run, df=sheet_df):
+                    # the sheet has changed since
+                    sheet_df = None
+        if archive_after_days is not None:
+            before = (date.today() - timedelta(days=archive_after_days)).isoformat()
+            archived = store.archive(before, datetime.now().isoformat())
+            if archived:
+                logger.info(f"Archiving {archived} concerts dated before {before}")
+
+        use_pool = reextract or extract_workers
+        if use_pool:
+            extract_workers = extract_workers or os.cpu_count()
+        with ProcessPoolExecutor(extract_workers) if use_pool else nullcontext() as extract_pool:
+            scrapers = [scraper_class(store, session=session, stats=stats, snapshots=snapshots,
+                                      extract_pool=extract_pool, journal=journal, max_workers=fetch_workers,
+                                      extract_workers=extract_workers or 1)
+                        for scraper_class in scraper_classes]
+            if reextract:
+                # each site keeps the pool busy, so one site at a time
+                for scraper in scrapers:
+                    scraper.reextract()
+            else:
+                with ThreadPoolExecutor(max_workers=len(scrapers)) as executor:
+                    futures = [executor.submit(scraper.scrape, full=full) for scraper in scrapers]
+                    try:
+                        for future in futures:
+                            future.result()
+                    except BaseException:
+                        for scraper in scrapers:
+                            scraper.cancel()
+                        raise
+
+        with stats.timer('dedup'):
+            clustered = cluster_duplicates(store)
+        if clustered:
+            logger.info(f"Updated the duplicate clusters of {clustered} concerts")
+        with stats.timer('sheet_sync'):
+            sheet_df = sheet_handler.archive_from_store(store, archive_handler, dry_run=dry_run, df=sheet_df)
+            sheet_handler.sync_from_store(store, dry_run=dry_run, df=sheet_df)
+        if journal is not None:
+            journal.finish()
+
+        set_run_counters(stats, sheet_handler, session, archive_handler=archive_handler)
+    stats.print_summary()
+    if metrics_json:
+        stats.write_json(metrics_json)
+    if metrics_prom:
+        stats.write_prometheus(metrics_prom)
+    if profiler is not None:
+        profiler.write_collapsed(profile)
+        profiler.print_hot_functions(profile_top)
+        stats.print_slowest_urls(profile_top)
+        print(f"\nProfile written to {profile}")
+    return stats
+
+
+def set_run_counters(stats, sheet_handler, session, archive_handler=None):
+    """Copies the run-wide API and cache counters into the stats summary"""
+    sheet_handlers = [sheet_handler] + ([archive_handler] if archive_handler is not None else [])
+    stats.set_counter('Sheets API calls', sum(handler.api_calls for handler in sheet_handlers))
+    stats.set_counter('Sheets cells written', sum(handler.cells_written for handler in sheet_handlers))
+    for name, value in session.summary().items():
+        stats.set_counter(name, value)
+    if session.cache is not None:
+        for name, value in session.cache.summary().items():
+            stats.set_counter(name, value)
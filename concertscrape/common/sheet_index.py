@@ -0,0 +1,57 @@
+import pandas as pd
+
+from concertscrape.common.dates import parse_timestamp_column
+from concertscrape.common.stats import ScrapeResult
+
+
+class SheetIndex:
+    """URL -> last_modified lookup over a sheet snapshot.
+
+    Built once per run, with a single vectorised parse of the last_modified
+    column, so each sitemap entry can be checked in O(1). URLs flagged in an
+    `archived` column are concerts that are over, which are never refetched.
+    """
+    def __init__(self, sheet_data: pd.DataFrame):
+        self._archived = set()
+        if sheet_data.empty or 'url' not in sheet_data.columns:
+            self._last_modified = {}
+            return
+        if 'archived' in sheet_data.columns:
+            self._archived = set(sheet_data['url'][sheet_data['archived'].astype(bool)])
+        if 'last_modified' in sheet_data.columns:
+            parsed = parse_timestamp_column(sheet_data['last_modified'])
+            # iterated rather than .dt.to_pydatetime(), which returns an ndarray
+            # before pandas 3, a Series after
+            values = [None if pd.isna(value) else value.to_pydatetime() for value in parsed]
+        else:
+            values = [None] * len(sheet_data)
+        self._last_modified = dict(zip(sheet_data['url'], values))
+
+    def __len__(self):
+        return len(self._last_modified)
+
+    def __contains__(self, url):
+        return url in self._last_modified
+
+    def get(self, url):
+        """Returns the sheet's last_modified for the url (None if unknown or unparseable)"""
+        return self._last_modified.get(url)
+
+    def update(self, url, last_modified):
+        self._last_modified[url] = last_modified
+
+    def is_archived(self, url):
+        return url in self._archived
+
+    def status(self, url, lastmod) -> ScrapeResult:
+        """Compare a sitemap entry with the sheet: NEW, UPDATED or EXISTING"""
+        if url not in self._last_modified:
+            return ScrapeResult.NEW
+        if url in self._archived:
+            return ScrapeResult.EXISTING
+        sheet_lastmod = self._last_modified[url]
+        if lastmod is None:
+            return ScrapeResult.EXISTING
+        if sheet_lastmod is None or lastmod > sheet_lastmod:
+            return ScrapeResult.UPDATED
+        return ScrapeResult.EXISTING
@@ -0,0 +1,61 @@
+import xml.etree.ElementTree as ET
+
+from concertscrape.common.dates import parse_lastmod
+
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+CHUNK_SIZE = 64 * 1024
+
+
+def diff_sitemaps(previous, current):
+    """(added, removed, changed) URLs between two readings of a sitemap, each
+    {url: lastmod}. Set operations, so linear in the size of the sitemaps."""
+    added = current.keys() - previous.keys()
+    removed = previous.keys() - current.keys()
+    changed = {url for url in current.keys() & previous.keys() if current[url] != previous[url]}
+    return added, removed, changed
+
+
+def _chunks(source):
+    if isinstance(source, (str, bytes)):
+        for start in range(0, len(source), CHUNK_SIZE):
+            yield source[start:start + CHUNK_SIZE]
+    else:
+        yield from source
+
+
+def _child_text(elem, tag):
+    child = elem.find(f'{SITEMAP_NS}{tag}')
+    return child.text.strip() if child is not None and child.text else None
+
+
+def iter_sitemap(source, url_filter=None, fetch=None):
+    """Yield (url, lastmod) for each page in a sitemap, as it is parsed.
+
+    `source` is the sitemap document (str or bytes) or an iterable of chunks
+    of it. Only urls passing `url_filter` are yielded. For a <sitemapindex>,
+    each child sitemap is fetched with `fetch(url)` and read in turn. Each
+    <url> element is discarded once read, so memory use doesn't grow with
+    the size of the sitemap.
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    root = None
+    for chunk in _chunks(source):
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = elem
+                continue
+            if elem.tag == f'{SITEMAP_NS}url':
+                loc = _child_text(elem, 'loc')
+                if loc and (url_filter is None or url_filter(loc)):
+                    yield loc, parse_lastmod(_child_text(elem, 'lastmod'))
+                root.clear()
+            elif elem.tag == f'{SITEMAP_NS}sitemap':
+                loc = _child_text(elem, 'loc')
+                root.clear()
+                if loc:
+                    if fetch is None:
+                        raise ValueError(f"Sitemap index lists {loc} but there is no fetch function")
+                    yield from iter_sitemap(fetch(loc), url_filter=url_filter, fetch=fetch)
+    parser.close()
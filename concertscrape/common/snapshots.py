@@ -0,0 +1,76 @@
+from datetime import datetime
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+DEFAULT_SNAPSHOT_DIR = '~/.cache/concertscrape/snapshots'
+
+
+class SnapshotStore:
+    """Local archive of the raw HTML of every fetched page.
+
+    Pages are gzipped and stored by the sha256 of their content, so a page
+    that hasn't changed between fetches takes no extra space. index.jsonl
+    records each fetch: url, fetched_at, last_modified (from the sitemap) and
+    the content hash.
+    """
+    def __init__(self, directory):
+        self.directory = os.path.expanduser(directory)
+        os.makedirs(os.path.join(self.directory, 'objects'), exist_ok=True)
+        self.index_path = os.path.join(self.directory, 'index.jsonl')
+        self._lock = threading.Lock()
+
+    def _object_path(self, sha256):
+        return os.path.join(self.directory, 'objects', sha256[:2], sha256[2:] + '.html.gz')
+
+    def add(self, url, html_content, fetched_at=None, last_modified=None):
+        """Archives a fetched page. Returns its content hash."""
+        data = html_content.encode('utf-8')
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self._object_path(sha256)
+        record = {
+            'url': url,
+            'fetched_at': (fetched_at or datetime.now()).isoformat(),
+            'last_modified': last_modified.isoformat() if last_modified else None,
+            'sha256': sha256,
+        }
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with gzip.open(path + '.tmp', 'wb') as f:
+                    f.write(data)
+                os.replace(path + '.tmp', path)
+            with open(self.index_path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        return sha256
+
+    def read(self, sha256):
+        with gzip.open(self._object_path(sha256), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def iter_records(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # a partly written last line, from a crash
+                    continue
+
+    def latest(self, url_filter=None):
+        """Returns the most recent fetch of each URL, as index records"""
+        latest = {}
+        for record in self.iter_records():
+            if url_filter and not url_filter(record['url']):
+                continue
+            if record['url'] not in latest or record['fetched_at'] >= latest[record['url']]['fetched_at']:
+                latest[record['url']] = record
+        return list(latest.values())
+
+
+def default_snapshot_store():
+    return SnapshotStore(os.environ.get('SNAPSHOT_DIR', DEFAULT_SNAPSHOT_DIR))
@@ -0,0 +1,36 @@
+import os
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# 'html.parser' and 'lxml' build a tree of the whole page. The '-strainer'
+# variants only keep the elements with the classes the extractor reads, so
+# navigation, footers and scripts are skipped.
+PARSER_BACKENDS = ('html.parser', 'lxml', 'strainer', 'lxml-strainer')
+DEFAULT_PARSER_BACKEND = 'html.parser'
+
+_backend = os.environ.get('HTML_PARSER_BACKEND', DEFAULT_PARSER_BACKEND)
+
+
+def set_parser_backend(backend):
+    global _backend
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend {backend!r}, choose from {PARSER_BACKENDS}")
+    _backend = backend
+
+
+def get_parser_backend():
+    return _backend
+
+
+def make_soup(html_content, containers=None, backend=None):
+    """Parse a page with the selected backend.
+
+    `containers` lists the classes of the elements the caller reads, for the
+    strainer backends. Elements inside a matching element are always kept.
+    """
+    backend = backend or _backend
+    features = 'lxml' if backend.startswith('lxml') else 'html.parser'
+    parse_only = None
+    if backend.endswith('strainer') and containers:
+        parse_only = SoupStrainer(class_=list(containers))
+    return BeautifulSoup(html_content, features, parse_only=parse_only)
@@ -1,44 +1,211 @@
 from collections import defaultdict
+from contextlib import contextmanager
 from enum import Enum, auto
+import json
+import math
+import os
+import re
+import threading
+import time
 
 
 class ScrapeResult(Enum):
     NEW = auto()
     UPDATED = auto()
     EXISTING = auto()
+    # refetched as the page changed, but the concert's details hadn't
+    UNCHANGED = auto()
     ERROR = auto()
+    # no longer in the site's sitemap
+    WITHDRAWN = auto()
+
+# Phases spent queueing rather than working, e.g. for a host's rate limit.
+# A URL's are shown but not counted in how slow it was.
+WAIT_PHASES = ('rate_limit_wait',)
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of a sorted, non-empty list"""
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def _working_seconds(timings):
+    return sum(seconds for phase, seconds in timings.items() if phase not in WAIT_PHASES)
+
+
+def _metric_name(name):
+    return 'concertscrape_' + re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+
+def _write_atomically(path, text):
+    # so a reader (e.g. node_exporter's textfile collector) never sees half a file
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
 
 class ScrapingStats:
+    """Per-site concert counts, timings of each phase of the run, and run-wide
+    counters. Safe to share between threads.
+
+    Phases are timed with `with stats.timer('page_fetch'):`, or record_time().
+    Times given a url are also added up per URL, for slowest_urls().
+    """
     def __init__(self):
         self.stats = defaultdict(lambda: {result: 0 for result in ScrapeResult})
         self.errored = False
+        # run-wide counters, e.g. API calls made, shown at the end of the summary
+        self.counters = {}
+        # phase -> durations in seconds, one per timed call
+        self.timings = defaultdict(list)
+        # url -> phase -> seconds
+        self.url_timings = defaultdict(lambda: defaultdict(float))
+        # sites may be scraped at the same time
+        self._lock = threading.Lock()
         
     def add_concert(self, id_, result):
-        self.stats[id_][result] += 1
-        if result == ScrapeResult.ERROR:
-            self.errored = True
+        with self._lock:
+            self.stats[id_][result] += 1
+            if result == ScrapeResult.ERROR:
+                self.errored = True
+
+    def count(self, id_, result):
+        with self._lock:
+            # without adding the site, which would show in the summary with none
+            counts = self.stats.get(id_)
+            return counts[result] if counts else 0
+
+    def set_counter(self, name, value):
+        self.counters[name] = value
+
+    def record_time(self, phase, seconds, url=None):
+        with self._lock:
+            self.timings[phase].append(seconds)
+            if url is not None:
+                self.url_timings[url][phase] += seconds
+
+    @contextmanager
+    def timer(self, phase, url=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_time(phase, time.perf_counter() - start, url=url)
+
+    def slowest_urls(self, n=10):
+        """[(url, {phase: seconds})] of the n URLs that took longest in all,
+        not counting WAIT_PHASES"""
+        with self._lock:
+            url_timings = [(url, dict(phases)) for url, phases in self.url_timings.items()]
+        return sorted(url_timings, key=lambda item: _working_seconds(item[1]), reverse=True)[:n]
+
+    def print_slowest_urls(self, n=10):
+        slowest = self.slowest_urls(n)
+        if not slowest:
+            return
+        phases = sorted({phase for _, timings in slowest for phase in timings if phase not in WAIT_PHASES})
+        waits = [phase for phase in WAIT_PHASES if any(phase in timings for _, timings in slowest)]
+        print(f"\nSlowest {len(slowest)} URLs (seconds):")
+        print(f"  {'total':>8}" + ''.join(f"{phase:>16}" for phase in phases + waits) + "  url")
+        for url, timings in slowest:
+            print(f"  {_working_seconds(timings):>8.3f}"
+                  + ''.join(f"{timings.get(phase, 0):>16.3f}" for phase in phases + waits) + f"  {url}")
+
+    def phase_summary(self):
+        """{phase: {'count', 'total', 'p50', 'p95', 'max'}}, in seconds"""
+        with self._lock:
+            timings = {phase: sorted(durations) for phase, durations in self.timings.items() if durations}
+        return {
+            phase: {
+                'count': len(durations),
+                'total': sum(durations),
+                'p50': percentile(durations, 0.5),
+                'p95': percentile(durations, 0.95),
+                'max': durations[-1],
+            }
+            for phase, durations in timings.items()
+        }
+
+    def to_dict(self):
+        return {
+            'sites': {id_: {result.name.lower(): count for result, count in counts.items()}
+                      for id_, counts in self.stats.items()},
+            'errored': self.errored,
+            'phases': self.phase_summary(),
+            'counters': dict(self.counters),
+        }
+
+    def write_json(self, path):
+        _write_atomically(path, json.dumps(self.to_dict(), indent=2) + '\n')
+
+    def write_prometheus(self, path):
+        """Writes the stats in the Prometheus text format, e.g. for
+        node_exporter's textfile collector"""
+        lines = [
+            '# HELP concertscrape_concerts Concerts found in the last run, by site and result',
+            '# TYPE concertscrape_concerts gauge',
+        ]
+        for id_, counts in self.stats.items():
+            for result, count in counts.items():
+                lines.append(f'concertscrape_concerts{{site="{id_}",result="{result.name.lower()}"}} {count}')
+        lines += [
+            '# HELP concertscrape_phase_seconds Time spent in each phase of the last run',
+            '# TYPE concertscrape_phase_seconds summary',
+        ]
+        phases = self.phase_summary()
+        for phase, summary in phases.items():
+            for key, quantile in (('p50', '0.5'), ('p95', '0.95')):
+                lines.append(f'concertscrape_phase_seconds{{phase="{phase}",quantile="{quantile}"}} '
+                             f'{summary[key]:.6f}')
+            lines.append(f'concertscrape_phase_seconds_sum{{phase="{phase}"}} {summary["total"]:.6f}')
+            lines.append(f'concertscrape_phase_seconds_count{{phase="{phase}"}} {summary["count"]}')
+        lines += [
+            '# HELP concertscrape_phase_max_seconds Slowest call of each phase in the last run',
+            '# TYPE concertscrape_phase_max_seconds gauge',
+        ]
+        for phase, summary in phases.items():
+            lines.append(f'concertscrape_phase_max_seconds{{phase="{phase}"}} {summary["max"]:.6f}')
+        for name, value in self.counters.items():
+            lines.append(f'# TYPE {_metric_name(name)} gauge')
+            lines.append(f'{_metric_name(name)} {value}')
+        _write_atomically(path, '\n'.join(lines) + '\n')
     
     def print_summary(self):
         print("\n=== Scraping Summary ===")
         total_by_result = defaultdict(int)
         
-        def print_summary_for_id(id_, total, new, updated, existing, errors):
+        def print_summary_for_id(id_, counts):
+            total = sum(count for result, count in counts.items() if result != ScrapeResult.WITHDRAWN)
+            new = counts[ScrapeResult.NEW]
+            errors = counts[ScrapeResult.ERROR]
             print(f"\n{id_}:")
             print(f"  Total concerts found: {total}")
-            print(f"    New: {new} ({(new/total * 100):.1f}%)")
-            print(f"    Updated: {updated}")
-            print(f"    Existing unchanged: {existing}")
+            print(f"    New: {new}" + (f" ({(new/total * 100):.1f}%)" if total else ""))
+            print(f"    Updated: {counts[ScrapeResult.UPDATED]}")
+            print(f"    Existing unchanged: {counts[ScrapeResult.EXISTING]}")
+            print(f"    Refetched, unchanged: {counts[ScrapeResult.UNCHANGED]}")
+            print(f"  Withdrawn from the sitemap: {counts[ScrapeResult.WITHDRAWN]}")
             if errors:
                 print(f"  ERRORS: {errors} ({(errors/total * 100):.1f}%)")
 
         for id_, counts in self.stats.items():
-            total = sum(counts.values())
-            
-            print_summary_for_id(id_, total, counts[ScrapeResult.NEW], counts[ScrapeResult.UPDATED], counts[ScrapeResult.EXISTING], counts[ScrapeResult.ERROR])
+            print_summary_for_id(id_, counts)
             
             for result, count in counts.items():
                 total_by_result[result] += count
         
         if len(self.stats) > 1:
-            print_summary_for_id("Overall Summary", sum(total_by_result.values()), total_by_result[ScrapeResult.NEW], total_by_result[ScrapeResult.UPDATED], total_by_result[ScrapeResult.EXISTING], total_by_result[ScrapeResult.ERROR])
+            print_summary_for_id("Overall Summary", total_by_result)
+        phases = self.phase_summary()
+        if phases:
+            print("\nTimings (seconds):")
+            print(f"  {'phase':<16}{'count':>7}{'total':>10}{'p50':>9}{'p95':>9}{'max':>9}")
+            for phase, summary in phases.items():
+                print(f"  {phase:<16}{summary['count']:>7}{summary['total']:>10.2f}"
+                      f"{summary['p50']:>9.3f}{summary['p95']:>9.3f}{summary['max']:>9.3f}")
+        if self.counters:
+            print("\nRun counters:")
+            for name, value in self.counters.items():
+                print(f"  {name}: {value}")
         print("=====================")
\ No newline at end of file
@@ -0,0 +1,17 @@
+import pytest
+
+from concertscrape.common.cli import parse_arguments
+from concertscrape.common.scraper import DEFAULT_ARCHIVE_AFTER_DAYS, DEFAULT_MAX_WORKERS
+
+
+def test_defaults():
+    args = parse_arguments(args=[])
+
+    assert (args.archive_after, args.fetch_workers) == (DEFAULT_ARCHIVE_AFTER_DAYS, DEFAULT_MAX_WORKERS)
+
+
+def test_site_is_only_for_all_sites():
+    assert parse_arguments(select_sites=True, args=['--site', 'oxfordphil.com']).sites == ['oxfordphil.com']
+    # a site's own script would ignore it
+    with pytest.raises(SystemExit):
+        parse_arguments(args=['--site', 'oxfordphil.com'])
@@ -0,0 +1,248 @@
+import json
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+from concertscrape.common.concert_schema import Concert, ConcertScrape, Performer
+from concertscrape.common.concert_sheet import SHEET_COLUMNS, SheetHandler, SheetReadError
+from concertscrape.common.fake_spread import FakeSpread
+
+
+def make_concert_scrape(url, title='A Concert', last_modified='2024-01-01T12:00:00+00:00'):
+    return ConcertScrape(
+        url=url,
+        scrape_date=datetime(2024, 1, 2, 9, 0, 0),
+        last_modified=datetime.strptime(last_modified, '%Y-%m-%dT%H:%M:%S%z'),
+        concert=Concert(title=title, date='12 Jul 2025', performers=[Performer(role='conductor', name='Bob Smith')]),
+    )
+
+
+@pytest.fixture
+def spread():
+    return FakeSpread(pd.DataFrame({
+        'url': ['https://example.com/event/existing/'],
+        'title': ['Old title'],
+        'last_modified': ['2023-01-01T12:00:00+00:00'],
+    }))
+
+
+@pytest.fixture
+def sheet_handler(spread):
+    return SheetHandler(spread=spread)
+
+
+def test_update_concert_reads_and_writes_once(sheet_handler, spread):
+    sheet_handler.update_concert(make_concert_scrape('https://example.com/event/new/'))
+
+    assert spread.calls['sheet_to_df'] == 1
+    assert spread.calls['batch_update'] == 1
+    assert list(spread.df['url']) == ['https://example.com/event/existing/', 'https://example.com/event/new/']
+
+
+def test_update_concerts_batches_sheet_calls(sheet_handler, spread):
+    scrapes = [make_concert_scrape(f'https://example.com/event/{i}/') for i in range(20)]
+    scrapes.append(make_concert_scrape('https://example.com/event/existing/', title='New title'))
+
+    upserted = sheet_handler.update_concerts(scrapes)
+
+    assert upserted == 21
+    assert spread.calls['sheet_to_df'] == 1
+    assert spread.calls['batch_update'] == 1
+    assert len(spread.df) == 21
+    existing = spread.df[spread.df['url'] == 'https://example.com/event/existing/'].iloc[0]
+    assert existing['title'] == 'New title'
+    # sheet_to_df + batch_update
+    assert sheet_handler.api_calls == 2
+
+
+def test_update_concerts_flush_every(sheet_handler, spread):
+    scrapes = [make_concert_scrape(f'https://example.com/event/{i}/') for i in range(10)]
+
+    sheet_handler.update_concerts(scrapes, flush_every=4)
+
+    # flushes after 4 and 8, then the remaining 2 on exit
+    assert spread.calls['sheet_to_df'] == 1
+    assert spread.calls['batch_update'] == 3
+    assert len(spread.df) == 11
+
+
+def test_batch_merges_repeated_url(sheet_handler, spread):
+    with sheet_handler.batch() as batch:
+        batch.upsert(make_concert_scrape('https://example.com/event/new/', title='First'))
+        batch.upsert(make_concert_scrape('https://example.com/event/new/', title='Second'))
+
+    new_rows = spread.df[spread.df['url'] == 'https://example.com/event/new/']
+    assert list(new_rows['title']) == ['Second']
+    assert json.loads(new_rows.iloc[0]['performers']) == [{'role': 'conductor', 'name': 'Bob Smith'}]
+
+
+def test_batch_dry_run_does_not_write(sheet_handler, spread):
+    sheet_handler.update_concerts([make_concert_scrape('https://example.com/event/new/')], dry_run=True)
+
+    assert spread.calls['batch_update'] == 0
+    assert len(spread.df) == 1
+
+
+def test_batch_on_empty_sheet():
+    spread = FakeSpread()
+    sheet_handler = SheetHandler(spread=spread)
+
+    sheet_handler.update_concerts([make_concert_scrape('https://example.com/event/new/')])
+
+    assert list(spread.df['url']) == ['https://example.com/event/new/']
+
+
+def test_batch_with_blank_row():
+    spread = FakeSpread(pd.DataFrame({
+        'url': ['https://example.com/event/a/', '', 'https://example.com/event/b/'],
+        'title': ['A', '', 'B'],
+    }))
+    sheet_handler = SheetHandler(spread=spread)
+
+    sheet_handler.update_concerts([
+        make_concert_scrape('https://example.com/event/b/', title='New B'),
+        make_concert_scrape('https://example.com/event/c/', title='C'),
+    ])
+
+    assert list(spread.df['url']) == ['https://example.com/event/a/', '', 'https://example.com/event/b/',
+                                      'https://example.com/event/c/']
+    assert list(spread.df['title']) == ['A', '', 'New B', 'C']
+
+
+def test_unreadable_sheet_is_not_written(sheet_handler, spread, monkeypatch):
+    from concertscrape.common.concert_store import SQLiteConcertStore
+
+    def fail(**kwargs):
+        raise ConnectionError('quota exceeded')
+    monkeypatch.setattr(spread, 'sheet_to_df', fail)
+    store = SQLiteConcertStore()
+    store.upsert(make_concert_scrape('https://example.com/event/new/'))
+
+    with pytest.raises(SheetReadError):
+        sheet_handler.update_concerts([make_concert_scrape('https://example.com/event/new/')])
+    with pytest.raises(SheetReadError):
+        sheet_handler.sync_from_store(store)
+
+    assert spread.calls['batch_update'] == 0
+    assert list(spread.df['title']) == ['Old title']
+    assert len(store.unsynced_rows()) == 1
+
+
+def test_sync_adds_new_columns_to_existing_rows():
+    from concertscrape.common.concert_store import SQLiteConcertStore
+
+    # a sheet from before withdrawn_at and cluster_id
+    baseline_columns = [column for column in SHEET_COLUMNS if column not in ('withdrawn_at', 'cluster_id')]
+    spread = FakeSpread(pd.DataFrame([{column: '' for column in baseline_columns}]).assign(
+        url='https://example.com/event/a/', title='A'))
+    sheet_handler = SheetHandler(spread=spread)
+    store = SQLiteConcertStore()
+    store.import_rows(sheet_handler.get_all_data())
+
+    store.withdraw(['https://example.com/event/a/'], '2026-01-08T09:00:00')
+    store.set_cluster_ids({'https://example.com/event/a/': 'abc123'})
+    sheet_handler.sync_from_store(store)
+
+    row = spread.df.iloc[0]
+    assert (row['withdrawn_at'], row['cluster_id'], row['title']) == ('2026-01-08T09:00:00', 'abc123', 'A')
+    assert list(spread.df.columns) == SHEET_COLUMNS
+    assert store.unsynced_rows() == []
+
+
+def test_only_changed_cells_are_written(sheet_handler, spread):
+    sheet_handler.update_concerts([make_concert_scrape(f'https://example.com/event/{i}/') for i in range(3)])
+    written = spread.cells_written
+
+    sheet_handler.update_concerts([
+        make_concert_scrape('https://example.com/event/1/', title='Changed'),
+        make_concert_scrape('https://example.com/event/2/'),
+    ])
+
+    # one cell changed, and the unchanged row isn't written
+    assert spread.cells_written - written == 1
+    assert spread.df.set_index('url').loc['https://example.com/event/1/', 'title'] == 'Changed'
+    assert spread.calls['batch_update'] == 2
+
+
+def test_changed_ranges(sheet_handler):
+    with sheet_handler.batch(dry_run=True) as batch:
+        batch.upsert(make_concert_scrape('https://example.com/event/existing/', title='New title'))
+        batch.upsert(make_concert_scrape('https://example.com/event/new/'))
+        batch._merge_new_rows()
+        ranges = batch.changed_ranges()
+
+    columns = list(batch.df.columns)
+    assert columns[:3] == ['url', 'title', 'last_modified']
+    # the new columns' headers, the existing row's changed and newly filled
+    # cells (blank ones are left alone), then the appended row
+    assert [r['range'] for r in ranges] == ['D1:N1', 'B2:E2', 'L2:M2', 'A3:N3']
+    assert ranges[0]['values'] == [columns[3:]]
+    assert ranges[1]['values'] == [['New title', '2024-01-01T12:00:00Z', '2024-01-02T09:00:00', '12 Jul 2025']]
+
+
+def test_sheet_grows_to_fit_appended_rows():
+    spread = FakeSpread(rows=3, cols=2)
+    sheet_handler = SheetHandler(spread=spread)
+
+    sheet_handler.update_concerts([make_concert_scrape(f'https://example.com/event/{i}/') for i in range(5)])
+
+    assert spread.calls['resize'] == 1
+    assert (spread.sheet.row_count, spread.sheet.col_count) == (6, 14)
+    assert len(spread.df) == 5
+
+
+def test_append_rows_writes_header_to_empty_sheet():
+    spread = FakeSpread()
+    sheet_handler = SheetHandler(spread=spread)
+
+    sheet_handler.append_rows([{'url': 'https://example.com/event/a/', 'title': 'A'}])
+    sheet_handler.append_rows([{'url': 'https://example.com/event/b/', 'title': 'B'}])
+
+    assert list(spread.df['title']) == ['A', 'B']
+    assert spread.calls['append_rows'] == 2
+    assert spread.calls['sheet_to_df'] == 0
+
+
+def test_archive_from_store(sheet_handler, spread):
+    from concertscrape.common.concert_store import SQLiteConcertStore
+
+    store = SQLiteConcertStore()
+    store.import_rows(sheet_handler.get_all_data())
+    past = make_concert_scrape('https://example.com/event/new/')
+    store.upsert(past.model_copy(update={'concert': Concert(title='Past', date='12 Jul 2025',
+                                                            date_parsed=date(2025, 7, 12))}))
+    store.archive('2026-01-01', '2026-01-08T09:00:00')
+    archive_spread = FakeSpread()
+
+    df = sheet_handler.archive_from_store(store, SheetHandler(spread=archive_spread))
+
+    assert list(archive_spread.df['url']) == ['https://example.com/event/new/']
+    assert list(spread.df['url']) == list(df['url']) == ['https://example.com/event/existing/']
+    assert store.unsynced_rows(archived=True) == []
+
+
+def test_archive_deletes_only_the_archived_rows():
+    from concertscrape.common.concert_store import SQLiteConcertStore
+
+    urls = [f'https://example.com/event/{i}/' for i in range(5)]
+    spread = FakeSpread(pd.DataFrame({
+        'url': urls[:3] + [''] + urls[3:],
+        'title': ['Past', 'Past', 'Future', '', 'Past', 'Future'],
+        'date_parsed': ['2025-07-12', '2025-07-12', '2026-07-12', '', '2025-07-12', '2026-07-12'],
+    }))
+    sheet_handler = SheetHandler(spread=spread)
+    store = SQLiteConcertStore()
+    store.import_rows(sheet_handler.get_all_data())
+    store.archive('2026-01-01', '2026-01-08T09:00:00')
+    store.upsert_row({'url': urls[4], 'title': 'New title', 'date_parsed': '2026-07-12'})
+    store.upsert_row({'url': 'https://example.com/event/new/', 'title': 'New', 'date_parsed': '2026-08-01'})
+
+    df = sheet_handler.archive_from_store(store, SheetHandler(spread=FakeSpread()), df=sheet_handler.get_all_data())
+    sheet_handler.sync_from_store(store, df=df)
+
+    # one request deleting rows 2-3 and 6, the blank row staying
+    assert spread.calls['spreadsheet_batch_update'] == 1
+    assert list(spread.df['url']) == [urls[2], '', urls[4], 'https://example.com/event/new/']
+    assert list(spread.df['title']) == ['Future', '', 'New title', 'New']
+
@@ -0,0 +1,245 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+import json
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from concertscrape.common.concert_schema import Concert, ConcertScrape, Performer, ProgrammeItem
+from concertscrape.common.concert_sheet import SHEET_COLUMNS, SheetHandler, concert_scrape_to_row
+from concertscrape.common.concert_store import SQLiteConcertStore, content_hash
+from concertscrape.common.fake_spread import FakeSpread
+from concertscrape.common.stats import ScrapeResult
+
+
+def make_concert_scrape(url, title='A Concert', last_modified=datetime(2024, 1, 1, 12, tzinfo=timezone.utc)):
+    return ConcertScrape(
+        url=url,
+        scrape_date=datetime(2024, 1, 2, 9, 0, 0),
+        last_modified=last_modified,
+        concert=Concert(
+            title=title,
+            date='12 Jul 2025',
+            venue='Sheldonian Theatre',
+            performers=[Performer(role='conductor', name='Bob Smith'), Performer(role='piano', name='Ann Jones')],
+            programme=[ProgrammeItem(composer='Mozart', piece='Symphony No. 40')],
+        ),
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteConcertStore(tmp_path / 'concerts.db')
+    yield store
+    store.close()
+
+
+def test_round_trip(store):
+    concert_scrape = make_concert_scrape('https://example.com/event/a/')
+    store.upsert(concert_scrape)
+
+    assert store.get('https://example.com/event/a/') == concert_scrape
+    assert store.get('https://example.com/event/missing/') is None
+
+
+def test_performers_and_programme_in_child_tables(store):
+    store.upsert(make_concert_scrape('https://example.com/event/a/'))
+    store.upsert(make_concert_scrape('https://example.com/event/a/').model_copy(update={
+        'concert': Concert(title='A Concert', date='12 Jul 2025', performers=[Performer(role='tenor', name='Cy')]),
+    }))
+
+    performers = store._conn.execute('SELECT position, role, name FROM performers').fetchall()
+    assert [tuple(performer) for performer in performers] == [(0, 'tenor', 'Cy')]
+    assert store._conn.execute('SELECT COUNT(*) FROM programme_items').fetchone()[0] == 0
+
+
+def test_rows_are_in_sheet_format(store):
+    store.upsert(make_concert_scrape('https://example.com/event/a/'))
+
+    row = store.get_row('https://example.com/event/a/')
+    assert list(row) == SHEET_COLUMNS
+    assert json.loads(row['performers']) == [{'role': 'conductor', 'name': 'Bob Smith'},
+                                             {'role': 'piano', 'name': 'Ann Jones'}]
+
+
+def test_index(store):
+    store.upsert(make_concert_scrape('https://example.com/event/a/'))
+    store.upsert(make_concert_scrape('https://example.com/event/b/', last_modified=None))
+
+    index = store.index()
+    assert len(index) == 2
+    assert index.status('https://example.com/event/a/', datetime(2024, 1, 1, 12, tzinfo=timezone.utc)) == \
+        ScrapeResult.EXISTING
+    assert index.status('https://example.com/event/a/', datetime(2024, 2, 1, tzinfo=timezone.utc)) == \
+        ScrapeResult.UPDATED
+    assert index.status('https://example.com/event/c/', None) == ScrapeResult.NEW
+
+
+def test_unsynced_until_marked(store):
+    store.upsert(make_concert_scrape('https://example.com/event/a/'))
+    store.upsert(make_concert_scrape('https://example.com/event/b/'))
+    store.mark_synced(['https://example.com/event/a/'])
+
+    assert [row['url'] for row in store.unsynced_rows()] == ['https://example.com/event/b/']
+
+    store.upsert(make_concert_scrape('https://example.com/event/a/', title='Changed'))
+    assert [row['url'] for row in store.unsynced_rows()] == ['https://example.com/event/a/',
+                                                             'https://example.com/event/b/']
+
+
+def test_import_rows_are_synced(store):
+    store.import_rows(pd.DataFrame({
+        'url': ['https://example.com/event/a/', ''],
+        'scrape_date': ['2024-01-02T09:00:00', ''],
+        'title': ['From the sheet', ''],
+        'performers': ['[{"role": "piano", "name": "Ann Jones"}]', ''],
+    }))
+
+    assert len(store) == 1
+    assert store.unsynced_rows() == []
+    assert store.get('https://example.com/event/a/').concert.performers == [Performer(role='piano', name='Ann Jones')]
+
+
+
+def test_imported_dates_are_written_as_scraped(store):
+    store.import_rows(pd.DataFrame({
+        'url': ['https://example.com/event/a/'],
+        'scrape_date': ['2024-01-02T09:00:00'],
+        'last_modified': ['2024-01-02T12:00:00+00:00'],
+        'title': ['From the sheet'],
+        'date_parsed': ['2025-07-12T00:00:00'],
+    }))
+
+    row = store.get_row('https://example.com/event/a/')
+    assert row['last_modified'] == '2024-01-02T12:00:00Z'
+    assert row['date_parsed'] == '2025-07-12'
+
+def test_watermark(store):
+    assert store.get_watermark('oxfordphil.com') is None
+
+    store.set_watermark('oxfordphil.com', '2024-01-02T12:00:00+00:00', 'abc')
+    store.set_watermark('oxfordphil.com', '2024-01-03T12:00:00+00:00', None)
+
+    assert store.get_watermark('oxfordphil.com') == {'last_modified': '2024-01-03T12:00:00+00:00',
+                                                     'sitemap_hash': None}
+    assert store.in_memory_copy().get_watermark('oxfordphil.com') is not None
+
+def test_withdraw_and_reinstate(store):
+    for url in ('https://example.com/event/a/', 'https://example.com/event/b/'):
+        store.upsert(make_concert_scrape(url))
+    store.mark_synced(store.urls())
+
+    assert store.withdraw(['https://example.com/event/a/', 'https://example.com/event/gone/'],
+                          '2024-02-01T09:00:00') == 1
+    # already withdrawn
+    assert store.withdraw(['https://example.com/event/a/'], '2024-02-02T09:00:00') == 0
+    assert [(row['url'], row['withdrawn_at']) for row in store.unsynced_rows()] == \
+        [('https://example.com/event/a/', '2024-02-01T09:00:00')]
+
+    store.mark_synced(store.urls())
+    store.reinstate(['https://example.com/event/a/', 'https://example.com/event/b/'])
+    assert [(row['url'], row['withdrawn_at']) for row in store.unsynced_rows()] == \
+        [('https://example.com/event/a/', None)]
+
+
+def test_sitemap_urls(store):
+    assert store.sitemap_urls('oxfordphil.com') is None
+
+    store.set_sitemap_urls('oxfordphil.com', {'https://oxfordphil.com/event/a/': '2024-01-01T00:00:00+00:00'})
+    store.set_sitemap_urls('oxfordphil.com', {'https://oxfordphil.com/event/b/': None})
+
+    assert store.sitemap_urls('oxfordphil.com') == {'https://oxfordphil.com/event/b/': None}
+
+def test_concurrent_upserts(store):
+    urls = [f'https://example.com/event/{i}/' for i in range(50)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda url: store.upsert(make_concert_scrape(url)), urls))
+
+    assert len(store) == 50
+    assert store._conn.execute('SELECT COUNT(*) FROM performers').fetchone()[0] == 100
+
+
+def test_persists(tmp_path):
+    SQLiteConcertStore(tmp_path / 'concerts.db').upsert(make_concert_scrape('https://example.com/event/a/'))
+
+    assert len(SQLiteConcertStore(tmp_path / 'concerts.db')) == 1
+
+
+def test_sync_from_store():
+    store = SQLiteConcertStore()
+    spread = FakeSpread()
+    sheet_handler = SheetHandler(spread=spread)
+
+    assert sheet_handler.sync_from_store(store) == 0
+    assert sheet_handler.api_calls == 0
+    assert spread.calls['sheet_to_df'] == 0
+
+    store.upsert(make_concert_scrape('https://example.com/event/a/'))
+    store.upsert(make_concert_scrape('https://example.com/event/b/'))
+    assert sheet_handler.sync_from_store(store, dry_run=True) == 2
+    assert spread.calls['batch_update'] == 0
+    assert len(store.unsynced_rows()) == 2
+
+    assert sheet_handler.sync_from_store(store) == 2
+    assert spread.calls['batch_update'] == 1
+    assert list(spread.df['url']) == ['https://example.com/event/a/', 'https://example.com/event/b/']
+    assert store.unsynced_rows() == []
+
+
+def test_content_hash_ignores_dates_and_blanks():
+    row = concert_scrape_to_row(make_concert_scrape('https://example.com/event/a/'))
+    # as read back from the sheet: all strings, missing values blank
+    sheet_row = {column: '' if value is None else str(value) for column, value in row.items()}
+    sheet_row['last_modified'] = '2024-06-01T00:00:00Z'
+
+    assert content_hash(sheet_row) == content_hash(row)
+    assert content_hash({**row, 'title': 'Other'}) != content_hash(row)
+
+
+def test_touch_keeps_row_synced(store):
+    store.upsert(make_concert_scrape('https://example.com/event/a/'))
+    store.mark_synced(['https://example.com/event/a/'])
+    content = store.get_content_hash('https://example.com/event/a/')
+
+    store.touch('https://example.com/event/a/', '2024-06-01T00:00:00Z', '2024-06-02T09:00:00')
+
+    assert store.unsynced_rows() == []
+    assert store.get_row('https://example.com/event/a/')['last_modified'] == '2024-06-01T00:00:00Z'
+    assert store.get_content_hash('https://example.com/event/a/') == content
+    assert store.get_content_hash('https://example.com/event/missing/') is None
+
+
+def test_migrates_old_database(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'concerts.db')
+    conn.execute('CREATE TABLE concerts (url TEXT PRIMARY KEY, scrape_date TEXT, last_modified TEXT, '
+                 'title TEXT NOT NULL, date TEXT, date_parsed TEXT, start_time TEXT, end_time TEXT, venue TEXT, '
+                 'venue_address TEXT, ticket_prices TEXT, description TEXT, synced INTEGER NOT NULL DEFAULT 0)')
+    conn.execute("INSERT INTO concerts (url, title, synced) VALUES ('https://example.com/event/a/', 'Old', 1)")
+    conn.commit()
+    conn.close()
+
+    store = SQLiteConcertStore(tmp_path / 'concerts.db')
+
+    assert store.get_content_hash('https://example.com/event/a/') is None
+    store.upsert(make_concert_scrape('https://example.com/event/a/'))
+    assert store.get_content_hash('https://example.com/event/a/') is not None
+
+
+def test_archive_past_concerts(store):
+    past = make_concert_scrape('https://example.com/event/a/')
+    store.upsert(past.model_copy(update={'concert': Concert(title='Past', date='12 Jul 2025',
+                                                            date_parsed=date(2025, 7, 12))}))
+    store.upsert(past.model_copy(update={'url': 'https://example.com/event/b/',
+                                         'concert': Concert(title='Later', date='12 Jul 2099',
+                                                            date_parsed=date(2099, 7, 12))}))
+    store.mark_synced(['https://example.com/event/a/', 'https://example.com/event/b/'])
+
+    assert store.archive('2026-01-01', '2026-01-08T09:00:00') == 1
+    assert store.archive('2026-01-01', '2026-01-09T09:00:00') == 0
+
+    assert store.unsynced_rows() == []
+    assert [row['url'] for row in store.unsynced_rows(archived=True)] == ['https://example.com/event/a/']
+    assert store.index().status('https://example.com/event/a/', None) == ScrapeResult.EXISTING
+    # an archived concert stays out of the sheet
+    assert store.withdraw(['https://example.com/event/a/'], '2026-01-09T09:00:00') == 0
@@ -0,0 +1,41 @@
+from datetime import date, datetime, timezone
+
+import pandas as pd
+import pytest
+
+from concertscrape.common.dates import normalise_date_columns, parse_concert_date, parse_timestamp_column
+
+
+@pytest.mark.parametrize("text,expected", [
+    ('12 Jul 2025', date(2025, 7, 12)),
+    ('Friday 15 May 2020', date(2020, 5, 15)),
+    (' 15  May 2020\n', date(2020, 5, 15)),
+    ('Tonight', None),
+    ('', None),
+    (None, None),
+])
+def test_parse_concert_date(text, expected):
+    assert parse_concert_date(text) == expected
+
+
+def test_parse_timestamp_column():
+    parsed = parse_timestamp_column(pd.Series(['2024-01-02T03:04:05+01:00', '2024-01-02', '', None, 'soon']))
+
+    assert list(parsed[:2]) == [datetime(2024, 1, 2, 2, 4, 5, tzinfo=timezone.utc),
+                                datetime(2024, 1, 2, tzinfo=timezone.utc)]
+    assert parsed[2:].isna().all()
+
+
+def test_normalise_date_columns():
+    df = pd.DataFrame({
+        'url': ['a', 'b', 'c'],
+        'last_modified': ['2024-01-02T12:00:00+00:00', '2024-01-02T13:00:00+01:00', 'by hand'],
+        'date_parsed': ['2025-07-12', '2025-07-12T00:00:00', ''],
+    })
+
+    normalised = normalise_date_columns(df)
+
+    assert list(normalised['last_modified']) == ['2024-01-02T12:00:00Z', '2024-01-02T12:00:00Z', 'by hand']
+    assert list(normalised['date_parsed']) == ['2025-07-12', '2025-07-12', '']
+    # the snapshot itself is left alone
+    assert df['last_modified'][0] == '2024-01-02T12:00:00+00:00'
@@ -0,0 +1,136 @@
+from datetime import datetime
+import json
+
+import pytest
+
+from concertscrape.common.concert_schema import ConcertScrape
+from concertscrape.common.concert_sheet import concert_scrape_to_row
+from concertscrape.common.concert_store import SQLiteConcertStore
+from concertscrape.common.dedup import (cluster_duplicates, find_clusters, normalise_words, start_time_key,
+                                        venue_key)
+from concertscrape.musicatoxford.maoconcert import extract_concert as extract_mao_concert
+from concertscrape.oxfordphil.oxfordphilconcert import extract_concert as extract_oxfordphil_concert
+
+
+def concert_row(url, title, venue='Sheldonian Theatre', date_parsed='2025-07-12', start_time=None,
+                performers=()):
+    return {
+        'url': url, 'title': title, 'venue': venue, 'date_parsed': date_parsed, 'start_time': start_time,
+        'performers': json.dumps([{'role': '', 'name': name} for name in performers]),
+    }
+
+
+PHIL = concert_row('https://oxfordphil.com/event/ninth/', "Beethoven's Ninth Symphony", start_time='7.30pm',
+                   performers=['Marios Papadopoulos', 'Oxford Philharmonic Orchestra'])
+
+
+def test_normalise():
+    assert normalise_words('Dvořák’s  “New World”', {'the'}) == ['dvoraks', 'new', 'world']
+    assert venue_key('The Sheldonian Theatre, Oxford') == venue_key('Sheldonian Theatre, Broad Street') == \
+        venue_key('Sheldonian Theatre') == 'sheldonian theatre'
+
+
+@pytest.mark.parametrize('start_time, expected', [
+    ('19:30', '19:30'), ('7.30PM', '19:30'), ('7PM', '19:00'), ('7:30 p.m.', '19:30'), ('12pm', '12:00'),
+    ('11am', '11:00'), ('TBC', None), (None, None),
+])
+def test_start_time_key(start_time, expected):
+    assert start_time_key(start_time) == expected
+
+
+def extracted_row(url, extract_concert, html):
+    return concert_scrape_to_row(ConcertScrape(url=url, scrape_date=datetime(2025, 7, 1),
+                                               concert=extract_concert(html)))
+
+
+def oxfordphil_page(title='Simple Concert'):
+    return f"""
+    <h2 class="event-title">{title}</h2>
+    <div class="event-subtitle">12 Jul 2025 | 19:30 | Sheldonian Theatre, Broad Street</div>
+    <div class="event-description"><p><strong>Handel</strong> Water Music<br><br>
+    <strong>Bob Smith</strong> conductor</p></div>
+    """
+
+
+def mao_page(title='Simple Concert', start_time='7.30PM'):
+    return f"""
+    <div class="event-description">
+        <span class="event-description__date blue">Saturday 12 July 2025</span>
+        <a href="/venues/sheldonian-theatre/" class="event-description__venue blue">Sheldonian Theatre</a>
+        <h1 class="blue">{title}</h1>
+    </div>
+    <div class="event-information__single"><h3>Start Time</h3><p>{start_time}</p></div>
+    """
+
+
+@pytest.mark.parametrize('mao_html, duplicate', [
+    (mao_page(), True),
+    (mao_page(title='Oxford Philharmonic: Simple Concert'), True),
+    (mao_page(start_time='3PM'), False),
+    (mao_page(title='Messiah'), False),
+])
+def test_extracted_listings(mao_html, duplicate):
+    oxfordphil = extracted_row('https://oxfordphil.com/event/simple/', extract_oxfordphil_concert, oxfordphil_page())
+    mao = extracted_row('https://www.musicatoxford.com/whats-on/simple/', extract_mao_concert, mao_html)
+
+    clusters = find_clusters([oxfordphil, mao])
+
+    assert (clusters[oxfordphil['url']] is not None and clusters[oxfordphil['url']] == clusters[mao['url']]) == \
+        duplicate
+
+
+@pytest.mark.parametrize('other, duplicate', [
+    # the venue's listing of the same concert
+    (concert_row('https://www.musicatoxford.com/whats-on/ninth/', 'BEETHOVEN’S NINTH SYMPHONY',
+                 venue='The Sheldonian Theatre, Oxford', start_time='7.30 PM'), True),
+    # the title adds the ensemble
+    (concert_row('https://www.musicatoxford.com/whats-on/ninth/', "Oxford Philharmonic: Beethoven's Ninth Symphony"),
+     True),
+    # a different title, but the same performers
+    (concert_row('https://www.musicatoxford.com/whats-on/ninth/', "Papadopoulos conducts Beethoven's Ninth",
+                 performers=['Marios Papadopoulos']), True),
+    (concert_row('https://www.musicatoxford.com/whats-on/ninth/', "Beethoven's Ninth Symphony",
+                 start_time='3pm'), False),
+    (concert_row('https://www.musicatoxford.com/whats-on/ninth/', "Beethoven's Ninth Symphony",
+                 date_parsed='2025-07-13'), False),
+    (concert_row('https://www.musicatoxford.com/whats-on/ninth/', "Beethoven's Ninth Symphony",
+                 venue='Holywell Music Room'), False),
+    (concert_row('https://www.musicatoxford.com/whats-on/messiah/', "Handel's Messiah"), False),
+])
+def test_find_clusters(other, duplicate):
+    clusters = find_clusters([PHIL, other])
+
+    assert (clusters[PHIL['url']] is not None and clusters[PHIL['url']] == clusters[other['url']]) == duplicate
+
+
+def test_cluster_id_is_stable():
+    rows = [PHIL, concert_row('https://www.musicatoxford.com/whats-on/ninth/', "Beethoven's Ninth Symphony")]
+    cluster_id = find_clusters(rows)[PHIL['url']]
+
+    rows.append(concert_row('https://www.musicatoxford.com/whats-on/ninth-2/', "Beethoven's Ninth"))
+    assert set(find_clusters(rows).values()) == {cluster_id}
+    assert find_clusters(reversed(rows)) == find_clusters(rows)
+
+
+def test_undated_concerts_are_not_matched():
+    rows = [concert_row(f'https://example.com/event/{i}/', 'Gala', date_parsed=None) for i in range(2)]
+    assert find_clusters(rows) == dict.fromkeys(row['url'] for row in rows)
+
+
+def test_cluster_duplicates_in_store():
+    store = SQLiteConcertStore()
+    other = concert_row('https://www.musicatoxford.com/whats-on/ninth/', "Beethoven's Ninth Symphony")
+    for row in (PHIL, other):
+        store.upsert_row(row, synced=True)
+
+    assert cluster_duplicates(store) == 2
+    assert {row['url'] for row in store.unsynced_rows()} == {PHIL['url'], other['url']}
+    assert store.get_row(PHIL['url'])['cluster_id'] == store.get_row(other['url'])['cluster_id']
+
+    store.mark_synced([PHIL['url'], other['url']])
+    assert cluster_duplicates(store) == 0
+
+    # no longer alike, so both are out of the cluster
+    store.upsert_row({**other, 'title': "Handel's Messiah"}, synced=True)
+    cluster_duplicates(store)
+    assert store.get_row(PHIL['url'])['cluster_id'] is store.get_row(other['url'])['cluster_id'] is None
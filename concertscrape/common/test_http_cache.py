@@ -0,0 +1,122 @@
+import os
+import time
+
+import pytest
+
+from concertscrape.common.http_cache import HTTPCache
+from concertscrape.common.requests_session import RateLimitedRequestsSession
+
+
+def conditional_route(body, etag=None, last_modified=None):
+    """Route that answers 304 when the request's validators match"""
+    def route(handler):
+        headers = {'Content-Type': 'text/html; charset=utf-8'}
+        if etag:
+            headers['ETag'] = etag
+        if last_modified:
+            headers['Last-Modified'] = last_modified
+        if (etag and handler.headers.get('If-None-Match') == etag) or \
+                (last_modified and handler.headers.get('If-Modified-Since') == last_modified):
+            return 304, headers, b''
+        return 200, headers, body
+    return route
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return HTTPCache(tmp_path / 'http-cache')
+
+
+@pytest.fixture
+def session(cache):
+    return RateLimitedRequestsSession(rate_limit_enabled=False, cache=cache)
+
+
+def test_etag_revalidation(stand_in_server, session, cache):
+    stand_in_server.routes['/page'] = conditional_route('<h1>Café</h1>', etag='"v1"')
+
+    first = session.get(stand_in_server.url('/page'))
+    second = session.get(stand_in_server.url('/page'))
+
+    assert first.text == second.text == '<h1>Café</h1>'
+    assert second.status_code == 200
+    assert getattr(second, 'from_cache', False)
+    assert second.rate_limit_wait == 0
+    assert stand_in_server.requests[1]['headers']['If-None-Match'] == '"v1"'
+    assert cache.summary() == {
+        'HTTP cache hits': 1,
+        'HTTP cache misses': 1,
+        'HTTP cache bytes saved': len(first.content),
+        'HTTP bytes downloaded': len(first.content),
+    }
+
+
+def test_last_modified_revalidation(stand_in_server, session, cache):
+    stand_in_server.routes['/page'] = conditional_route('page', last_modified='Mon, 01 Jan 2024 12:00:00 GMT')
+
+    session.get(stand_in_server.url('/page'))
+    session.get(stand_in_server.url('/page'))
+
+    assert stand_in_server.requests[1]['headers']['If-Modified-Since'] == 'Mon, 01 Jan 2024 12:00:00 GMT'
+    assert cache.hits == 1
+
+
+def test_changed_page_is_replaced(stand_in_server, session, cache):
+    stand_in_server.routes['/page'] = conditional_route('old', etag='"v1"')
+    session.get(stand_in_server.url('/page'))
+    stand_in_server.routes['/page'] = conditional_route('new', etag='"v2"')
+
+    assert session.get(stand_in_server.url('/page')).text == 'new'
+    assert session.get(stand_in_server.url('/page')).text == 'new'
+    assert cache.hits == 1
+    assert cache.misses == 2
+
+
+def test_no_validators_not_cached(stand_in_server, session, cache):
+    stand_in_server.routes['/page'] = (200, {}, 'page')
+
+    session.get(stand_in_server.url('/page'))
+    session.get(stand_in_server.url('/page'))
+
+    assert 'If-None-Match' not in stand_in_server.requests[1]['headers']
+    assert cache.lookup(stand_in_server.url('/page')) is None
+    assert cache.misses == 2
+
+
+def test_cache_persists_on_disk(stand_in_server, session, tmp_path):
+    stand_in_server.routes['/page'] = conditional_route('page', etag='"v1"')
+    session.get(stand_in_server.url('/page'))
+
+    reopened = HTTPCache(tmp_path / 'http-cache')
+    response = RateLimitedRequestsSession(rate_limit_enabled=False, cache=reopened).get(stand_in_server.url('/page'))
+
+    assert response.text == 'page'
+    assert reopened.hits == 1
+
+
+def test_evict_by_age(stand_in_server, tmp_path):
+    cache = HTTPCache(tmp_path / 'http-cache', max_age=0.05)
+    session = RateLimitedRequestsSession(rate_limit_enabled=False, cache=cache)
+    stand_in_server.routes['/page'] = conditional_route('page', etag='"v1"')
+
+    session.get(stand_in_server.url('/page'))
+    time.sleep(0.1)
+    session.get(stand_in_server.url('/page'))
+
+    assert 'If-None-Match' not in stand_in_server.requests[1]['headers']
+    assert cache.hits == 0
+
+
+def test_evict_by_size(stand_in_server, tmp_path):
+    cache = HTTPCache(tmp_path / 'http-cache', max_bytes=250)
+    session = RateLimitedRequestsSession(rate_limit_enabled=False, cache=cache)
+    for i in range(3):
+        stand_in_server.routes[f'/{i}'] = conditional_route('x' * 100, etag=f'"{i}"')
+        session.get(stand_in_server.url(f'/{i}'))
+        time.sleep(0.01)
+
+    # the oldest entry made way for the newest
+    assert cache.lookup(stand_in_server.url('/0')) is None
+    assert cache.lookup(stand_in_server.url('/1')) is not None
+    assert cache.lookup(stand_in_server.url('/2')) is not None
+    assert len([f for f in os.listdir(cache.directory) if f.endswith('.body')]) == 2
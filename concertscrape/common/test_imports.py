@@ -0,0 +1,37 @@
+import subprocess
+import sys
+
+import pytest
+
+from concertscrape.common.profiling import measure_import
+
+# Seconds to import each entry point in a fresh interpreter. They were all
+# around 0.9s while the Google Sheets and pandas imports were eager.
+IMPORT_BUDGETS = {
+    'concertscrape.main': 0.5,
+    'concertscrape.musicatoxford.mao': 0.6,
+    'concertscrape.oxfordphil.oxfordphil': 0.6,
+}
+
+# Only imported when the sheet or the network is first used
+HEAVY_MODULES = ['pandas', 'gspread', 'gspread_pandas', 'google.oauth2', 'requests']
+
+
+@pytest.mark.parametrize('module', IMPORT_BUDGETS)
+def test_import_budget(module):
+    seconds, imported = measure_import(module)
+
+    assert [heavy for heavy in HEAVY_MODULES if heavy in imported] == []
+    slowest = sorted(imported.items(), key=lambda item: item[1], reverse=True)[1:6]
+    assert seconds < IMPORT_BUDGETS[module], f"{module} took {seconds:.3f}s to import. Slowest: {slowest}"
+
+
+def test_import_has_no_side_effects():
+    code = '\n'.join([
+        'import logging',
+        'import concertscrape.main, concertscrape.musicatoxford.mao, concertscrape.oxfordphil.oxfordphil',
+        'from concertscrape.common import requests_session',
+        'assert not logging.getLogger().handlers',
+        'assert requests_session._default_session is None',
+    ])
+    subprocess.run([sys.executable, '-c', code], check=True)
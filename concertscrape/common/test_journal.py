@@ -0,0 +1,40 @@
+from concertscrape.common.journal import RunJournal
+
+
+def test_fresh_start_forgets_previous_run(tmp_path):
+    journal = RunJournal(tmp_path / 'journal.jsonl')
+    journal.start('scrape')
+    journal.complete('https://example.com/a/', 'new')
+    journal._file.close()
+
+    assert RunJournal(tmp_path / 'journal.jsonl').start('scrape') == set()
+
+
+def test_resume_unfinished_run(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = RunJournal(path)
+    journal.start('scrape')
+    journal.complete('https://example.com/a/', 'new')
+    journal.complete('https://example.com/b/', 'gone')
+    journal._file.close()
+    # a crash partway through writing a line
+    with open(path, 'a') as f:
+        f.write('{"event": "compl')
+
+    resumed = RunJournal(path)
+    assert resumed.start('scrape', resume=True) == {'https://example.com/a/', 'https://example.com/b/'}
+    resumed.complete('https://example.com/c/', 'updated')
+
+    assert RunJournal(path).unfinished_run('scrape')[1] == {
+        'https://example.com/a/', 'https://example.com/b/', 'https://example.com/c/'}
+    resumed.finish()
+    assert RunJournal(path).unfinished_run('scrape') is None
+
+
+def test_resume_only_same_kind_of_run(tmp_path):
+    journal = RunJournal(tmp_path / 'journal.jsonl')
+    journal.start('reextract')
+    journal.complete('https://example.com/a/', 'new')
+    journal._file.close()
+
+    assert RunJournal(tmp_path / 'journal.jsonl').start('scrape', resume=True) == set()
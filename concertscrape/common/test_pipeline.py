@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from concertscrape.common.pipeline import Pipeline, Stage
+
+
+def sleeper(seconds, record=None):
+    def stage(item):
+        time.sleep(seconds)
+        if record is not None:
+            record.append(item)
+        return item
+    return stage
+
+
+def test_items_pass_through_stages_in_order():
+    written = []
+    Pipeline([
+        Stage('double', lambda item: item * 2),
+        Stage('skip odd', lambda item: item if item % 4 else None),
+        Stage('write', written.append),
+    ]).run(range(10))
+
+    assert written == [2, 6, 10, 14, 18]
+
+
+def test_stages_overlap():
+    start = time.monotonic()
+    Pipeline([
+        Stage('fetch', sleeper(0.05)),
+        Stage('extract', sleeper(0.05)),
+        Stage('write', sleeper(0.05)),
+    ]).run(range(10))
+
+    # about as long as the slowest stage, 0.5s, rather than all three in turn, 1.5s
+    assert time.monotonic() - start < 1.0
+
+
+def test_stage_workers():
+    start = time.monotonic()
+    Pipeline([Stage('fetch', sleeper(0.1), workers=5)]).run(range(10))
+
+    assert time.monotonic() - start < 0.5
+
+
+def test_backpressure():
+    fed = []
+    written = []
+
+    def items():
+        for i in range(20):
+            fed.append(i)
+            yield i
+
+    def write(item):
+        # by now the feeder has only been let run a couple of queues ahead
+        assert len(fed) - len(written) <= 2 * 2 + 3
+        time.sleep(0.01)
+        written.append(item)
+
+    Pipeline([Stage('pass', lambda item: item), Stage('write', write)], queue_size=2).run(items())
+
+    assert written == list(range(20))
+
+
+def test_item_errors_go_to_on_error():
+    errors = []
+
+    def fetch(item):
+        if item == 3:
+            raise ValueError('broken page')
+        return item
+
+    written = []
+    Pipeline([
+        Stage('fetch', fetch, workers=2, on_error=lambda item, e: errors.append((item, str(e)))),
+        Stage('write', written.append),
+    ]).run(range(5))
+
+    assert errors == [(3, 'broken page')]
+    assert sorted(written) == [0, 1, 2, 4]
+
+
+def test_unhandled_error_cancels_and_is_raised():
+    fed = []
+
+    def items():
+        for i in range(1000):
+            fed.append(i)
+            yield i
+
+    def write(item):
+        if item == 5:
+            raise OSError('disk full')
+
+    with pytest.raises(OSError, match='disk full'):
+        Pipeline([Stage('fetch', sleeper(0.001)), Stage('write', write)], queue_size=2).run(items())
+    assert len(fed) < 1000
+
+
+def test_cancel():
+    written = []
+    pipeline = Pipeline([Stage('fetch', sleeper(0.01)), Stage('write', written.append)])
+    threading.Timer(0.1, pipeline.cancel).start()
+
+    start = time.monotonic()
+    pipeline.run(iter(range(10000)))
+
+    assert time.monotonic() - start < 1
+    assert 0 < len(written) < 10000
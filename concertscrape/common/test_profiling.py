@@ -0,0 +1,36 @@
+import threading
+import time
+
+from concertscrape.common.profiling import SamplingProfiler
+
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_samples_other_threads(tmp_path):
+    with SamplingProfiler(interval=0.001) as profiler:
+        thread = threading.Thread(target=spin, args=(0.2,))
+        thread.start()
+        thread.join()
+
+    assert profiler.samples > 10
+    hot = {label.split(' ')[0]: own for label, own, total in profiler.hot_functions(5)}
+    assert hot['spin'] > 10
+    # the profiler doesn't sample itself
+    assert not any('_run' in stack.split(';')[-1] for stack in profiler.stacks)
+
+
+def test_write_collapsed(tmp_path):
+    profiler = SamplingProfiler()
+    profiler.sample()
+    profiler.sample()
+    profiler.write_collapsed(tmp_path / 'profile.collapsed')
+
+    lines = (tmp_path / 'profile.collapsed').read_text().splitlines()
+    stack, count = lines[0].rsplit(' ', 1)
+    assert int(count) >= 1
+    assert stack.split(';')[-1].startswith('sample (profiling.py:')
+    assert 'test_write_collapsed (test_profiling.py:' in stack
@@ -0,0 +1,26 @@
+import pytest
+
+from concertscrape.common.registry import get_scrapers, register
+from concertscrape.musicatoxford.mao import ConcertScraper
+from concertscrape.oxfordphil.oxfordphil import OxfordPhilConcertScraper
+
+
+def test_all_sites_registered():
+    assert get_scrapers() == [ConcertScraper, OxfordPhilConcertScraper]
+
+
+def test_select_sites():
+    assert get_scrapers(['oxfordphil.com']) == [OxfordPhilConcertScraper]
+
+
+def test_unknown_site():
+    with pytest.raises(ValueError, match='example.com'):
+        get_scrapers(['example.com'])
+
+
+def test_site_id_registered_twice():
+    class Imposter(OxfordPhilConcertScraper):
+        pass
+
+    with pytest.raises(ValueError):
+        register(Imposter)
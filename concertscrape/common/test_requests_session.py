@@ -0,0 +1,212 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import time
+
+import pytest
+import requests
+
+from concertscrape.common.requests_session import RateLimitedRequestsSession, TokenBucket, parse_retry_after
+
+
+def fetch_all(session, urls, max_workers=8):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(session.get, urls))
+
+
+def start_gaps(requests):
+    # measured at the server, so allow some scheduling jitter against the 0.1s delay
+    return [b['start'] - a['start'] for a, b in zip(requests, requests[1:])]
+
+
+def test_token_bucket_burst_then_rate():
+    bucket = TokenBucket(rate=20, burst=3, max_in_flight=10)
+    waits = []
+    for _ in range(5):
+        waits.append(bucket.acquire())
+        bucket.release()
+    # the burst is immediate, then one token every 1/20s
+    assert all(wait < 0.01 for wait in waits[:3])
+    assert all(wait > 0.03 for wait in waits[3:])
+
+
+def test_hosts_are_limited_separately(stand_in_server):
+    session = RateLimitedRequestsSession(delay=0.1)
+    urls = [stand_in_server.url(f'/{i}', host=host) for i in range(4) for host in ('localhost', '127.0.0.1')]
+
+    start = time.monotonic()
+    responses = fetch_all(session, urls)
+    elapsed = time.monotonic() - start
+
+    assert all(response.status_code == 200 for response in responses)
+    for host in ('localhost', '127.0.0.1'):
+        requests = stand_in_server.requests_for(host)
+        assert len(requests) == 4
+        assert all(gap >= 0.07 for gap in start_gaps(requests))
+    # the two hosts overlap, rather than 8 requests one after the other
+    assert elapsed < 0.6
+
+
+def test_max_in_flight(stand_in_server):
+    stand_in_server.response_delay = 0.1
+    session = RateLimitedRequestsSession(delay=0.001, burst=10, max_in_flight=2)
+
+    fetch_all(session, [stand_in_server.url(f'/{i}') for i in range(6)])
+
+    assert stand_in_server.max_active['127.0.0.1'] == 2
+
+
+def test_host_limits_override(stand_in_server):
+    port = stand_in_server.server_address[1]
+    session = RateLimitedRequestsSession(delay=0.001, burst=10, host_limits={
+        f'localhost:{port}': {'delay': 0.1, 'burst': 1},
+    })
+    urls = [stand_in_server.url(f'/{i}', host=host) for i in range(3) for host in ('localhost', '127.0.0.1')]
+
+    fetch_all(session, urls)
+
+    assert all(gap >= 0.07 for gap in start_gaps(stand_in_server.requests_for('localhost')))
+    assert max(start_gaps(stand_in_server.requests_for('127.0.0.1'))) < 0.07
+
+
+def test_rate_limit_disabled(stand_in_server):
+    session = RateLimitedRequestsSession(rate_limit_enabled=False, delay=10)
+
+    start = time.monotonic()
+    fetch_all(session, [stand_in_server.url(f'/{i}') for i in range(3)])
+
+    assert time.monotonic() - start < 1
+
+
+def test_summary(stand_in_server):
+    stand_in_server.routes['/page'] = (200, {}, 'x' * 1000)
+    session = RateLimitedRequestsSession(delay=0.1)
+
+    responses = fetch_all(session, [stand_in_server.url('/page')] * 3)
+
+    summary = session.summary()
+    assert summary['HTTP requests'] == 3
+    assert summary['HTTP bytes received'] == 3000
+    # the 2nd and 3rd requests waited about 0.1s and 0.2s
+    assert summary['Rate limit sleep seconds'] > 0.2
+    assert summary['HTTP retries'] == 0
+    assert sum(response.rate_limit_wait for response in responses) == pytest.approx(
+        summary['Rate limit sleep seconds'], abs=0.001)
+
+
+def throttle(responses):
+    """A route answering with each of `responses` in turn, then 200"""
+    responses = list(responses)
+
+    def route(handler):
+        return responses.pop(0) if responses else (200, {}, 'ok')
+    return route
+
+
+def test_retry_after_is_honoured(stand_in_server):
+    stand_in_server.routes['/page'] = throttle([(429, {'Retry-After': '1'}, 'slow down')])
+    session = RateLimitedRequestsSession(delay=0.01)
+
+    response = session.get(stand_in_server.url('/page'))
+
+    assert response.status_code == 200
+    first, second = stand_in_server.requests_for('127.0.0.1')
+    assert second['start'] - first['start'] >= 0.95
+    assert session.summary()['HTTP retries'] == 1
+
+
+def test_retry_after_pauses_whole_host(stand_in_server):
+    stand_in_server.routes['/0'] = throttle([(503, {'Retry-After': '1'}, 'busy')])
+    stand_in_server.response_delay = 0.05
+    session = RateLimitedRequestsSession(delay=0.01, burst=10)
+
+    responses = fetch_all(session, [stand_in_server.url(f'/{i}') for i in range(4)], max_workers=4)
+
+    assert all(response.status_code == 200 for response in responses)
+    sent = stand_in_server.requests_for('127.0.0.1')
+    throttled = next(r for r in sent if r['path'] == '/0')
+    # nothing sent after the 503 until the Retry-After was up
+    after = [r['start'] for r in sent if r['start'] > throttled['end']]
+    assert after and min(after) - throttled['end'] >= 0.9
+
+
+def test_server_errors_are_retried_with_backoff(stand_in_server):
+    stand_in_server.routes['/page'] = throttle([(500, {}, 'oops'), (502, {}, 'oops')])
+    session = RateLimitedRequestsSession(delay=0.001, backoff=0.1)
+
+    response = session.get(stand_in_server.url('/page'))
+
+    assert response.status_code == 200
+    starts = [r['start'] for r in stand_in_server.requests_for('127.0.0.1')]
+    # jittered between half and all of 0.1s, then of 0.2s
+    assert 0.04 <= starts[1] - starts[0] <= 0.2
+    assert 0.09 <= starts[2] - starts[1] <= 0.3
+
+
+def test_gives_up_after_retries(stand_in_server):
+    stand_in_server.routes['/page'] = (503, {}, 'down')
+    session = RateLimitedRequestsSession(delay=0.001, backoff=0.01, retries=2)
+
+    response = session.get(stand_in_server.url('/page'))
+
+    assert response.status_code == 503
+    assert len(stand_in_server.requests) == 3
+
+
+def test_long_retry_after_is_not_waited_for(stand_in_server):
+    stand_in_server.routes['/page'] = (429, {'Retry-After': '3600'}, 'come back tomorrow')
+    session = RateLimitedRequestsSession(delay=0.001)
+
+    assert session.get(stand_in_server.url('/page')).status_code == 429
+    assert len(stand_in_server.requests) == 1
+
+
+def test_post_is_not_retried():
+    session = RateLimitedRequestsSession(delay=0.001, backoff=0.01)
+
+    with pytest.raises(requests.ConnectionError):
+        session.post('http://127.0.0.1:1/form')
+    assert session.summary()['HTTP retries'] == 0
+
+
+def test_connection_errors_are_retried():
+    session = RateLimitedRequestsSession(delay=0.001, backoff=0.01, retries=2)
+
+    with pytest.raises(requests.ConnectionError):
+        session.get('http://127.0.0.1:1/')
+    assert session.summary()['HTTP retries'] == 2
+
+
+def test_rate_adapts_to_host(stand_in_server):
+    stand_in_server.routes['/page'] = throttle([(503, {}, 'busy')] * 2)
+    session = RateLimitedRequestsSession(delay=0.01, backoff=0.001)
+    bucket = session.bucket_for(stand_in_server.url('/page'))
+
+    session.get(stand_in_server.url('/page'))
+    # halved twice for the errors, then a tenth of the rate added back
+    assert bucket.rate == pytest.approx(100 / 4 + 10)
+
+    for _ in range(10):
+        session.get(stand_in_server.url('/page'))
+    assert bucket.rate == 100
+
+
+def test_slow_host_is_slowed_down(stand_in_server):
+    stand_in_server.response_delay = 0.1
+    session = RateLimitedRequestsSession(delay=0.01, slow_response=0.05, max_delay=0.04)
+    bucket = session.bucket_for(stand_in_server.url('/'))
+
+    for i in range(3):
+        session.get(stand_in_server.url(f'/{i}'))
+
+    # no slower than max_delay
+    assert bucket.rate == 25
+    assert session.summary()['HTTP retries'] == 0
+
+
+def test_parse_retry_after():
+    now = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+    assert parse_retry_after('120') == 120
+    assert parse_retry_after('Wed, 01 Jan 2025 12:00:30 GMT', now=now) == 30
+    assert parse_retry_after('Wed, 01 Jan 2025 11:00:00 GMT', now=now) == 0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
@@ -0,0 +1,429 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timezone
+
+import pandas as pd
+import pytest
+
+from concertscrape.common.concert_schema import Concert
+from concertscrape.common.concert_sheet import SheetHandler, SheetReadError
+from concertscrape.common.concert_store import SQLiteConcertStore
+from concertscrape.common.fake_spread import FakeSpread
+from concertscrape.common.journal import RunJournal
+from concertscrape.common.requests_session import RateLimitedRequestsSession
+from concertscrape.common.scraper import SitemapScraper, run_scrapers
+from concertscrape.common.snapshots import SnapshotStore
+from concertscrape.common.stats import ScrapingStats, ScrapeResult
+from concertscrape.oxfordphil.oxfordphil import OxfordPhilConcertScraper
+
+
+def sitemap_xml(urls, lastmod='2024-01-02T12:00:00+00:00'):
+    entries = ''.join(f'<url><loc>{url}</loc><lastmod>{lastmod}</lastmod></url>' for url in urls)
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>'
+
+
+def extract_stand_in_concert(html_content):
+    if html_content == 'broken':
+        raise ValueError('unparseable page')
+    return Concert(title=html_content, date='12 Jul 2099', date_parsed=date(2099, 7, 12))
+
+
+class StandInScraper(SitemapScraper):
+    extract_concert = staticmethod(extract_stand_in_concert)
+
+    def __init__(self, host, server, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.site_id = host
+        self.sitemap_url = server.url('/sitemap.xml', host=host)
+
+    def is_concert_url(self, url):
+        return '/event/' in url
+
+
+@pytest.fixture
+def site(stand_in_server):
+    hosts = ('localhost', '127.0.0.1')
+    stand_in_server.routes['/sitemap.xml'] = lambda handler: (
+        200, {}, sitemap_xml([stand_in_server.url(f'/event/{i}/', host=handler.headers['Host'].split(':')[0])
+                              for i in range(4)] + [stand_in_server.url('/about/')]))
+    for i in range(4):
+        stand_in_server.routes[f'/event/{i}/'] = (200, {}, f'Concert {i}')
+    return stand_in_server, hosts
+
+
+def test_scrape_site(site):
+    server, hosts = site
+    store = SQLiteConcertStore()
+    store.import_rows(pd.DataFrame({
+        'url': [server.url('/event/0/'), server.url('/event/1/')],
+        'scrape_date': ['2024-01-01T09:00:00', '2024-01-01T09:00:00'],
+        'title': ['Old 0', 'Old 1'],
+        'last_modified': ['2024-01-01T12:00:00+00:00', '2024-01-03T12:00:00+00:00'],
+    }))
+    stats = ScrapingStats()
+    scraper = StandInScraper('127.0.0.1', server, store,
+                             session=RateLimitedRequestsSession(delay=0.01), stats=stats)
+
+    scraper.scrape()
+
+    counts = stats.stats['127.0.0.1']
+    assert counts[ScrapeResult.NEW] == 2
+    assert counts[ScrapeResult.UPDATED] == 1
+    assert counts[ScrapeResult.EXISTING] == 1
+    assert sorted(store.get(server.url(f'/event/{i}/')).concert.title for i in range(4)) == \
+        ['Concert 0', 'Concert 2', 'Concert 3', 'Old 1']
+    assert sorted(row['title'] for row in store.unsynced_rows()) == ['Concert 0', 'Concert 2', 'Concert 3']
+
+
+def test_rate_limit_wait_is_timed_apart(site):
+    server, hosts = site
+    stats = ScrapingStats()
+    scraper = StandInScraper('127.0.0.1', server, SQLiteConcertStore(),
+                             session=RateLimitedRequestsSession(delay=0.1), stats=stats)
+
+    scraper.scrape()
+
+    phases = stats.phase_summary()
+    # the sitemap and 4 pages, each waiting its turn
+    assert phases['rate_limit_wait']['count'] == 5
+    assert phases['page_fetch']['count'] == 4
+    assert phases['rate_limit_wait']['total'] > 0.3
+    assert all('rate_limit_wait' in stats.url_timings[server.url(f'/event/{i}/')] for i in range(4))
+
+
+def test_refetched_unchanged_concert_is_not_written(site):
+    server, hosts = site
+    store = SQLiteConcertStore()
+    scraper = StandInScraper('127.0.0.1', server, store, session=RateLimitedRequestsSession(delay=0.01))
+    scraper.scrape()
+    store.mark_synced(row['url'] for row in store.unsynced_rows())
+
+    # WordPress touched every page, but only one concert changed
+    server.routes['/sitemap.xml'] = (200, {}, sitemap_xml([server.url(f'/event/{i}/') for i in range(4)],
+                                                          lastmod='2024-02-01T12:00:00+00:00'))
+    server.routes['/event/3/'] = (200, {}, 'Concert 3, rescheduled')
+    stats = ScrapingStats()
+    scraper.stats = stats
+    scraper.scrape()
+
+    assert stats.stats['127.0.0.1'][ScrapeResult.UNCHANGED] == 3
+    assert stats.stats['127.0.0.1'][ScrapeResult.UPDATED] == 1
+    assert [row['title'] for row in store.unsynced_rows()] == ['Concert 3, rescheduled']
+    # the new lastmod is kept, so the pages aren't fetched again next time
+    assert store.get_row(server.url('/event/0/'))['last_modified'] == '2024-02-01T12:00:00Z'
+
+
+def test_unchanged_sitemap_skips_site(site):
+    server, hosts = site
+    store = SQLiteConcertStore()
+    scraper = StandInScraper('127.0.0.1', server, store, session=RateLimitedRequestsSession(delay=0.01))
+    scraper.scrape()
+    assert store.get_watermark('127.0.0.1')['last_modified'] == '2024-01-02T12:00:00+00:00'
+    requests_before = len(server.requests)
+
+    scraper.scrape()
+
+    # just the sitemap
+    assert len(server.requests) == requests_before + 1
+
+
+def test_entries_older_than_watermark_are_not_compared(site):
+    server, hosts = site
+    store = SQLiteConcertStore()
+    # as if the store had lost the concerts since the last run
+    store.set_watermark('127.0.0.1', '2024-01-02T12:00:00+00:00', None)
+    store.set_sitemap_urls('127.0.0.1', {server.url(f'/event/{i}/'): None for i in range(4)})
+    stats = ScrapingStats()
+    scraper = StandInScraper('127.0.0.1', server, store, session=RateLimitedRequestsSession(delay=0.01),
+                             stats=stats)
+
+    scraper.scrape()
+    assert len(store) == 0
+    assert stats.stats['127.0.0.1'][ScrapeResult.EXISTING] == 4
+
+    scraper.scrape(full=True)
+    assert len(store) == 4
+
+
+def test_entry_new_to_sitemap_with_old_lastmod_is_scraped(site):
+    server, hosts = site
+    store = SQLiteConcertStore()
+    scraper = StandInScraper('127.0.0.1', server, store, session=RateLimitedRequestsSession(delay=0.01))
+    scraper.scrape()
+
+    # added to the sitemap with a lastmod older than the watermark
+    server.routes['/event/4/'] = (200, {}, 'Concert 4')
+    server.routes['/sitemap.xml'] = (200, {}, sitemap_xml([server.url(f'/event/{i}/') for i in range(4)])
+                                     .replace('</urlset>', f'<url><loc>{server.url("/event/4/")}</loc>'
+                                              '<lastmod>2023-06-01T12:00:00+00:00</lastmod></url></urlset>'))
+    scraper.scrape()
+
+    assert store.get(server.url('/event/4/')).concert.title == 'Concert 4'
+    fetched = [request['path'] for request in server.requests if request['path'].startswith('/event/')]
+    assert fetched.count('/event/0/') == 1
+
+def test_concerts_removed_from_sitemap_are_withdrawn(site, tmp_path):
+    server, hosts = site
+    StandInSiteScraper.server = server
+    spread = FakeSpread()
+    store = SQLiteConcertStore()
+    run_args = dict(sheet_handler=SheetHandler(spread=spread), archive_handler=SheetHandler(spread=FakeSpread()),
+                    session=RateLimitedRequestsSession(delay=0.01),
+                    snapshots=SnapshotStore(tmp_path / 'snapshots'), store=store,
+                    journal=RunJournal(tmp_path / 'journal.jsonl'))
+    run_scrapers([StandInSiteScraper], **run_args)
+    batch_updates = spread.calls['batch_update']
+
+    server.routes['/sitemap.xml'] = (200, {}, sitemap_xml([server.url(f'/event/{i}/') for i in (0, 1, 3)]))
+    stats = run_scrapers([StandInSiteScraper], **run_args)
+
+    withdrawn = spread.df[spread.df['withdrawn_at'] != '']
+    assert list(withdrawn['url']) == [server.url('/event/2/')]
+    assert spread.calls['batch_update'] == batch_updates + 1
+    assert stats.stats['127.0.0.1'][ScrapeResult.WITHDRAWN] == 1
+
+    # back again
+    server.routes['/sitemap.xml'] = (200, {}, sitemap_xml([server.url(f'/event/{i}/') for i in range(4)]))
+    run_scrapers([StandInSiteScraper], **run_args)
+    assert (spread.df['withdrawn_at'] == '').all()
+
+def test_only_upcoming_concerts_are_withdrawn(site):
+    server, hosts = site
+    store = SQLiteConcertStore()
+    # stored, but not in the sitemap when it is first recorded
+    store.upsert_row({'url': server.url('/event/old/'), 'title': 'Old', 'date_parsed': '2099-01-01'})
+    scraper = StandInScraper('127.0.0.1', server, store, session=RateLimitedRequestsSession(delay=0.01))
+    scraper.scrape()
+    assert store.get_row(server.url('/event/old/'))['withdrawn_at'] is None
+
+    # event 3 has taken place, and 1 is undated, and both are dropped with event 2
+    store.upsert_row({'url': server.url('/event/3/'), 'title': 'Concert 3', 'date_parsed': '2025-07-12'})
+    store.upsert_row({'url': server.url('/event/1/'), 'title': 'Concert 1', 'date_parsed': None})
+    server.routes['/sitemap.xml'] = (200, {}, sitemap_xml([server.url('/event/0/')]))
+    scraper.scrape()
+
+    assert [url for url in store.urls() if store.get_row(url)['withdrawn_at']] == [server.url('/event/2/')]
+
+
+def test_scrape_error_is_counted(site):
+    server, hosts = site
+    server.routes['/event/2/'] = (200, {}, 'broken')
+    server.routes['/event/3/'] = (500, {}, 'oops')
+    stats = ScrapingStats()
+    scraper = StandInScraper('127.0.0.1', server, SQLiteConcertStore(),
+                             session=RateLimitedRequestsSession(delay=0.01, backoff=0.01), stats=stats)
+
+    scraper.scrape()
+
+    assert stats.stats['127.0.0.1'][ScrapeResult.NEW] == 2
+    assert stats.stats['127.0.0.1'][ScrapeResult.ERROR] == 2
+    # so the failed pages are tried again next time
+    assert scraper.store.get_watermark('127.0.0.1') is None
+
+
+def test_extract_pool(site):
+    server, hosts = site
+    for i in range(4, 8):
+        server.routes[f'/event/{i}/'] = (200, {}, f'Concert {i}')
+    server.routes['/sitemap.xml'] = (200, {}, sitemap_xml([server.url(f'/event/{i}/') for i in range(8)]))
+    server.routes['/event/1/'] = (200, {}, 'broken')
+    server.routes['/event/2/'] = (404, {}, '')
+    store = SQLiteConcertStore()
+    stats = ScrapingStats()
+
+    with ProcessPoolExecutor(max_workers=1) as extract_pool:
+        scraper = StandInScraper('127.0.0.1', server, store, session=RateLimitedRequestsSession(delay=0.001),
+                                 stats=stats, extract_pool=extract_pool)
+        scraper.scrape()
+
+    # the one worker carried on past the broken page
+    assert stats.stats['127.0.0.1'][ScrapeResult.NEW] == 6
+    assert stats.stats['127.0.0.1'][ScrapeResult.ERROR] == 1
+    assert store.get(server.url('/event/7/')).concert == extract_stand_in_concert('Concert 7')
+
+
+def test_sites_scraped_at_once_share_a_store(site):
+    server, hosts = site
+    store = SQLiteConcertStore()
+    session = RateLimitedRequestsSession(delay=0.05)
+    stats = ScrapingStats()
+    scrapers = [StandInScraper(host, server, store, session=session, stats=stats) for host in hosts]
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for future in [executor.submit(scraper.scrape) for scraper in scrapers]:
+            future.result()
+
+    assert len(store) == 8
+    # the hosts were crawled side by side, each at its own rate
+    localhost, loopback = server.requests_for('localhost'), server.requests_for('127.0.0.1')
+    assert localhost[0]['start'] < loopback[-1]['start']
+    assert loopback[0]['start'] < localhost[-1]['start']
+
+
+class NoNetworkSession(RateLimitedRequestsSession):
+    def request(self, method, url, *args, **kwargs):
+        raise AssertionError(f'Unexpected request: {url}')
+
+
+def test_fetched_pages_are_archived(site, tmp_path):
+    server, hosts = site
+    snapshots = SnapshotStore(tmp_path / 'snapshots')
+    scraper = StandInScraper('127.0.0.1', server, SQLiteConcertStore(),
+                             session=RateLimitedRequestsSession(delay=0.01), snapshots=snapshots)
+
+    scraper.scrape()
+
+    records = snapshots.latest()
+    assert len(records) == 4
+    assert sorted(snapshots.read(record['sha256']) for record in records) == [f'Concert {i}' for i in range(4)]
+
+
+def test_reextract(tmp_path):
+    snapshots = SnapshotStore(tmp_path / 'snapshots')
+    page = '<h2 class="event-title">Simple Concert</h2>' \
+           '<div class="event-subtitle">12 Jul 2025 | 19:30 | Sheldonian Theatre</div>'
+    snapshots.add('https://oxfordphil.com/event/simple/', page,
+                  last_modified=datetime(2024, 1, 1, tzinfo=timezone.utc))
+    snapshots.add('https://oxfordphil.com/event/other/', page.replace('Simple', 'Other'))
+    snapshots.add('https://www.musicatoxford.com/whats-on/other/', page)
+    spread = FakeSpread()
+    stats = ScrapingStats()
+
+    run_scrapers([OxfordPhilConcertScraper], reextract=True, stats=stats, sheet_handler=SheetHandler(spread=spread),
+                 archive_handler=SheetHandler(spread=FakeSpread()), session=NoNetworkSession(), snapshots=snapshots, store=SQLiteConcertStore(),
+                 journal=RunJournal(tmp_path / 'journal.jsonl'), profile=tmp_path / 'profile.collapsed')
+
+    assert sorted(spread.df['title']) == ['Other Concert', 'Simple Concert']
+    row = spread.df[spread.df['url'] == 'https://oxfordphil.com/event/simple/'].iloc[0]
+    assert row['venue'] == 'Sheldonian Theatre'
+    assert row['last_modified'] == '2024-01-01T00:00:00Z'
+    assert stats.stats['oxfordphil.com'][ScrapeResult.NEW] == 2
+    assert (tmp_path / 'profile.collapsed').exists()
+    assert len(stats.slowest_urls()) == 2
+
+
+class StandInSiteScraper(StandInScraper):
+    """StandInScraper for run_scrapers, which constructs it with just the store"""
+    server = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__('127.0.0.1', self.server, *args, **kwargs)
+
+
+def test_run_syncs_only_changes_to_sheet(site, tmp_path):
+    server, hosts = site
+    StandInSiteScraper.server = server
+    spread = FakeSpread(pd.DataFrame({
+        'url': [server.url('/event/0/')],
+        'scrape_date': ['2024-01-01T09:00:00'],
+        'title': ['Old 0'],
+        'last_modified': ['2024-01-03T12:00:00+00:00'],
+    }))
+    store = SQLiteConcertStore()
+    session = RateLimitedRequestsSession(delay=0.01)
+    snapshots = SnapshotStore(tmp_path / 'snapshots')
+    journal = RunJournal(tmp_path / 'journal.jsonl')
+
+    # the first run seeds the store from the sheet, then writes the 3 new concerts
+    run_scrapers([StandInSiteScraper], sheet_handler=SheetHandler(spread=spread),
+                 archive_handler=SheetHandler(spread=FakeSpread()), session=session, snapshots=snapshots, store=store,
+                 journal=journal)
+    assert sorted(spread.df['title']) == ['Concert 1', 'Concert 2', 'Concert 3', 'Old 0']
+    assert spread.calls['sheet_to_df'] == 1
+    assert spread.calls['batch_update'] == 1
+    assert store.unsynced_rows() == []
+
+    # nothing changed, so the sheet isn't read or written
+    sheet_handler = SheetHandler(spread=spread)
+    archive_handler = SheetHandler(spread=FakeSpread())
+    run_scrapers([StandInSiteScraper], sheet_handler=sheet_handler, archive_handler=archive_handler,
+                 session=session, snapshots=snapshots, store=store, journal=journal)
+    assert spread.calls['sheet_to_df'] == 1
+    assert spread.calls['batch_update'] == 1
+    assert sheet_handler.api_calls == archive_handler.api_calls == 0
+
+
+def test_dry_run_leaves_store_alone(site, tmp_path):
+    server, hosts = site
+    StandInSiteScraper.server = server
+    spread = FakeSpread()
+    store = SQLiteConcertStore()
+
+    run_scrapers([StandInSiteScraper], dry_run=True, sheet_handler=SheetHandler(spread=spread),
+                 archive_handler=SheetHandler(spread=FakeSpread()),
+                 session=RateLimitedRequestsSession(delay=0.01), snapshots=SnapshotStore(tmp_path), store=store)
+
+    assert len(store) == 0
+    assert spread.calls['batch_update'] == 0
+
+
+def test_unreadable_sheet_stops_run(site, tmp_path, monkeypatch):
+    server, hosts = site
+    StandInSiteScraper.server = server
+    spread = FakeSpread()
+    monkeypatch.setattr(spread, 'sheet_to_df', lambda **kwargs: 1 / 0)
+    store = SQLiteConcertStore()
+
+    with pytest.raises(SheetReadError):
+        run_scrapers([StandInSiteScraper], sheet_handler=SheetHandler(spread=spread),
+                     archive_handler=SheetHandler(spread=FakeSpread()), session=RateLimitedRequestsSession(delay=0.01),
+                     snapshots=SnapshotStore(tmp_path), store=store, journal=RunJournal(tmp_path / 'journal.jsonl'))
+
+    # not seeded, and nothing fetched to write over the sheet with
+    assert len(store) == 0
+    assert server.requests == []
+
+
+def test_resume_interrupted_run(site, tmp_path):
+    server, hosts = site
+    StandInSiteScraper.server = server
+    server.routes['/event/3/'] = (404, {}, '')
+    spread = FakeSpread(pd.DataFrame({'url': [server.url('/event/9/')], 'title': ['Seed']}))
+    store = SQLiteConcertStore()
+    store.import_rows(spread.sheet_to_df())
+    # the interrupted run had stored concert 0, without syncing it, and found 3 gone
+    store.upsert_row({'url': server.url('/event/0/'), 'title': 'Concert 0',
+                      'last_modified': '2024-01-02T12:00:00Z'}, synced=False)
+    journal = RunJournal(tmp_path / 'journal.jsonl')
+    journal.start('scrape')
+    journal.complete(server.url('/event/0/'), 'new')
+    journal.complete(server.url('/event/3/'), 'gone')
+    journal._file.close()
+
+    run_scrapers([StandInSiteScraper], resume=True, sheet_handler=SheetHandler(spread=spread),
+                 archive_handler=SheetHandler(spread=FakeSpread()),
+                 session=RateLimitedRequestsSession(delay=0.01), snapshots=SnapshotStore(tmp_path / 'snapshots'),
+                 store=store, journal=RunJournal(tmp_path / 'journal.jsonl'))
+
+    fetched = {request['path'] for request in server.requests}
+    assert fetched == {'/sitemap.xml', '/event/1/', '/event/2/'}
+    assert sorted(spread.df['title']) == ['Concert 0', 'Concert 1', 'Concert 2', 'Seed']
+    # finished, so the next run starts afresh
+    assert RunJournal(tmp_path / 'journal.jsonl').unfinished_run('scrape') is None
+
+
+def test_past_concerts_move_to_archive(site, tmp_path):
+    server, hosts = site
+    StandInSiteScraper.server = server
+    spread = FakeSpread(pd.DataFrame({
+        'url': [server.url('/event/0/'), server.url('/event/1/')],
+        'title': ['Past 0', 'Concert 1'],
+        'date_parsed': ['2024-01-01', '2099-07-12'],
+        'last_modified': ['2024-01-01T12:00:00Z', '2024-01-02T12:00:00Z'],
+    }))
+    archive_spread = FakeSpread()
+    run_args = dict(sheet_handler=SheetHandler(spread=spread), archive_handler=SheetHandler(spread=archive_spread),
+                    session=RateLimitedRequestsSession(delay=0.01), snapshots=SnapshotStore(tmp_path / 'snapshots'),
+                    store=SQLiteConcertStore(), journal=RunJournal(tmp_path / 'journal.jsonl'))
+
+    run_scrapers([StandInSiteScraper], **run_args)
+
+    fetched = {request['path'] for request in server.requests}
+    assert '/event/0/' not in fetched
+    assert list(archive_spread.df['title']) == ['Past 0']
+    assert server.url('/event/0/') not in set(spread.df['url'])
+    assert sorted(spread.df['title']) == ['Concert 1', 'Concert 2', 'Concert 3']
+
+    # already moved, so neither sheet is touched
+    calls = dict(spread.calls), dict(archive_spread.calls)
+    run_scrapers([StandInSiteScraper], **run_args)
+    assert (spread.calls, archive_spread.calls) == calls
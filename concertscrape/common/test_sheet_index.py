@@ -0,0 +1,57 @@
+from datetime import datetime, timezone
+
+import pandas as pd
+import pytest
+
+from concertscrape.common.sheet_index import SheetIndex
+from concertscrape.common.stats import ScrapeResult
+
+
+@pytest.fixture
+def sheet_index():
+    return SheetIndex(pd.DataFrame({
+        'url': ['https://example.com/event/a/', 'https://example.com/event/b/', 'https://example.com/event/c/'],
+        'last_modified': ['2024-01-01T12:00:00+00:00', '2024-01-01T12:00:00+01:00', ''],
+    }))
+
+
+def test_lookup_parses_last_modified(sheet_index):
+    assert len(sheet_index) == 3
+    assert 'https://example.com/event/a/' in sheet_index
+    assert sheet_index.get('https://example.com/event/a/') == datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+    # offsets are normalised
+    assert sheet_index.get('https://example.com/event/b/') == datetime(2024, 1, 1, 11, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("url,lastmod,expected", [
+    ('https://example.com/event/a/', datetime(2024, 1, 1, 12, tzinfo=timezone.utc), ScrapeResult.EXISTING),
+    ('https://example.com/event/a/', datetime(2024, 1, 2, tzinfo=timezone.utc), ScrapeResult.UPDATED),
+    ('https://example.com/event/a/', None, ScrapeResult.EXISTING),
+    # blank last_modified in the sheet means we can't tell, so refetch
+    ('https://example.com/event/c/', datetime(2020, 1, 1, tzinfo=timezone.utc), ScrapeResult.UPDATED),
+    ('https://example.com/event/z/', datetime(2020, 1, 1, tzinfo=timezone.utc), ScrapeResult.NEW),
+])
+def test_status(sheet_index, url, lastmod, expected):
+    assert sheet_index.status(url, lastmod) == expected
+
+
+def test_update(sheet_index):
+    sheet_index.update('https://example.com/event/z/', datetime(2024, 1, 1, tzinfo=timezone.utc))
+    assert sheet_index.status('https://example.com/event/z/', datetime(2024, 1, 1, tzinfo=timezone.utc)) == ScrapeResult.EXISTING
+
+
+def test_empty_sheet():
+    sheet_index = SheetIndex(pd.DataFrame())
+    assert len(sheet_index) == 0
+    assert sheet_index.status('https://example.com/event/a/', None) == ScrapeResult.NEW
+
+
+def test_archived_url_is_never_refetched():
+    sheet_index = SheetIndex(pd.DataFrame({
+        'url': ['https://example.com/event/a/'],
+        'last_modified': ['2024-01-01T12:00:00Z'],
+        'archived': [True],
+    }))
+    assert sheet_index.is_archived('https://example.com/event/a/')
+    assert sheet_index.status('https://example.com/event/a/', datetime(2025, 1, 1, tzinfo=timezone.utc)) == \
+        ScrapeResult.EXISTING
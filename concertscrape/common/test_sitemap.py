@@ -0,0 +1,128 @@
+from datetime import datetime, timezone
+import time
+import tracemalloc
+
+import pytest
+
+from concertscrape.common.sitemap import diff_sitemaps, iter_sitemap, parse_lastmod
+
+URLSET = """<?xml version="1.0" encoding="UTF-8"?><?xml-stylesheet type="text/xsl" href="//example.com/main-sitemap.xsl"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">
+    <url>
+        <loc>https://example.com/event/a/</loc>
+        <lastmod>2022-01-21T12:11:57+00:00</lastmod>
+        <image:image><image:loc>https://example.com/a.jpg</image:loc></image:image>
+    </url>
+    <url>
+        <loc>https://example.com/event/b/</loc>
+        <lastmod>2022-01-28</lastmod>
+    </url>
+    <url>
+        <loc>https://example.com/event/c/</loc>
+    </url>
+    <url>
+        <loc>https://example.com/about/</loc>
+        <lastmod>2022-01-28T08:33:18+00:00</lastmod>
+    </url>
+</urlset>
+"""
+
+INDEX = """<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+    <sitemap><loc>https://example.com/sitemap-1.xml</loc></sitemap>
+    <sitemap><loc>https://example.com/sitemap-2.xml</loc></sitemap>
+</sitemapindex>
+"""
+
+
+def child_sitemap(urls):
+    entries = ''.join(f'<url><loc>{url}</loc><lastmod>2024-01-01T00:00:00+00:00</lastmod></url>' for url in urls)
+    return f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>'
+
+
+def test_urlset():
+    assert list(iter_sitemap(URLSET)) == [
+        ('https://example.com/event/a/', datetime(2022, 1, 21, 12, 11, 57, tzinfo=timezone.utc)),
+        ('https://example.com/event/b/', datetime(2022, 1, 28, tzinfo=timezone.utc)),
+        ('https://example.com/event/c/', None),
+        ('https://example.com/about/', datetime(2022, 1, 28, 8, 33, 18, tzinfo=timezone.utc)),
+    ]
+
+
+def test_url_filter():
+    urls = [url for url, _ in iter_sitemap(URLSET.encode('utf-8'), url_filter=lambda url: '/event/' in url)]
+    assert urls == ['https://example.com/event/a/', 'https://example.com/event/b/', 'https://example.com/event/c/']
+
+
+def test_chunks():
+    data = URLSET.encode('utf-8')
+    chunks = (data[i:i + 7] for i in range(0, len(data), 7))
+    assert len(list(iter_sitemap(chunks))) == 4
+
+
+def test_sitemap_index():
+    children = {
+        'https://example.com/sitemap-1.xml': child_sitemap(['https://example.com/event/1/']),
+        'https://example.com/sitemap-2.xml': child_sitemap(['https://example.com/event/2/', 'https://example.com/x/']),
+    }
+    fetched = []
+
+    def fetch(url):
+        fetched.append(url)
+        return children[url]
+
+    entries = iter_sitemap(INDEX, url_filter=lambda url: '/event/' in url, fetch=fetch)
+
+    assert next(entries)[0] == 'https://example.com/event/1/'
+    # children are fetched lazily
+    assert fetched == ['https://example.com/sitemap-1.xml']
+    assert [url for url, _ in entries] == ['https://example.com/event/2/']
+
+
+def test_sitemap_index_needs_fetch():
+    with pytest.raises(ValueError):
+        list(iter_sitemap(INDEX))
+
+
+def test_constant_memory():
+    def chunks(size):
+        yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        for i in range(size):
+            yield f'<url><loc>https://example.com/event/{i}/</loc><lastmod>2024-01-01T00:00:00+00:00</lastmod></url>'
+        yield '</urlset>'
+
+    tracemalloc.start()
+    count = sum(1 for _ in iter_sitemap(chunks(5000)))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert count == 5000
+    assert peak < 512 * 1024
+
+
+@pytest.mark.parametrize("text,expected", [
+    ('2024-01-02T03:04:05+01:00', datetime(2024, 1, 2, 2, 4, 5, tzinfo=timezone.utc)),
+    (' 2024-01-02 ', datetime(2024, 1, 2, tzinfo=timezone.utc)),
+    ('yesterday', None),
+    (None, None),
+])
+def test_parse_lastmod(text, expected):
+    assert parse_lastmod(text) == expected
+
+
+def test_diff_sitemaps():
+    previous = {'a': '2024-01-01', 'b': '2024-01-01', 'c': '2024-01-01'}
+    current = {'b': '2024-01-01', 'c': '2024-02-01', 'd': '2024-02-01'}
+
+    assert diff_sitemaps(previous, current) == ({'d'}, {'a'}, {'c'})
+
+
+def test_diff_large_sitemaps():
+    previous = {f'https://example.com/event/{i}/': '2024-01-01' for i in range(50000)}
+    current = {f'https://example.com/event/{i}/': '2024-01-01' for i in range(1000, 51000)}
+
+    start = time.perf_counter()
+    added, removed, changed = diff_sitemaps(previous, current)
+
+    assert (len(added), len(removed), len(changed)) == (1000, 1000, 0)
+    assert time.perf_counter() - start < 0.5
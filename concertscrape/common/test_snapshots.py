@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+import os
+
+import pytest
+
+from concertscrape.common.snapshots import SnapshotStore
+
+
+@pytest.fixture
+def snapshots(tmp_path):
+    return SnapshotStore(tmp_path / 'snapshots')
+
+
+def test_add_and_read(snapshots):
+    sha256 = snapshots.add('https://example.com/event/a/', '<h1>Café</h1>',
+                           last_modified=datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+    assert snapshots.read(sha256) == '<h1>Café</h1>'
+    [record] = snapshots.latest()
+    assert record['url'] == 'https://example.com/event/a/'
+    assert record['last_modified'] == '2024-01-01T00:00:00+00:00'
+
+
+def test_content_addressed(snapshots):
+    snapshots.add('https://example.com/event/a/', 'same', fetched_at=datetime(2024, 1, 1))
+    snapshots.add('https://example.com/event/a/', 'same', fetched_at=datetime(2024, 1, 2))
+    snapshots.add('https://example.com/event/b/', 'same', fetched_at=datetime(2024, 1, 2))
+
+    objects = [f for _, _, files in os.walk(os.path.join(snapshots.directory, 'objects')) for f in files]
+    assert len(objects) == 1
+    assert len(list(snapshots.iter_records())) == 3
+
+
+def test_latest_per_url(snapshots):
+    snapshots.add('https://example.com/event/a/', 'old', fetched_at=datetime(2024, 1, 1))
+    new = snapshots.add('https://example.com/event/a/', 'new', fetched_at=datetime(2024, 1, 2))
+    snapshots.add('https://example.com/other/', 'other', fetched_at=datetime(2024, 1, 2))
+
+    [record] = snapshots.latest(url_filter=lambda url: '/event/' in url)
+    assert record['sha256'] == new
+    assert snapshots.read(record['sha256']) == 'new'
+
+
+def test_ignores_partly_written_line(snapshots):
+    snapshots.add('https://example.com/event/a/', 'page')
+    with open(snapshots.index_path, 'a') as f:
+        f.write('{"url": "https://exa')
+
+    assert len(snapshots.latest()) == 1
@@ -0,0 +1,31 @@
+import pytest
+
+from concertscrape.common.soup import make_soup, set_parser_backend
+
+PAGE = """
+<nav><ul><li><a href="/">Home</a></li></ul></nav>
+<script>var tracking = 1;</script>
+<div class="event-description"><p>Kept</p></div>
+<footer><p>Footer</p></footer>
+"""
+
+
+@pytest.mark.parametrize("backend", ['strainer', 'lxml-strainer'])
+def test_strainer_keeps_only_containers(backend):
+    if backend.startswith('lxml'):
+        pytest.importorskip('lxml')
+    soup = make_soup(PAGE, containers=['event-description'], backend=backend)
+
+    assert [p.text for p in soup.find_all('p')] == ['Kept']
+    assert soup.find('nav') is None
+
+
+def test_full_parse_without_containers():
+    soup = make_soup(PAGE, backend='strainer')
+
+    assert [p.text for p in soup.find_all('p')] == ['Kept', 'Footer']
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        set_parser_backend('html5lib')
@@ -0,0 +1,104 @@
+import json
+
+from concertscrape.common.stats import ScrapingStats, ScrapeResult, percentile
+
+
+def make_stats():
+    stats = ScrapingStats()
+    stats.add_concert('oxfordphil.com', ScrapeResult.NEW)
+    stats.add_concert('oxfordphil.com', ScrapeResult.ERROR)
+    for seconds in range(1, 101):
+        stats.record_time('page_fetch', seconds / 100)
+    stats.set_counter('Sheets API calls', 3)
+    return stats
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile([7], 0.95) == 7
+
+
+def test_timer():
+    stats = ScrapingStats()
+    with stats.timer('extract'):
+        pass
+    try:
+        with stats.timer('extract'):
+            raise ValueError
+    except ValueError:
+        pass
+
+    assert stats.phase_summary()['extract']['count'] == 2
+
+
+def test_phase_summary():
+    summary = make_stats().phase_summary()['page_fetch']
+
+    assert summary['count'] == 100
+    assert (summary['p50'], summary['p95'], summary['max']) == (0.5, 0.95, 1.0)
+    assert round(summary['total'], 2) == 50.5
+
+
+def test_print_summary(capsys):
+    make_stats().print_summary()
+
+    out = capsys.readouterr().out
+    assert 'Refetched, unchanged: 0' in out
+    assert 'page_fetch' in out
+    assert 'Sheets API calls: 3' in out
+
+
+def test_summary_of_site_without_concerts(capsys):
+    stats = ScrapingStats()
+    assert stats.count('example.com', ScrapeResult.ERROR) == 0
+    assert 'example.com' not in stats.stats
+
+    # e.g. every concert withdrawn from an empty sitemap
+    stats.add_concert('example.com', ScrapeResult.WITHDRAWN)
+    stats.print_summary()
+
+    assert 'New: 0\n' in capsys.readouterr().out
+
+
+def test_write_json(tmp_path):
+    make_stats().write_json(tmp_path / 'stats.json')
+
+    written = json.loads((tmp_path / 'stats.json').read_text())
+    assert written['sites']['oxfordphil.com']['new'] == 1
+    assert written['errored']
+    assert written['phases']['page_fetch']['p95'] == 0.95
+    assert written['counters'] == {'Sheets API calls': 3}
+
+
+def test_write_prometheus(tmp_path):
+    make_stats().write_prometheus(tmp_path / 'concertscrape.prom')
+
+    lines = (tmp_path / 'concertscrape.prom').read_text().splitlines()
+    assert 'concertscrape_concerts{site="oxfordphil.com",result="error"} 1' in lines
+    assert 'concertscrape_phase_seconds{phase="page_fetch",quantile="0.95"} 0.950000' in lines
+    assert 'concertscrape_phase_seconds_count{phase="page_fetch"} 100' in lines
+    assert 'concertscrape_phase_max_seconds{phase="page_fetch"} 1.000000' in lines
+    assert 'concertscrape_sheets_api_calls 3' in lines
+    assert not (tmp_path / 'concertscrape.prom.tmp').exists()
+
+
+def test_slowest_urls(capsys):
+    stats = ScrapingStats()
+    stats.record_time('page_fetch', 0.5, url='https://example.com/a/')
+    stats.record_time('extract', 2.0, url='https://example.com/a/')
+    stats.record_time('page_fetch', 1.0, url='https://example.com/b/')
+    stats.record_time('page_fetch', 0.1, url='https://example.com/c/')
+    # waited longest for the rate limit, but answered quickly
+    stats.record_time('rate_limit_wait', 5.0, url='https://example.com/c/')
+
+    assert stats.slowest_urls(2) == [
+        ('https://example.com/a/', {'page_fetch': 0.5, 'extract': 2.0}),
+        ('https://example.com/b/', {'page_fetch': 1.0}),
+    ]
+    stats.print_slowest_urls(3)
+    out = capsys.readouterr().out
+    assert 'rate_limit_wait  url' in out
+    assert '2.500           2.000           0.500           0.000  https://example.com/a/' in out
+    assert '0.100           0.000           0.100           5.000  https://example.com/c/' in out
@@ -0,0 +1,15 @@
+import pytest
+
+from concertscrape.common.soup import PARSER_BACKENDS, get_parser_backend, set_parser_backend
+
+
+@pytest.fixture(params=PARSER_BACKENDS)
+def parser_backend(request):
+    """Runs a test under each parser backend. The extractors' tests use it
+    for every test, with pytestmark = pytest.mark.usefixtures('parser_backend')"""
+    if request.param.startswith('lxml'):
+        pytest.importorskip('lxml')
+    previous = get_parser_backend()
+    set_parser_backend(request.param)
+    yield request.param
+    set_parser_backend(previous)
@@ -1,5 +1,24 @@
-import musicatoxford.mao
-import oxfordphil.oxfordphil
+import logging
 
-musicatoxford.mao.scrape()
-oxfordphil.oxfordphil.scrape()
\ No newline at end of file
+from concertscrape.common.cli import parse_arguments
+from concertscrape.common.registry import get_scrapers
+from concertscrape.common.scraper import DEFAULT_ARCHIVE_AFTER_DAYS, DEFAULT_MAX_WORKERS, run_scrapers
+
+
+def scrape(dry_run=False, reextract=False, resume=False, full=False, sites=None, fetch_workers=DEFAULT_MAX_WORKERS,
+           extract_workers=None, metrics_json=None, metrics_prom=None, profile=None, profile_top=10,
+           archive_after_days=DEFAULT_ARCHIVE_AFTER_DAYS):
+    """Scrape all the registered sites (or just `sites`) at the same time, into
+    the concert store, then sync the sheet"""
+    run_scrapers(get_scrapers(sites), dry_run=dry_run, reextract=reextract, resume=resume, full=full,
+                 fetch_workers=fetch_workers, extract_workers=extract_workers, profile=profile,
+                 profile_top=profile_top, archive_after_days=archive_after_days, metrics_json=metrics_json,
+                 metrics_prom=metrics_prom)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    args = parse_arguments(description='Scrape concerts from all the sites', select_sites=True)
+    scrape(dry_run=args.dry_run, reextract=args.reextract, resume=args.resume, full=args.full, sites=args.sites,
+           fetch_workers=args.fetch_workers, extract_workers=args.extract_workers, metrics_json=args.metrics_json,
+           metrics_prom=args.metrics_prom, profile=args.profile, profile_top=args.profile_top,
+           archive_after_days=args.archive_after)
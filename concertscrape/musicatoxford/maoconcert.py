@@ -1,11 +1,21 @@
 from concertscrape.common.concert_schema import Concert, Performer, ProgrammeItem
+from concertscrape.common.dates import parse_concert_date
+from concertscrape.common.soup import make_soup
 
-from bs4 import BeautifulSoup
-from datetime import datetime
+# Classes of the elements extract_concert reads, for the strainer parser backends
+CONTAINERS = [
+    'blue',  # the title h1
+    'event-description',
+    'event-description__date',
+    'event-description__venue',
+    'event-information__single',
+    'programme-listing__wrapper',
+    'programme-listing__venue',
+]
 
 
 def extract_concert(html_content: str) -> Concert:
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = make_soup(html_content, containers=CONTAINERS)
     
     # Extract title
     title_elem = soup.find('h1', class_='blue')
@@ -20,11 +30,7 @@ def extract_concert(html_content: str) -> Concert:
     if date_span:
         date_str = date_span.text.strip()
         concert_data['date'] = date_str
-        try:
-            date_obj = datetime.strptime(date_str, '%A %d %B %Y')
-            concert_data['date_parsed'] = date_obj.strftime('%Y-%m-%d')
-        except ValueError:
-            pass
+        concert_data['date_parsed'] = parse_concert_date(date_str)
     
     # Extract times
     event_info = soup.find_all('div', class_='event-information__single')
@@ -3,6 +3,9 @@ from concertscrape.common.concert_schema import ProgrammeItem, Performer
 import datetime
 import pytest
 
+
+pytestmark = pytest.mark.usefixtures('parser_backend')
+
 @pytest.fixture
 def test_html():
     return """
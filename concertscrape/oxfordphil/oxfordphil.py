@@ -1,122 +1,36 @@
 from concertscrape.oxfordphil.oxfordphilconcert import extract_concert
-from concertscrape.common.concert_schema import Concert, Performer, ProgrammeItem, ConcertScrape, print_concert_scrape
-from concertscrape.common.concert_sheet import SheetHandler
-from concertscrape.common.stats import ScrapingStats, ScrapeResult
-from concertscrape.common.requests_session import RateLimitedRequestsSession, REQUESTS_HEADERS
+from concertscrape.common.concert_schema import Concert, Performer, ProgrammeItem
+from concertscrape.common.cli import parse_arguments
+from concertscrape.common.registry import register
+from concertscrape.common.scraper import DEFAULT_ARCHIVE_AFTER_DAYS, DEFAULT_MAX_WORKERS, SitemapScraper, run_scrapers
 
-import argparse
-from datetime import datetime
 import logging
-import os
-import xml.etree.ElementTree as ET
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class OxfordPhilConcertScraper:
-    def __init__(self, sheet_handler):
-        self.sheet_handler = sheet_handler
+@register
+class OxfordPhilConcertScraper(SitemapScraper):
+    site_id = 'oxfordphil.com'
+    sitemap_url = "https://oxfordphil.com/event-sitemap.xml"
+    extract_concert = staticmethod(extract_concert)
 
-    def parse_sitemap(self, sitemap_content):
-        root = ET.fromstring(sitemap_content)
-        concerts = []
-        
-        # Remove the XML stylesheet processing instruction if present
-        if sitemap_content.startswith('<?xml'):
-            clean_content = sitemap_content[sitemap_content.find('<urlset'):]
-            root = ET.fromstring(clean_content)
+    def is_concert_url(self, url):
+        # Only process event URLs
+        return '/event/' in url
 
-        for url in root.findall('.//{http://www.sitemaps.org/schemas/sitemap/0.9}url'):
-            loc = url.find('{http://www.sitemaps.org/schemas/sitemap/0.9}loc').text
-            lastmod = url.find('{http://www.sitemaps.org/schemas/sitemap/0.9}lastmod').text
-            
-            # Only process event URLs
-            if '/event/' in loc:
-                concerts.append({
-                    'url': loc,
-                    'lastmod': datetime.strptime(lastmod, '%Y-%m-%dT%H:%M:%S%z')
-                })
-        return concerts
 
-    def needs_update(self, concert_url, lastmod, sheet_data):
-        for _, row in sheet_data.iterrows():
-            if row.url == concert_url:
-                sheet_lastmod = datetime.strptime(row['last_modified'], '%Y-%m-%dT%H:%M:%S%z')
-                return lastmod > sheet_lastmod
-        return 'new'
-
-    def scrape_concert(self, url, last_modified):
-        response = requests_session.get(url, headers=REQUESTS_HEADERS)
-        if response.status_code == 404:
-            logger.warning(f"Concert page not found: {url}")
-            return None
-            
-        response.raise_for_status()
-        concert = extract_concert(response.text)
-        concert_scrape = ConcertScrape(
-            scrape_date=datetime.now(),
-            url=url,
-            last_modified=last_modified,
-            concert=concert,
-        )
-        return concert_scrape
-
-    def process_concerts(self, sitemap_content, dry_run):
-        concerts = self.parse_sitemap(sitemap_content)
-        sheet_data = self.sheet_handler.get_all_data()
-        
-        for concert in concerts:
-            needs_update = self.needs_update(concert['url'], concert['lastmod'], sheet_data)
-            if needs_update in (True, 'new'):
-                try:
-                    concert_scrape = self.scrape_concert(concert['url'], concert['lastmod'])
-                except Exception as e:
-                    logger.error(f"Error scraping concert {concert['url']}: {e}")
-                    stats_add_concert(ScrapeResult.ERROR)
-                    continue
-
-                if not concert_scrape:
-                    continue
-
-                self.sheet_handler.update_concert(concert_scrape, dry_run)
-                if needs_update == 'new':
-                    logger.info(f"New concert: {concert['url']}")
-                    stats_add_concert(ScrapeResult.NEW)
-                else:
-                    logger.info(f"Updated concert: {concert['url']}")
-                    stats_add_concert(ScrapeResult.UPDATED)
-            else:
-                logger.info(f"Existing unchanged concert: {concert['url']}")
-                stats_add_concert(ScrapeResult.EXISTING)
-
-requests_session = RateLimitedRequestsSession(
-    rate_limit_enabled=not os.environ.get("DISABLE_RATELIMITING")
-)
-
-stats = ScrapingStats()
-stats_add_concert = lambda result: stats.add_concert('oxfordphil.com', result)
-
-
-def scrape(dry_run=False):
-    sheet_handler = SheetHandler()
-    scraper = OxfordPhilConcertScraper(sheet_handler)
-    
-    response = requests_session.get(
-        "https://oxfordphil.com/event-sitemap.xml", 
-        headers=REQUESTS_HEADERS
-    )
-    response.raise_for_status()
-    sitemap_content = response.text
-    
-    scraper.process_concerts(sitemap_content, dry_run=dry_run)
-    stats.print_summary()
-
-def parse_arguments():
-    parser = argparse.ArgumentParser(description='Concert scraping script with command line options')
-    parser.add_argument('--dry-run', action='store_true', 
-                       help="Don't change the spreadsheet")
-    return parser.parse_args()
+def scrape(dry_run=False, reextract=False, resume=False, full=False, fetch_workers=DEFAULT_MAX_WORKERS,
+           extract_workers=None, metrics_json=None, metrics_prom=None, profile=None, profile_top=10,
+           archive_after_days=DEFAULT_ARCHIVE_AFTER_DAYS):
+    run_scrapers([OxfordPhilConcertScraper], dry_run=dry_run, reextract=reextract, resume=resume, full=full,
+                 fetch_workers=fetch_workers, extract_workers=extract_workers, profile=profile,
+                 profile_top=profile_top, archive_after_days=archive_after_days, metrics_json=metrics_json,
+                 metrics_prom=metrics_prom)
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     args = parse_arguments()
-    scrape(dry_run=args.dry_run)
\ No newline at end of file
+    scrape(dry_run=args.dry_run, reextract=args.reextract, resume=args.resume, full=args.full,
+           fetch_workers=args.fetch_workers, extract_workers=args.extract_workers, metrics_json=args.metrics_json,
+           metrics_prom=args.metrics_prom, profile=args.profile, profile_top=args.profile_top,
+           archive_after_days=args.archive_after)
@@ -1,17 +1,22 @@
 from concertscrape.common.concert_schema import Concert, Performer, ProgrammeItem
-from bs4 import BeautifulSoup, Tag
-from datetime import datetime
+from concertscrape.common.dates import parse_concert_date
+from concertscrape.common.soup import make_soup
+from bs4 import Comment, NavigableString, Tag
 import re
 
+# Classes of the elements extract_concert reads, for the strainer parser backends
+CONTAINERS = ['event-title', 'event-subtitle', 'event-info-box', 'event-description']
+
 def parse_date_and_time(date_str: str) -> tuple:
     """Parse the date string in format '12 Jul 2025 | 19:30'"""
     try:
         date_part, time_part = date_str.split('|')
-        date_obj = datetime.strptime(date_part.strip(), '%d %b %Y')
-        start_time = time_part.strip()
-        return date_obj.date(), start_time, date_part.strip()
     except (ValueError, AttributeError):
         return None, None, None
+    date_parsed = parse_concert_date(date_part)
+    if date_parsed is None:
+        return None, None, None
+    return date_parsed, time_part.strip(), date_part.strip()
 
 def clean_text(text: str) -> str:
     """Clean up text by removing extra whitespace"""
@@ -19,74 +24,133 @@ def clean_text(text: str) -> str:
         return ''
     return ' '.join(text.strip().split())
 
+# Words that mark a block of lines as performers rather than programme
+PERFORMER_ROLE_RE = re.compile(
+    r'conductor|soprano|piano|violin|viola|cello|tenor|bass|baritone|mezzo-soprano|alto|narrator|choir|choristers'
+)
+
+def _is_br(node) -> bool:
+    return isinstance(node, Tag) and node.name == 'br'
+
+def _is_space(node) -> bool:
+    return isinstance(node, NavigableString) and not isinstance(node, Comment) and not node.strip()
+
+def split_blocks(para: Tag) -> list:
+    """Split a paragraph into blocks, separated by two <br> tags (with only
+    whitespace between them), of lines, separated by a single <br>. Each line
+    is a list of the paragraph's child nodes. One pass over the children, so
+    the cost is linear in the size of the paragraph.
+    """
+    blocks = []
+    lines = []
+    line = []
+    nodes = list(para.children)
+    i = 0
+    while i < len(nodes):
+        node = nodes[i]
+        if not _is_br(node):
+            line.append(node)
+            i += 1
+            continue
+        lines.append(line)
+        line = []
+        # <br>s pair up from the left, so an odd one out of a run starts a line
+        i += 1
+        after = i + 1 if i < len(nodes) and _is_space(nodes[i]) else i
+        if after < len(nodes) and _is_br(nodes[after]):
+            blocks.append(lines)
+            lines = []
+            i = after + 1
+    lines.append(line)
+    blocks.append(lines)
+    return blocks
+
+def line_html(line: list) -> str:
+    """The markup of a line's nodes, as str() of the paragraph has it"""
+    return ''.join(node.decode() if isinstance(node, Tag) else node.output_ready() for node in line)
+
+def paragraph_tags(para: Tag) -> tuple:
+    """The paragraph's opening and closing tags"""
+    html = para.decode()
+    close = f'</{para.name}>'
+    return html[:len(html) - len(para.decode_contents()) - len(close)], close
+
+def first_strong(line: list):
+    for node in line:
+        if isinstance(node, Tag):
+            if node.name == 'strong':
+                return node
+            strong = node.find('strong')
+            if strong:
+                return strong
+    return None
+
+def line_text(line: list, exclude: Tag = None) -> str:
+    """The text of a line's nodes, leaving out the text of `exclude`"""
+    excluded = {id(string) for string in exclude.strings} if exclude else set()
+    text = []
+    for node in line:
+        strings = [node] if isinstance(node, NavigableString) else node.strings
+        text.extend(string for string in strings
+                    if id(string) not in excluded and not isinstance(string, Comment))
+    return clean_text(''.join(text))
+
 def extract_program_and_performers_and_description(desc_elem: Tag):
-    """Extract program items and performers from the event-description"""
+    """Extract program items and performers from the event-description. The
+    description is the markup of the other blocks' lines."""
     program = []
     performers = []
     description_lines = []
-    
-    paras = desc_elem.find_all('p')
-    for para in paras:
+    composer = ''
 
-        # Split into blocks based on double <br> tags
-        blocks = re.split(r'<br\s*/?>\s*<br\s*/?>', str(para))
-        
-        for block in blocks:
+    for para in desc_elem.find_all('p'):
+        blocks = split_blocks(para)
+        first_line, last_line = blocks[0][0], blocks[-1][-1]
+        for lines in blocks:
+            texts = [line_text(line) for line in lines]
             # Skip empty blocks
-            if not clean_text(BeautifulSoup(block, 'html.parser').get_text()):
+            if not any(texts):
                 continue
-                
-            # Determine if this block is performers
-            has_strong = re.search(r'<strong>([^<]+)</strong>', block)
-            has_performer_role = has_strong and any(role in block.lower() for role in [
-                'conductor', 'soprano', 'piano', 'violin', 'viola', 'cello', 
-                'tenor', 'bass', 'baritone', 'mezzo-soprano', 'alto', 'narrator',
-                'choir', 'choristers'
-            ])
-            # Determine if this block is programme
+
+            # Lines starting with a name in <strong> are programme or, if the
+            # block mentions a role, performers. Other blocks are description.
+            strongs = [first_strong(line) for line in lines]
+            has_strong = any(strongs)
+            has_performer_role = has_strong and bool(PERFORMER_ROLE_RE.search(' '.join(texts).lower()))
             is_programme = has_strong and not has_performer_role
-            
-            # Split block into lines
-            lines = block.split('<br/>')
-            if len(lines) <= 1:  # If no <br/> found, try <br>
-                lines = block.split('<br>')
-                
-            # If a single line, make it a list
-            if len(lines) <= 1:
-                lines = [block]
-                
-            # Process each line based on block type
-            for line in lines:
+
+            if not has_strong:
+                # kept as markup, a line to each line of the block
+                for line in lines:
+                    html = line_html(line)
+                    if line is first_line or line is last_line:
+                        open_tag, close_tag = paragraph_tags(para)
+                        html = (open_tag if line is first_line else '') + html + \
+                            (close_tag if line is last_line else '')
+                    description_lines.append(html)
+                continue
+
+            for line, strong, text in zip(lines, strongs, texts):
+                if not text:
+                    continue
                 if has_performer_role:
-                    # Process as performer
-                    strong_match = re.search(r'<strong>([^<]+)</strong>', line)
-                    if strong_match:
-                        name = clean_text(strong_match.group(1))
-                        # Get text after strong tag for role
-                        rest = clean_text(re.sub(r'<[^>]+>', '', line.replace(strong_match.group(0), '')))
-                        if rest:
-                            role = rest
-                        else:
-                            # If no role specified, the block might be a choir or ensemble
-                            role = ''
-                        performers.append(Performer(name=name, role=role))
+                    if strong:
+                        # If no role specified, the block might be a choir or ensemble
+                        performers.append(Performer(name=clean_text(strong.get_text()),
+                                                    role=line_text(line, exclude=strong)))
                 elif is_programme:
-                    # Process as programme
-                    strong_match = re.search(r'<strong>([^<]+)</strong>', line)
-                    if strong_match:
-                        composer = clean_text(strong_match.group(1))
-                        piece = clean_text(re.sub(r'<[^>]+>', '', line.replace(strong_match.group(0), '')))
+                    if strong:
+                        composer = clean_text(strong.get_text())
+                        piece = line_text(line, exclude=strong)
                     else:
-                        piece = clean_text(line)
+                        # carries on the list under the last composer
+                        piece = text
                     program.append(ProgrammeItem(composer=composer, piece=piece))
-                else:
-                    # Process as description
-                    description_lines.append(line)
 
     return program, performers, "\n".join(description_lines)
 
 def extract_concert(html_content: str) -> Concert:
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = make_soup(html_content, containers=CONTAINERS)
     
     # Initial data with required fields
     concert_data = {
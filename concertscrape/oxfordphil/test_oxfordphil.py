@@ -1,12 +1,14 @@
 import pytest
 from concertscrape.oxfordphil.oxfordphil import OxfordPhilConcertScraper, Concert, Performer, ProgrammeItem
 from concertscrape.common.concert_sheet import SheetHandler
+from concertscrape.common.sheet_index import SheetIndex
+from concertscrape.common.stats import ScrapeResult
 from datetime import datetime, timezone
 import pandas as pd
 
 @pytest.fixture
 def scraper():
-    return OxfordPhilConcertScraper(sheet_handler=None)
+    return OxfordPhilConcertScraper(store=None)
 
 @pytest.fixture
 def sitemap_content():
@@ -50,13 +52,13 @@ def test_parse_sitemap(scraper, sitemap_content):
 
 @pytest.mark.parametrize("test_date,url,expected", [
     # Test older modification date
-    ('2023-12-31T12:00:00+00:00', 'https://oxfordphil.com/event/test-concert/', False),
+    ('2023-12-31T12:00:00+00:00', 'https://oxfordphil.com/event/test-concert/', ScrapeResult.EXISTING),
     # Test newer modification date
-    ('2024-01-02T12:00:00+00:00', 'https://oxfordphil.com/event/test-concert/', True),
+    ('2024-01-02T12:00:00+00:00', 'https://oxfordphil.com/event/test-concert/', ScrapeResult.UPDATED),
     # Test non-existent concert
-    ('2024-01-02T12:00:00+00:00', 'https://oxfordphil.com/event/new-concert/', 'new'),
+    ('2024-01-02T12:00:00+00:00', 'https://oxfordphil.com/event/new-concert/', ScrapeResult.NEW),
 ])
 def test_needs_update(scraper, mock_sheet_data, test_date, url, expected):
     """Test the needs_update logic"""
     date = datetime.strptime(test_date, '%Y-%m-%dT%H:%M:%S%z')
-    assert scraper.needs_update(url, date, mock_sheet_data) == expected
+    assert scraper.needs_update(url, date, SheetIndex(mock_sheet_data)) == expected
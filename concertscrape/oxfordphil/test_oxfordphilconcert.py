@@ -1,7 +1,12 @@
 import pytest
 from datetime import datetime, date
-from concertscrape.oxfordphil.oxfordphilconcert import extract_concert, clean_text, parse_date_and_time
+from concertscrape.oxfordphil.oxfordphilconcert import extract_concert, clean_text, parse_date_and_time, \
+    extract_program_and_performers_and_description
 from concertscrape.common.concert_schema import Concert, ProgrammeItem, Performer
+from concertscrape.common.soup import make_soup
+
+
+pytestmark = pytest.mark.usefixtures('parser_backend')
 
 @pytest.mark.parametrize("input_text,expected", [
     ('  Hello   World  ', 'Hello World'),
@@ -173,3 +178,54 @@ def test_empty_html():
     """Test handling of empty HTML"""
     concert = extract_concert("")
     assert concert.title == ""
+
+def test_opera_description_is_markup(opera_html):
+    concert = extract_concert(opera_html)
+
+    assert concert.programme[1] == ProgrammeItem(composer='Mascagni', piece='Prelude & Intermezzo Cavalleria Rusticana')
+    assert concert.description == \
+        '<p>Angela Gheorghiu, one of the most glamorous and gifted opera singers of our time...</p>'
+
+def test_minimal_description(minimal_html):
+    concert = extract_concert(minimal_html)
+
+    assert concert.description == '<p>Experience the sounds of Baroque in a concert.</p>\n' \
+        '<p>The concert is in partnership with <a href="https://oxford.org/">Oxford</a>. </p>'
+
+def test_carols_blocks(carols_html):
+    """Programme lines without a composer carry on the list under the last one"""
+    concert = extract_concert(carols_html)
+
+    assert [(p.composer, p.piece) for p in concert.programme[:6]] == [
+        ('Please note the change of start time', ''),
+        ('Traditional carols:', ''),
+        ('Traditional carols:', 'O come, all ye faithful, arr. David Willcocks'),
+        ('Traditional carols:', 'King Jesus hath a garden, arr. John Rutter'),
+        ('Traditional carols:', 'Quelle est cette odeur agréable, arr. David Willcocks'),
+        ('Traditional carols:', 'I saw three ships, arr. John Rutter'),
+    ]
+    assert len(concert.programme) == 21
+    assert [p.name for p in concert.performers] == [
+        'The Choir of Merton College', 'Choristers of Winchester Cathedral', 'Sir John Rutter', 'Simon Callow']
+    assert [clean_text(line) for line in concert.description.split('\n') if clean_text(line)][:3] == [
+        'The first Nowell, arr. David Willcocks',
+        'Ding dong! merrily on high, arr. John Rutter',
+        'Hark! the herald angels sing, arr. Willcocks',
+    ]
+    assert concert.description.endswith('\n<p>Supported by Jon &amp; Julia Aisbitt</p>')
+
+def test_pathological_markup():
+    """Long runs of <br> and deeply nested tags are handled"""
+    html = ('<div class="event-description"><p>'
+            + '<strong>Composer</strong> piece <br> \n ' * 5000
+            + '<br>' * 5000
+            + '<strong><em>' * 200 + 'x' * 50000
+            + '</p></div>')
+    desc_elem = make_soup(html).find('div', class_='event-description')
+
+    program, performers, description = extract_program_and_performers_and_description(desc_elem)
+
+    assert len(program) == 5001
+    assert program[-1] == ProgrammeItem(composer='x' * 50000, piece='')
+    assert performers == []
+    assert description == ''